@@ -0,0 +1,72 @@
+import threading
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from app.core.config import settings
+from app.core.profiler import profile_for, recent_profiles
+from app.dependencies import get_current_admin
+
+router = APIRouter()
+
+# One on-demand profile per worker at a time
+_profile_lock = threading.Lock()
+
+
+def _render(profiler, fmt: str, name: str):
+    if fmt == "speedscope":
+        return profiler.speedscope(name)
+    return PlainTextResponse(profiler.collapsed())
+
+
+@router.get("/profile")
+def profile_worker(
+    seconds: float = Query(5, gt=0, le=settings.PROFILER_MAX_SECONDS),
+    interval_ms: float = Query(5, ge=1, le=100, description="Sampling interval"),
+    format: str = Query("collapsed", pattern="^(collapsed|speedscope)$"),
+    include_idle: bool = Query(False, description="Also keep threads parked on I/O or locks"),
+    current_admin = Depends(get_current_admin)
+):
+    """Sample all threads of the worker serving this request for `seconds`"""
+    if not _profile_lock.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A profile is already running on this worker"
+        )
+    try:
+        profiler = profile_for(seconds, interval_ms / 1000, include_idle)
+    finally:
+        _profile_lock.release()
+
+    return _render(profiler, format, f"worker profile ({seconds}s)")
+
+
+@router.get("/profiles")
+def list_request_profiles(current_admin = Depends(get_current_admin)):
+    """Per-request profiles captured with the X-Profile header"""
+    return {
+        "code": 200,
+        "data": [
+            {
+                "id": profile_id,
+                "method": entry["method"],
+                "path": entry["path"],
+                "duration_ms": round(entry["profiler"].duration * 1000, 3),
+                "samples": entry["profiler"].samples
+            }
+            for profile_id, entry in reversed(recent_profiles.items())
+        ]
+    }
+
+
+@router.get("/profiles/{profile_id}")
+def get_request_profile(
+    profile_id: str,
+    format: str = Query("collapsed", pattern="^(collapsed|speedscope)$"),
+    current_admin = Depends(get_current_admin)
+):
+    entry = recent_profiles.get(profile_id)
+    if entry is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found (profiles are kept per worker, newest 20 only)"
+        )
+    return _render(entry["profiler"], format, f"{entry['method']} {entry['path']}")
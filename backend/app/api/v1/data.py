@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.dependencies import get_current_user
 from app.models.city_info import CityInfo
 from app.models.service_type import ServiceType
+from app.crud import suggest as crud_suggest
 
 router = APIRouter()
 
@@ -18,6 +19,30 @@ def get_cities(db: Session = Depends(get_db), current_user = Depends(get_current
         "data": [{"id": city.cityID, "name": city.cityName} for city in cities]
     }
 
+@router.get("/cities/suggest")
+def suggest_cities(
+    q: str = Query(..., min_length=1, max_length=50, description="Prefix of city/province name or pinyin"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    return {
+        "code": 200,
+        "data": crud_suggest.suggest_cities(db, q, limit)
+    }
+
+@router.get("/titles/suggest")
+def suggest_titles(
+    q: str = Query(..., min_length=1, max_length=80, description="Prefix of a service request title"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    return {
+        "code": 200,
+        "data": crud_suggest.suggest_titles(db, q, limit)
+    }
+
 @router.get("/service-types")
 def get_service_types(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     service_types = db.query(ServiceType).all()
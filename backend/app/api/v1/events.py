@@ -0,0 +1,73 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.events import event_bus, format_sse
+from app.core.security import decode_access_token
+from app.crud import user as crud_user
+from app.database import get_db
+from app.dependencies import get_current_admin
+
+router = APIRouter()
+
+
+def get_stream_user_id(
+    request: Request,
+    token: str = Query(None, description="JWT, for EventSource clients that cannot send headers"),
+    db: Session = Depends(get_db)
+) -> int:
+    """Resolve the subscriber from the Authorization header or the `token` query parameter"""
+    authorization = request.headers.get("Authorization", "")
+    if authorization.startswith("Bearer "):
+        token = authorization[len("Bearer "):]
+    payload = decode_access_token(token) if token else None
+    if payload is None or payload.get("sub") is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials"
+        )
+
+    user_id = int(payload["sub"])
+    # 0 is the admin account, which has no buser_table row
+    if user_id != 0 and crud_user.get_user_by_id(db, user_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+    return user_id
+
+
+@router.get("")
+async def stream_events(request: Request, user_id: int = Depends(get_stream_user_id)):
+    """Stream response/match notifications for the current user as server-sent events"""
+    subscription = event_bus.subscribe(user_id)
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(
+                        subscription.queue.get(), timeout=settings.EVENT_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(message)
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/stats")
+def get_event_stats(current_admin = Depends(get_current_admin)):
+    return {
+        "code": 200,
+        "data": event_bus.stats()
+    }
@@ -7,20 +7,24 @@ import stat
 from pathlib import Path
 from typing import List
 from app.dependencies import get_current_user
+from app.core.metrics import UPLOADS_TOTAL, UPLOAD_BYTES_TOTAL
 
 # 设置日志
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# 创建上传目录
 UPLOAD_DIR = Path("uploads")
-try:
-    UPLOAD_DIR.mkdir(exist_ok=True)
-    # 确保目录有写权限
-    os.chmod(UPLOAD_DIR, stat.S_IRWXU | stat.S_IRWXG | stat.S_IRWXO)
-except Exception as e:
-    logger.error(f"创建上传目录失败: {str(e)}")
+
+
+def ensure_upload_dir():
+    """创建上传目录并确保有写权限（应用启动时和每次上传前调用，导入时不做任何文件系统操作）"""
+    try:
+        UPLOAD_DIR.mkdir(exist_ok=True)
+        os.chmod(UPLOAD_DIR, stat.S_IRWXU | stat.S_IRWXG | stat.S_IRWXO)
+    except Exception as e:
+        logger.error(f"创建上传目录失败: {str(e)}")
+
 
 # 允许的文件扩展名
 ALLOWED_IMAGE_EXTENSIONS = {"jpg", "jpeg", "png", "gif"}
@@ -71,11 +75,7 @@ async def upload_file(
         file_path = UPLOAD_DIR / filename
         
         # 确保上传目录存在并有写权限
-        try:
-            UPLOAD_DIR.mkdir(exist_ok=True)
-            os.chmod(UPLOAD_DIR, stat.S_IRWXU | stat.S_IRWXG | stat.S_IRWXO)
-        except Exception as e:
-            logger.error(f"确保上传目录存在时出错: {str(e)}")
+        ensure_upload_dir()
 
         logger.info(f"保存文件到: {file_path}")
 
@@ -101,6 +101,8 @@ async def upload_file(
 
         # 确定文件类型
         file_type = "image" if file_ext in ALLOWED_IMAGE_EXTENSIONS else "video"
+        UPLOADS_TOTAL.inc(file_type)
+        UPLOAD_BYTES_TOTAL.inc(amount=len(contents))
         
         logger.info(f"文件上传成功: {filename}")
         
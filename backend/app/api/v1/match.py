@@ -5,6 +5,7 @@ from app.dependencies import get_current_user
 from app.crud import accept as crud_accept
 from app.crud.service_response import get_service_response
 from app.crud.service_request import get_service_request
+from app.core.events import event_bus, RESPONSE_ACCEPTED, RESPONSE_REJECTED
 
 router = APIRouter()
 
@@ -34,16 +35,15 @@ def accept_service(
             detail="Response already processed"
         )
     
+    # Also marks the request 'Completed' (ps_state=2) in the same transaction
     accept_info = crud_accept.accept_service_response(db, response_id)
-    
-    service_response = get_service_response(db, response_id)
-    if service_response:
-        service_request = get_service_request(db, service_response.sr_id)
-        if service_request:
-            service_request.ps_state = 2  # Update to 'Completed'
-            db.commit()
-            db.refresh(service_request)
-            
+
+    event_bus.publish(RESPONSE_ACCEPTED, [db_response.response_userid, db_request.psr_userid], {
+        "response_id": response_id,
+        "sr_id": db_response.sr_id,
+        "accept_id": accept_info.id
+    })
+
     return {
         "code": 200,
         "message": "Service response accepted successfully",
@@ -77,7 +77,12 @@ def reject_service(
         )
     
     updated_response = crud_accept.reject_service_response(db, response_id)
-    
+
+    event_bus.publish(RESPONSE_REJECTED, [updated_response.response_userid], {
+        "response_id": response_id,
+        "sr_id": updated_response.sr_id
+    })
+
     return {
         "code": 200,
         "message": "Service response rejected successfully"
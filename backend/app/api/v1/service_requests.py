@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Response
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.dependencies import get_current_user
+from app.dependencies import get_current_user, get_batch_ids
 from app.schemas.service_request import ServiceRequestCreate, ServiceRequestUpdate, ServiceRequestResponse
 from app.crud import service_request as crud_service_request
 from app.crud import service_response as crud_service_response
+from app.crud import outbox as crud_outbox
+from app.crud import sync as crud_sync
+from app.core.events import event_bus, REQUEST_CANCELLED
+from app.core.idempotency import run_idempotent
+from app.core.etag import weak_etag, etag_matches, not_modified, set_etag
 
 router = APIRouter()
 
@@ -16,11 +21,29 @@ def get_service_requests(
     stype_id: int = Query(None),
     city_id: int = Query(None),
     ps_state: int = Query(None),
+    fields: str = Query(None, description="Comma-separated fields to return, e.g. sr_id,sr_title,ps_state,city_name"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     # Log the received parameters for debugging
     print(f"get_service_requests called with params: page={page}, size={size}, user_id={user_id}, stype_id={stype_id}, city_id={city_id}, ps_state={ps_state}")
+
+    if fields is not None:
+        # Sparse fieldset: only the requested columns are selected
+        try:
+            selected = crud_service_request.parse_list_fields(fields)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{e}. Allowed fields: {', '.join(crud_service_request.LIST_FIELDS)}"
+            )
+        return {
+            "code": 200,
+            "data": crud_service_request.get_service_request_fields(
+                db, selected, page=page, size=size, user_id=user_id,
+                stype_id=stype_id, city_id=city_id, ps_state=ps_state
+            )
+        }
     
     result = crud_service_request.get_service_requests(
         db, page=page, size=size, user_id=user_id,
@@ -69,25 +92,68 @@ def get_my_service_requests(
     stype_id: int = Query(None),
     city_id: int = Query(None),
     ps_state: int = Query(None),
+    since: str = Query(None, description="Watermark from a previous call; returns only changes after it"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
+    if since is not None:
+        # Delta sync: filters and pagination do not apply
+        try:
+            changes = crud_sync.get_changes(
+                db, since, current_user.id, crud_outbox.SERVICE_REQUEST,
+                lambda updated_since, limit: crud_service_request.get_service_requests(
+                    db, page=1, size=limit, user_id=current_user.id, updated_since=updated_since
+                )
+            )
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid since watermark"
+            )
+        return {
+            "code": 200,
+            "data": changes
+        }
+
+    # Taken before reading so nothing committed meanwhile is skipped by the next sync
+    watermark = crud_sync.current_watermark(db)
     result = crud_service_request.get_service_requests(
         db, page=page, size=size, user_id=current_user.id,
         stype_id=stype_id, city_id=city_id, ps_state=ps_state
     )
+    result["watermark"] = watermark
 
     return {
         "code": 200,
         "data": result
     }
 
+@router.get("/batch")
+def get_service_requests_batch(
+    ids: list = Depends(get_batch_ids),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Service requests for comma-separated `ids`, keyed by id; unknown ids are left out"""
+    return {
+        "code": 200,
+        "data": crud_service_request.get_service_requests_by_ids(db, ids)
+    }
+
 @router.get("/{request_id}", response_model=dict)
 def get_service_request(
     request_id: int,
+    response: Response,
+    if_none_match: str = Header(None, alias="If-None-Match"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
+    if if_none_match:
+        # Revalidation: one primary-key lookup of the version columns, no serialization
+        version = crud_service_request.get_service_request_version(db, request_id)
+        if version and etag_matches(if_none_match, weak_etag(*version)):
+            return not_modified(weak_etag(*version))
+
     print(f"Getting service request with ID: {request_id}")
     print(f"Current user ID: {current_user.id}")
     db_request = crud_service_request.get_service_request(db, request_id)
@@ -126,6 +192,8 @@ def get_service_request(
         request_dict['service_type_name'] = service_type.typename if service_type else 'Unknown'
     
     print(f"Returning request data: {request_dict}")
+    set_etag(response, weak_etag(db_request.sr_id, db_request.ps_updatedate, db_request.ps_state,
+                                  db_request.row_version))
     return {
         "code": 200,
         "data": request_dict
@@ -134,16 +202,23 @@ def get_service_request(
 @router.post("", status_code=status.HTTP_201_CREATED)
 def create_service_request(
     request: ServiceRequestCreate,
+    idempotency_key: str = Header(None, alias="Idempotency-Key", max_length=255),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    db_request = crud_service_request.create_service_request(db, request, current_user.id)
+    def create():
+        db_request = crud_service_request.create_service_request(db, request, current_user.id)
+        return {
+            "code": 200,
+            "message": "Service request created successfully",
+            "data": {"sr_id": db_request.sr_id}
+        }
 
-    return {
-        "code": 200,
-        "message": "Service request created successfully",
-        "data": {"sr_id": db_request.sr_id}
-    }
+    # Retries carrying the same key replay the stored response instead of inserting again
+    return run_idempotent(
+        idempotency_key, f"{current_user.id}:POST:service-requests", request,
+        create, status.HTTP_201_CREATED
+    )
 
 @router.put("/{request_id}")
 def update_service_request(
@@ -205,9 +280,12 @@ def cancel_service_request(
             detail="Current state does not allow cancellation." # Cannot cancel unless state is 'Published'
         )
 
-    db_request.ps_state = -1
-    db.commit()
-    db.refresh(db_request)
+    db_request = crud_service_request.cancel_service_request(db, request_id)
+
+    responder_ids = crud_service_response.get_responder_ids(db, request_id)
+    event_bus.publish(REQUEST_CANCELLED, [db_request.psr_userid, *responder_ids], {
+        "sr_id": request_id
+    })
 
     return {
         "code": 200,
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Response
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.dependencies import get_current_user
+from app.dependencies import get_current_user, get_batch_ids
 from app.schemas.service_response import ServiceResponseCreate, ServiceResponseUpdate, ServiceResponseResponse
 from app.crud import service_response as crud_service_response
 from app.crud import service_request as crud_service_request
+from app.crud import outbox as crud_outbox
+from app.crud import sync as crud_sync
+from app.core.events import event_bus, RESPONSE_CREATED
+from app.core.idempotency import run_idempotent
+from app.core.etag import weak_etag, etag_matches, not_modified, set_etag
 from typing import List
 
 router = APIRouter()
@@ -14,13 +19,32 @@ def get_my_service_responses(
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=100),
     city_id: int = Query(None),
+    since: str = Query(None, description="Watermark from a previous call; returns only changes after it"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """Get current user's service responses"""
-    result = crud_service_response.get_service_responses(
-        db, page=page, size=size, user_id=current_user.id, city_id=city_id
-    )
+    if since is not None:
+        # Delta sync: filters and pagination do not apply
+        try:
+            result = crud_sync.get_changes(
+                db, since, current_user.id, crud_outbox.SERVICE_RESPONSE,
+                lambda updated_since, limit: crud_service_response.get_service_responses(
+                    db, page=1, size=limit, user_id=current_user.id, updated_since=updated_since
+                )
+            )
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid since watermark"
+            )
+    else:
+        # Taken before reading so nothing committed meanwhile is skipped by the next sync
+        watermark = crud_sync.current_watermark(db)
+        result = crud_service_response.get_service_responses(
+            db, page=page, size=size, user_id=current_user.id, city_id=city_id
+        )
+        result["watermark"] = watermark
     
     # Validate and serialize each item in the result using the schema
     serialized_items = [ServiceResponseResponse(**item).model_dump() for item in result["items"]]
@@ -31,13 +55,36 @@ def get_my_service_responses(
         "data": result
     }
 
+@router.get("/batch", response_model=dict)
+def get_service_responses_batch(
+    ids: list = Depends(get_batch_ids),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Service responses for comma-separated `ids`, keyed by id; unknown ids are left out"""
+    responses = crud_service_response.get_service_responses_by_ids(db, ids)
+    return {
+        "code": 200,
+        "data": {
+            response_id: ServiceResponseResponse(**item).model_dump() for response_id, item in responses.items()
+        }
+    }
+
 @router.get("/{response_id}", response_model=dict)
 def get_service_response_by_id(
     response_id: int,
+    response: Response,
+    if_none_match: str = Header(None, alias="If-None-Match"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """Get a specific service response by ID"""
+    if if_none_match:
+        # Revalidation: one primary-key lookup of the version columns, no serialization
+        version = crud_service_response.get_service_response_version(db, response_id)
+        if version and etag_matches(if_none_match, weak_etag(*version)):
+            return not_modified(weak_etag(*version))
+
     db_response = crud_service_response.get_service_response_with_details(db, response_id)
     if not db_response:
         raise HTTPException(
@@ -47,6 +94,10 @@ def get_service_response_by_id(
 
     # Validate and serialize the response using the schema
     response_data = ServiceResponseResponse(**db_response)
+    set_etag(response, weak_etag(
+        db_response["response_id"], db_response["update_date"], db_response["response_state"],
+        db_response["row_version"]
+    ))
 
     return {
         "code": 200,
@@ -81,22 +132,32 @@ def get_service_responses(
 @router.post("", status_code=status.HTTP_201_CREATED)
 def create_service_response(
     response: ServiceResponseCreate,
+    idempotency_key: str = Header(None, alias="Idempotency-Key", max_length=255),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    db_response = crud_service_response.create_service_response(db, response, current_user.id)
-
-    service_request = crud_service_request.get_service_request(db, db_response.sr_id)
-    if service_request and service_request.ps_state == 0:
-        service_request.ps_state = 1  # Update to 'In Response'
-        db.commit()
-        db.refresh(service_request)
-    
-    return {
-        "code": 200,
-        "message": "Service response created successfully",
-        "data": {"id": db_response.response_id}
-    }
+    def create():
+        # Also moves the request to 'In Response' (ps_state=1) in the same transaction
+        db_response = crud_service_response.create_service_response(db, response, current_user.id)
+
+        service_request = crud_service_request.get_service_request(db, db_response.sr_id)
+        if service_request:
+            event_bus.publish(RESPONSE_CREATED, [service_request.psr_userid], {
+                "response_id": db_response.response_id,
+                "sr_id": db_response.sr_id
+            })
+
+        return {
+            "code": 200,
+            "message": "Service response created successfully",
+            "data": {"id": db_response.response_id}
+        }
+
+    # Retries carrying the same key replay the stored response instead of inserting again
+    return run_idempotent(
+        idempotency_key, f"{current_user.id}:POST:service-responses", response,
+        create, status.HTTP_201_CREATED
+    )
 
 @router.put("/{response_id}")
 def update_service_response(
@@ -147,9 +208,7 @@ def cancel_service_response(
         )
 
     # Set response_state to 3 (cancelled)
-    db_response.response_state = 3
-    db.commit()
-    db.refresh(db_response)
+    db_response = crud_service_response.cancel_service_response(db, response_id)
 
     return {
         "code": 200,
@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.dependencies import get_current_user, get_current_admin
 from app.crud import stats as crud_stats
+from app.crud import report as crud_report
+from app.crud import latency as crud_latency
+from app.core.export import stream_csv, stream_xlsx
 from app.models.city_info import CityInfo
+from app.models.service_type import ServiceType
 
 router = APIRouter()
 
@@ -26,7 +31,8 @@ def get_monthly_statistics(
             city_id = city.cityID
         else:
             city_id = None  # No matching city found
-    
+
+    _month_range(start_month, end_month)
     result = crud_stats.get_monthly_statistics(
         db, start_month, end_month, city_id, service_type_id, page, size
     )
@@ -35,3 +41,137 @@ def get_monthly_statistics(
         "code": 200,
         "data": result
     }
+
+
+@router.get("/monthly/export")
+def export_monthly_statistics(
+    start_month: str = Query(..., description="Start month in YYYY-MM format"),
+    end_month: str = Query(..., description="End month in YYYY-MM format"),
+    city_id: int = Query(None, description="Filter by city ID"),
+    service_type_id: int = Query(None, description="Filter by service type ID"),
+    by_city: bool = Query(False, description="One row per month and city"),
+    by_service_type: bool = Query(False, description="One row per month and service type"),
+    format: str = Query("csv", pattern="^(csv|xlsx)$"),
+    db: Session = Depends(get_db),
+    current_admin = Depends(get_current_admin)
+):
+    """Full monthly statistics table as a streamed CSV or XLSX download"""
+    first_bucket, last_bucket = _month_range(start_month, end_month)
+    dimensions = tuple(name for name, wanted in (("city", by_city), ("stype", by_service_type)) if wanted)
+
+    header = ["month"]
+    if by_city:
+        header += ["city_id", "city_name"]
+        city_names = dict(db.query(CityInfo.cityID, CityInfo.cityName))
+    if by_service_type:
+        header += ["service_type_id", "service_type_name"]
+        stype_names = dict(db.query(ServiceType.id, ServiceType.typename))
+    header += ["published", "completed"]
+
+    def rows():
+        # Runs while the response streams, after get_db has closed the session;
+        # the session checks a connection out again and must release it here
+        try:
+            for bucket, *values in crud_stats.iter_monthly_rows(
+                db, first_bucket, last_bucket, city_id, service_type_id, dimensions
+            ):
+                row = [crud_stats.bucket_label(bucket)]
+                if by_city:
+                    row += [values[0], city_names.get(values[0])]
+                if by_service_type:
+                    stype_id = values[len(dimensions) - 1]
+                    row += [stype_id, stype_names.get(stype_id)]
+                yield row + values[-2:]
+        finally:
+            db.close()
+
+    filename = f"monthly_stats_{start_month}_{end_month}.{format}"
+    if format == "xlsx":
+        body = stream_xlsx(header, rows(), sheet_name="monthly")
+        media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    else:
+        body = stream_csv(header, rows())
+        media_type = "text/csv; charset=utf-8"
+    return StreamingResponse(body, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+@router.get("/cache")
+def get_statistics_cache(
+    current_admin = Depends(get_current_admin)
+):
+    """Hit/miss counts of the statistics result caches in this worker"""
+    return {
+        "code": 200,
+        "data": crud_stats.cache_stats()
+    }
+
+
+def _month_range(start_month: str, end_month: str):
+    """Validated (first, last) month buckets"""
+    try:
+        first_bucket = crud_stats.parse_month(start_month)
+        last_bucket = crud_stats.parse_month(end_month)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Months must be in YYYY-MM format")
+    if last_bucket < first_bucket:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end_month is before start_month")
+    return first_bucket, last_bucket
+
+
+@router.get("/cube")
+def get_statistics_cube(
+    start_month: str = Query(..., description="Start month in YYYY-MM format"),
+    end_month: str = Query(..., description="End month in YYYY-MM format"),
+    db: Session = Depends(get_db),
+    current_admin = Depends(get_current_admin)
+):
+    """Month x city x service type published/completed counts from the report rollup"""
+    first_bucket, last_bucket = _month_range(start_month, end_month)
+    return {
+        "code": 200,
+        "data": crud_stats.get_cube(db, first_bucket, last_bucket)
+    }
+
+
+@router.post("/cube/rebuild")
+def rebuild_statistics_cube(
+    db: Session = Depends(get_db),
+    current_admin = Depends(get_current_admin)
+):
+    """Recompute the report rollup from the request and accept tables"""
+    rows = crud_report.rebuild_report(db)
+    return {
+        "code": 200,
+        "data": {"rows": rows}
+    }
+
+
+@router.get("/latency")
+def get_latency_statistics(
+    start_month: str = Query(..., description="Start month in YYYY-MM format"),
+    end_month: str = Query(..., description="End month in YYYY-MM format"),
+    city_id: int = Query(None, description="Filter by city ID"),
+    service_type_id: int = Query(None, description="Filter by service type ID"),
+    db: Session = Depends(get_db),
+    current_admin = Depends(get_current_admin)
+):
+    """Time to first response and time to accept: p50/p90/p99 and histograms per month"""
+    first_bucket, last_bucket = _month_range(start_month, end_month)
+    return {
+        "code": 200,
+        "data": crud_latency.get_latency(db, first_bucket, last_bucket, city_id, service_type_id)
+    }
+
+
+@router.post("/latency/rebuild")
+def rebuild_latency_statistics(
+    db: Session = Depends(get_db),
+    current_admin = Depends(get_current_admin)
+):
+    """Recompute the latency sketches from the response and accept tables"""
+    sketches = crud_latency.rebuild_latency(db)
+    return {
+        "code": 200,
+        "data": {"sketches": sketches}
+    }
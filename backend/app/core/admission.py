@@ -0,0 +1,188 @@
+"""
+Admission control for database-bound requests.
+
+Requests are split into route classes: "analytic" (ANALYTIC_ROUTE_PREFIXES,
+i.e. /stats) and "interactive" (every other API route). Each class has
+
+- its own connection pools (see app.database), so a burst of wide
+  statistics queries cannot take the connections interactive endpoints need,
+- a statement timeout, sent to MySQL as a MAX_EXECUTION_TIME hint on
+  every SELECT,
+- a concurrency limit with a bounded FIFO queue: requests beyond the limit
+  wait up to ADMISSION_QUEUE_TIMEOUT_SECONDS for a slot, and get a 503 with
+  Retry-After right away once the queue is full.
+
+The concurrency limit defaults to the class's pool size plus overflow, so
+requests queue here (and fail fast) instead of blocking in the pool.
+"""
+import asyncio
+import logging
+from collections import deque
+from starlette.responses import JSONResponse
+from sqlalchemy import event
+from app.core.config import settings
+from app.core.metrics import ADMISSION_REJECTED
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+ANALYTIC = "analytic"
+ROUTE_CLASSES = (INTERACTIVE, ANALYTIC)
+
+# MySQL: "Query execution was interrupted, maximum statement execution time exceeded"
+MYSQL_STATEMENT_TIMEOUT = 3024
+
+
+def route_class(path: str):
+    """Route class of `path`, or None for paths admission control does not apply to"""
+    if not path.startswith(settings.API_V1_PREFIX):
+        return None
+    if any(path.startswith(prefix) for prefix in settings.ADMISSION_EXEMPT_PREFIXES):
+        return None
+    if any(path.startswith(prefix) for prefix in settings.ANALYTIC_ROUTE_PREFIXES):
+        return ANALYTIC
+    return INTERACTIVE
+
+
+def pool_options(route_class: str) -> dict:
+    if route_class == ANALYTIC:
+        return {"pool_size": settings.DB_POOL_SIZE_ANALYTIC, "max_overflow": settings.DB_MAX_OVERFLOW_ANALYTIC}
+    return {"pool_size": settings.DB_POOL_SIZE_INTERACTIVE, "max_overflow": settings.DB_MAX_OVERFLOW_INTERACTIVE}
+
+
+def statement_timeout_ms(route_class: str) -> int:
+    if route_class == ANALYTIC:
+        return settings.STATEMENT_TIMEOUT_MS_ANALYTIC
+    return settings.STATEMENT_TIMEOUT_MS_INTERACTIVE
+
+
+# Statement timeouts
+
+def add_execution_time_hint(statement: str, timeout_ms: int) -> str:
+    """Put a MAX_EXECUTION_TIME optimizer hint after the leading SELECT; other statements are unchanged"""
+    stripped = statement.lstrip()
+    if timeout_ms <= 0 or stripped[:6].upper() != "SELECT" or stripped[6:9] == " /*":
+        return statement
+    return f"{stripped[:6]} /*+ MAX_EXECUTION_TIME({int(timeout_ms)}) */{stripped[6:]}"
+
+
+def limit_statement_time(engine, timeout_ms: int):
+    """Give every SELECT run through a MySQL `engine` a server-side time limit"""
+    if engine.dialect.name != "mysql" or timeout_ms <= 0:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute", retval=True)
+    def add_hint(conn, cursor, statement, parameters, context, executemany):
+        return add_execution_time_hint(statement, timeout_ms), parameters
+
+
+def is_statement_timeout(exc) -> bool:
+    args = getattr(getattr(exc, "orig", None), "args", ())
+    return bool(args) and args[0] == MYSQL_STATEMENT_TIMEOUT
+
+
+async def statement_timeout_handler(request, exc):
+    """Exception handler for OperationalError: a timed-out query is a 503, anything else stays a 500"""
+    if not is_statement_timeout(exc):
+        raise exc
+    ADMISSION_REJECTED.inc(route_class(request.url.path) or INTERACTIVE, "statement_timeout")
+    return JSONResponse(status_code=503, content={"detail": "Query took too long, try a narrower range"},
+                        headers={"Retry-After": "5"})
+
+
+# Concurrency limits
+
+class ConcurrencyLimiter:
+    """
+    At most `limit` holders at a time and at most `queue_size` waiters in FIFO order.
+
+    Used from the event loop only, so it needs no locks. A released slot is
+    handed directly to the oldest waiter, which keeps the queue fair.
+    """
+
+    def __init__(self, limit: int, queue_size: int, queue_timeout: float):
+        self.limit = max(1, limit)
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self):
+        """None once a slot is held, otherwise why it was refused ("queue_full" or "queue_timeout")"""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return None
+        if len(self._waiters) >= self.queue_size:
+            return "queue_full"
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+            return None
+        except asyncio.TimeoutError:
+            return "queue_timeout"
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # the slot was handed over just as the client went away
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "active": self.active, "queued": self.queued, "queue_size": self.queue_size}
+
+
+_limiters = {}
+
+
+def get_limiter(route_class: str) -> ConcurrencyLimiter:
+    if route_class not in _limiters:
+        if route_class == ANALYTIC:
+            limit, queue_size = settings.ADMISSION_CONCURRENCY_ANALYTIC, settings.ADMISSION_QUEUE_ANALYTIC
+        else:
+            limit, queue_size = settings.ADMISSION_CONCURRENCY_INTERACTIVE, settings.ADMISSION_QUEUE_INTERACTIVE
+        if not limit:
+            options = pool_options(route_class)
+            limit = options["pool_size"] + options["max_overflow"]
+        _limiters[route_class] = ConcurrencyLimiter(limit, queue_size, settings.ADMISSION_QUEUE_TIMEOUT_SECONDS)
+    return _limiters[route_class]
+
+
+class AdmissionMiddleware:
+    """ASGI middleware holding a slot of the request's route class for the whole request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        name = route_class(scope["path"]) if scope["type"] == "http" else None
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = get_limiter(name)
+        refused = await limiter.acquire()
+        if refused:
+            ADMISSION_REJECTED.inc(name, refused)
+            logger.warning(f"Rejected {scope['path']}: {name} requests saturated ({refused})")
+            response = JSONResponse(status_code=503, content={"detail": "Server busy, retry later"},
+                                    headers={"Retry-After": "1"})
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
@@ -0,0 +1,249 @@
+"""
+Response compression with Accept-Encoding negotiation.
+
+Supports zstd and brotli when the optional `zstandard` / `brotli`
+packages are installed, and gzip always. When the client accepts
+several with the same q-value the server prefers zstd, then br, then
+gzip.
+
+Responses are sent as they are when they are smaller than
+COMPRESSION_MIN_SIZE, already encoded, of a media type that is already
+compressed (images, video, archives, XLSX) or server-sent events, or
+under COMPRESSION_SKIP_PREFIXES (the uploaded files). Single-body
+responses of at least COMPRESSION_THREAD_MIN_SIZE bytes are compressed
+in the threadpool so the event loop keeps serving other requests;
+streamed responses are compressed chunk by chunk and flushed after each
+chunk.
+"""
+import gzip
+import zlib
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from app.core.config import settings
+
+# Media types (or prefixes ending in "/") not worth compressing again
+INCOMPRESSIBLE_TYPES = (
+    "image/", "video/", "audio/", "text/event-stream",
+    "application/zip", "application/gzip", "application/x-gzip", "application/zstd", "application/pdf",
+    "application/vnd.openxmlformats-officedocument.",
+)
+
+
+class GzipCodec:
+    name = "gzip"
+
+    def __init__(self, level: int):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return gzip.compress(data, self.level, mtime=0)
+
+    def stream(self):
+        return _ZlibStream(zlib.compressobj(self.level, zlib.DEFLATED, 31))
+
+
+class _ZlibStream:
+    def __init__(self, compressor):
+        self._compressor = compressor
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliCodec:
+    name = "br"
+
+    def __init__(self, quality: int):
+        import brotli
+
+        self._brotli = brotli
+        self.quality = quality
+
+    def compress(self, data: bytes) -> bytes:
+        return self._brotli.compress(data, quality=self.quality)
+
+    def stream(self):
+        return _BrotliStream(self._brotli.Compressor(quality=self.quality))
+
+
+class _BrotliStream:
+    def __init__(self, compressor):
+        self._compressor = compressor
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.process(chunk) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdCodec:
+    name = "zstd"
+
+    def __init__(self, level: int):
+        import zstandard
+
+        self._zstandard = zstandard
+        self.level = level
+
+    # ZstdCompressor is not thread-safe and its compressobj() streams share its context,
+    # so each threadpool compress() and each streamed response gets its own
+    def compress(self, data: bytes) -> bytes:
+        return self._zstandard.ZstdCompressor(level=self.level).compress(data)
+
+    def stream(self):
+        compressor = self._zstandard.ZstdCompressor(level=self.level)
+        return _ZstdStream(compressor.compressobj(), self._zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+
+class _ZstdStream:
+    def __init__(self, compressor, flush_block):
+        self._compressor = compressor
+        self._flush_block = flush_block
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk) + self._compressor.flush(self._flush_block)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def create_codecs() -> dict:
+    """Available codecs by content coding, in server preference order"""
+    codecs = {}
+    for name, factory, level in (
+        ("zstd", ZstdCodec, settings.COMPRESSION_ZSTD_LEVEL),
+        ("br", BrotliCodec, settings.COMPRESSION_BROTLI_QUALITY),
+        ("gzip", GzipCodec, settings.COMPRESSION_GZIP_LEVEL),
+    ):
+        try:
+            codecs[name] = factory(level)
+        except ImportError:
+            continue
+    return codecs
+
+
+_codecs = None
+
+
+def get_codecs() -> dict:
+    global _codecs
+    if _codecs is None:
+        _codecs = create_codecs()
+    return _codecs
+
+
+def negotiate(accept_encoding: str, codecs: dict):
+    """The codec to use for `accept_encoding`, or None to send the body unencoded"""
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding.strip()] = q
+    default = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for name, codec in codecs.items():
+        q = weights.get(name, default)
+        if q > best_q:
+            best, best_q = codec, q
+    return best
+
+
+def is_compressible(headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "").lower()
+    return not content_type.startswith(INCOMPRESSIBLE_TYPES)
+
+
+class _CompressingSend:
+    """Wraps `send` for one response, deciding on the first body message"""
+
+    def __init__(self, send, codec):
+        self._send = send
+        self._codec = codec
+        self._start = None
+        self._stream = None
+        self._passthrough = False
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self._start = message
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+        if self._passthrough:
+            await self._send(message)
+            return
+        if self._stream is not None:
+            await self._send_chunk(message)
+            return
+
+        headers = MutableHeaders(scope=self._start)
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if not is_compressible(headers):
+            self._passthrough = True
+            await self._send(self._start)
+            await self._send(message)
+            return
+
+        headers.add_vary_header("Accept-Encoding")
+        if not more_body:
+            if len(body) >= settings.COMPRESSION_MIN_SIZE:
+                if len(body) >= settings.COMPRESSION_THREAD_MIN_SIZE:
+                    body = await run_in_threadpool(self._codec.compress, body)
+                else:
+                    body = self._codec.compress(body)
+                headers["Content-Encoding"] = self._codec.name
+                headers["Content-Length"] = str(len(body))
+                message = {**message, "body": body}
+            self._passthrough = True
+            await self._send(self._start)
+            await self._send(message)
+            return
+
+        # Streamed response: its length is unknown, so compress whatever size it turns out to be
+        self._stream = self._codec.stream()
+        headers["Content-Encoding"] = self._codec.name
+        if "content-length" in headers:
+            del headers["content-length"]
+        await self._send(self._start)
+        await self._send_chunk(message)
+
+    async def _send_chunk(self, message):
+        data = self._stream.compress(message.get("body", b""))
+        more_body = message.get("more_body", False)
+        if not more_body:
+            data += self._stream.finish()
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with the best encoding the client accepts"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or not settings.COMPRESSION_ENABLED
+                or any(scope["path"].startswith(prefix) for prefix in settings.COMPRESSION_SKIP_PREFIXES)):
+            await self.app(scope, receive, send)
+            return
+        codec = negotiate(Headers(scope=scope).get("accept-encoding", ""), get_codecs())
+        if codec is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(send, codec))
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from pydantic import field_validator
-from typing import List, Union
+from functools import lru_cache
+from typing import Dict, List, Union
 import json
 
 
@@ -17,10 +18,115 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 24 hours
 
+    # Typeahead
+    SUGGEST_CACHE_TTL_SECONDS: int = 300
+    SUGGEST_MAX_TITLES: int = 5000  # most frequent distinct sr_title values kept in the index
+
+    # Server-sent events
+    EVENT_BACKEND: str = "local"  # "local" (single worker) or "redis" (shared across workers)
+    EVENT_REDIS_URL: str = "redis://localhost:6379/0"
+    EVENT_CHANNEL: str = "goodservices:events"
+    EVENT_QUEUE_SIZE: int = 100  # per connection; events beyond this are dropped
+    EVENT_KEEPALIVE_SECONDS: int = 15
+
+    # Outbox
+    OUTBOX_DISPATCH_ENABLED: bool = True
+    OUTBOX_BATCH_SIZE: int = 200
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 1.0
+    # Events newer than this are left for the next poll: a transaction that got a lower id may not have committed yet
+    OUTBOX_SAFETY_LAG_SECONDS: float = 5.0
+    OUTBOX_RETENTION_DAYS: int = 7
+
+    # Delta sync
+    SYNC_SAFETY_LAG_SECONDS: int = 5  # watermark trails "now" so in-flight commits are not skipped
+    SYNC_MAX_CHANGES: int = 1000  # more changes than this and the client is told to reload
+
+    # Batch lookups (GET /service-requests/batch, /service-responses/batch)
+    BATCH_MAX_IDS: int = 100
+
+    # Idempotency-Key handling for POST endpoints
+    IDEMPOTENCY_TTL_SECONDS: int = 60 * 60 * 24
+    IDEMPOTENCY_MAX_KEYS: int = 100000
+    IDEMPOTENCY_WAIT_SECONDS: int = 30  # how long a duplicate waits for the in-flight original
+    IDEMPOTENCY_BACKEND: str = "local"  # "local" (per worker) or "redis" (shared across workers)
+    IDEMPOTENCY_REDIS_URL: str = "redis://localhost:6379/0"
+    IDEMPOTENCY_CLAIM_SECONDS: float = 10.0  # lease on an in-flight redis claim, renewed while the handler runs
+
+    # Metrics
+    METRICS_MULTIPROC_DIR: str = ""  # shared directory for per-worker snapshots; empty = single process
+    METRICS_FLUSH_INTERVAL_SECONDS: float = 1.0
+
+    # Profiler
+    PROFILER_MAX_SECONDS: int = 60
+
+    # Readiness
+    READY_DB_PROBE_INTERVAL_SECONDS: float = 2.0  # DB probe result is reused for this long
+    READY_POOL_SATURATION: float = 0.9  # not ready when this share of pool + overflow is checked out
+    READY_WARMUP_RETRY_SECONDS: float = 2.0
+
+    # Statistics
+    STATS_CACHE_MAX_ENTRIES: int = 1024  # cached /stats/monthly results
+    STATS_CACHE_OPEN_TTL_SECONDS: int = 30  # for ranges reaching the current month
+    STATS_CACHE_CLOSED_TTL_SECONDS: int = 300  # closed months change only on back-dated writes, seen late by other workers
+    STATS_CUBE_CACHE_TTL_SECONDS: int = 300  # safety net; rollup updates invalidate the months they touch
+    STATS_CUBE_CACHE_MAX_RANGES: int = 256
+    LATENCY_SKETCH_RELATIVE_ACCURACY: float = 0.01  # changing it requires POST /stats/latency/rebuild
+
+    # Production server (serve.py)
+    SERVER_WORKERS: int = 1  # 0 = one per CPU; use EVENT_BACKEND=redis with more than one
+    SERVER_MAX_REQUESTS: int = 0  # recycle a worker after this many requests; 0 = never
+    SERVER_MAX_REQUESTS_JITTER: int = 0  # random extra requests per worker, so they do not recycle together
+    SERVER_GRACEFUL_TIMEOUT_SECONDS: int = 30
+
+    # Read replicas
+    DATABASE_REPLICA_URLS: Union[str, List[str]] = []  # GET requests read from these; empty = primary only
+    REPLICA_RETRY_SECONDS: float = 30.0  # a replica that failed is skipped for this long
+    READ_YOUR_WRITES_SECONDS: float = 5.0  # a user who just wrote reads from the primary for this long
+
+    # Admission control: /stats is "analytic", every other API route "interactive"
+    ANALYTIC_ROUTE_PREFIXES: Union[str, List[str]] = ["/api/v1/stats"]
+    ADMISSION_EXEMPT_PREFIXES: Union[str, List[str]] = ["/api/v1/events", "/api/v1/admin/profile"]  # long-lived, no DB
+    DB_POOL_SIZE_INTERACTIVE: int = 5  # per engine (primary and each replica)
+    DB_MAX_OVERFLOW_INTERACTIVE: int = 10
+    DB_POOL_SIZE_ANALYTIC: int = 2
+    DB_MAX_OVERFLOW_ANALYTIC: int = 2
+    STATEMENT_TIMEOUT_MS_INTERACTIVE: int = 5000  # MySQL MAX_EXECUTION_TIME for SELECTs; 0 = no limit
+    STATEMENT_TIMEOUT_MS_ANALYTIC: int = 60000
+    ADMISSION_CONCURRENCY_INTERACTIVE: int = 0  # concurrent requests; 0 = pool size + overflow
+    ADMISSION_CONCURRENCY_ANALYTIC: int = 0
+    ADMISSION_QUEUE_INTERACTIVE: int = 100  # requests waiting for a slot; beyond this they get 503 at once
+    ADMISSION_QUEUE_ANALYTIC: int = 8
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 2.0
+
+    # Rate limiting: "<METHOD> <exact path>" -> "<requests>/<second|minute|hour>" per user (JWT sub) or IP
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_RULES: Dict[str, str] = {
+        "POST /api/v1/auth/login": "10/minute",
+        "POST /api/v1/files/upload": "30/minute",
+        "GET /api/v1/service-requests": "120/minute",
+        "GET /api/v1/service-requests/my": "120/minute",
+        "GET /api/v1/service-responses": "120/minute",
+        "GET /api/v1/service-responses/my": "120/minute",
+    }
+    RATE_LIMIT_BACKEND: str = "local"  # "local" (per worker) or "redis" (shared across workers)
+    RATE_LIMIT_REDIS_URL: str = "redis://localhost:6379/0"
+    RATE_LIMIT_COMPACT_INTERVAL_SECONDS: float = 60.0  # how often full buckets are dropped from the local store
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False  # key anonymous clients by X-Forwarded-For (behind a proxy)
+
+    # Response compression (zstd and br need the optional zstandard / brotli packages)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024  # bytes; smaller bodies are not worth the CPU
+    COMPRESSION_THREAD_MIN_SIZE: int = 64 * 1024  # bodies this big are compressed off the event loop
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_ZSTD_LEVEL: int = 3
+    COMPRESSION_SKIP_PREFIXES: Union[str, List[str]] = ["/api/v1/files"]  # uploaded images and videos
+
     # CORS
     CORS_ORIGINS: Union[str, List[str]] = ["http://localhost","http://localhost:80","http://127.0.0.1","http://localhost:8000", "http://localhost:5173", "http://localhost:3000"]
 
-    @field_validator('CORS_ORIGINS', mode='before')
+    @field_validator('CORS_ORIGINS', 'DATABASE_REPLICA_URLS', 'ANALYTIC_ROUTE_PREFIXES', 'ADMISSION_EXEMPT_PREFIXES',
+                     'COMPRESSION_SKIP_PREFIXES', mode='before')
     @classmethod
     def parse_cors_origins(cls, v):
         if isinstance(v, str):
@@ -29,7 +135,7 @@ class Settings(BaseSettings):
                 return json.loads(v)
             except json.JSONDecodeError:
                 # Fall back to comma-separated values
-                return [origin.strip() for origin in v.split(',')]
+                return [origin.strip() for origin in v.split(',') if origin.strip()]
         return v
 
     class Config:
@@ -37,4 +143,15 @@ class Settings(BaseSettings):
         case_sensitive = True
 
 
-settings = Settings()
+@lru_cache
+def get_settings() -> Settings:
+    """The process-wide settings, read from the environment on first use"""
+    return Settings()
+
+
+def __getattr__(name):
+    # `from app.core.config import settings` keeps working, but nothing is
+    # parsed until some module actually imports the name
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,43 @@
+"""
+Weak ETags and If-None-Match handling for detail endpoints.
+
+The ETag is a hash of the columns every change to a resource touches
+(primary key, update timestamp, state and the row_version counter that
+every UPDATE bumps, since the timestamp has one-second resolution), so
+it can be computed from a narrow primary-key lookup without loading or
+serializing the resource.
+It is weak because the body may be re-encoded (compression) or differ in
+related display fields (names) that do not bump the resource version.
+"""
+import hashlib
+from fastapi.responses import Response
+
+# Authenticated responses: browsers may keep them but must revalidate before reuse
+CACHE_CONTROL = "private, no-cache"
+
+
+def weak_etag(*parts) -> str:
+    """W/"<hash>" of the version columns of one resource"""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=8).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of `etag` against an If-None-Match header value"""
+    if not if_none_match:
+        return False
+    opaque = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == opaque:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
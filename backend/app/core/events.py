@@ -0,0 +1,190 @@
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Event types pushed to clients
+RESPONSE_CREATED = "response.created"
+RESPONSE_ACCEPTED = "response.accepted"
+RESPONSE_REJECTED = "response.rejected"
+REQUEST_CANCELLED = "request.cancelled"
+
+
+class LocalEventBackend:
+    """In-process backend: every published message is delivered back to this worker only"""
+
+    def start(self, deliver):
+        self._deliver = deliver
+
+    def publish(self, message: dict):
+        self._deliver(message)
+
+    def close(self):
+        pass
+
+
+class RedisEventBackend:
+    """Cross-worker backend over Redis pub/sub (needs the optional `redis` package)"""
+
+    def __init__(self, url: str, channel: str):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._channel = channel
+        self._pubsub = None
+        self._thread = None
+
+    def start(self, deliver):
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{self._channel: lambda raw: deliver(json.loads(raw["data"]))})
+        self._thread = self._pubsub.run_in_thread(sleep_time=0.5, daemon=True)
+
+    def publish(self, message: dict):
+        self._client.publish(self._channel, json.dumps(message, default=str))
+
+    def close(self):
+        if self._thread:
+            self._thread.stop()
+        if self._pubsub:
+            self._pubsub.close()
+
+
+def create_backend():
+    if settings.EVENT_BACKEND == "redis":
+        return RedisEventBackend(settings.EVENT_REDIS_URL, settings.EVENT_CHANNEL)
+    return LocalEventBackend()
+
+
+class Subscription:
+    """One connected SSE client; messages are queued on the client's event loop"""
+
+    def __init__(self, user_id: int, loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+
+class EventBus:
+    """
+    Per-user pub/sub for server-sent events.
+
+    `publish` may be called from any thread (sync endpoints run in the
+    threadpool); delivery hops onto each subscriber's loop with
+    call_soon_threadsafe. Messages go through the backend so a shared
+    backend fans them out to every worker.
+    """
+
+    def __init__(self, backend=None):
+        self._backend = backend
+        self._started = False
+        self._lock = threading.Lock()
+        self._subscribers = {}  # user_id -> set of Subscription
+        self._ids = itertools.count(1)
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.fanout_count = 0
+        self.fanout_seconds_total = 0.0
+        self.fanout_seconds_max = 0.0
+
+    def _ensure_started(self):
+        if self._started:
+            return
+        with self._lock:
+            if not self._started:
+                if self._backend is None:
+                    self._backend = create_backend()
+                self._backend.start(self._deliver)
+                self._started = True
+
+    def subscribe(self, user_id: int) -> Subscription:
+        self._ensure_started()
+        sub = Subscription(user_id, asyncio.get_running_loop(), settings.EVENT_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            subs = self._subscribers.get(sub.user_id)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.user_id]
+
+    def publish(self, event_type: str, user_ids, data: dict):
+        """Send an event to every connection of the given users"""
+        user_ids = sorted({int(uid) for uid in user_ids if uid is not None})
+        if not user_ids:
+            return
+        self._ensure_started()
+        message = {
+            "id": f"{time.time_ns()}-{next(self._ids)}",
+            "type": event_type,
+            "users": user_ids,
+            "data": data,
+            "ts": time.time()
+        }
+        self.published += 1
+        try:
+            self._backend.publish(message)
+        except Exception as e:
+            # Notifications are best effort; never fail the write that triggered them
+            logger.error(f"Failed to publish event {event_type}: {str(e)}")
+
+    def _deliver(self, message: dict):
+        with self._lock:
+            targets = [sub for uid in message["users"] for sub in self._subscribers.get(uid, ())]
+        for sub in targets:
+            try:
+                sub.loop.call_soon_threadsafe(self._enqueue, sub, message)
+            except RuntimeError:
+                # Loop already closed, the connection is going away
+                self.dropped += 1
+
+    def _enqueue(self, sub: Subscription, message: dict):
+        try:
+            sub.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return
+        latency = max(time.time() - message["ts"], 0.0)
+        self.delivered += 1
+        self.fanout_count += 1
+        self.fanout_seconds_total += latency
+        self.fanout_seconds_max = max(self.fanout_seconds_max, latency)
+
+    def stats(self) -> dict:
+        with self._lock:
+            connections = sum(len(subs) for subs in self._subscribers.values())
+            users = len(self._subscribers)
+        return {
+            "backend": type(self._backend).__name__ if self._backend else None,
+            "connections": connections,
+            "connected_users": users,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "fanout_latency_avg_ms": round(self.fanout_seconds_total / self.fanout_count * 1000, 3) if self.fanout_count else 0.0,
+            "fanout_latency_max_ms": round(self.fanout_seconds_max * 1000, 3)
+        }
+
+    def close(self):
+        with self._lock:
+            if self._started:
+                self._backend.close()
+                self._started = False
+
+
+def format_sse(message: dict) -> str:
+    """Serialize a bus message as one text/event-stream frame"""
+    payload = json.dumps(message["data"], default=str, ensure_ascii=False)
+    return f"id: {message['id']}\nevent: {message['type']}\ndata: {payload}\n\n"
+
+
+event_bus = EventBus()
@@ -0,0 +1,141 @@
+import logging
+import tempfile
+import threading
+import time
+from sqlalchemy import text
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _default_engine():
+    from app import database
+    return database.engine
+
+
+def _default_upload_dir():
+    from app.api.v1.files import UPLOAD_DIR
+    return UPLOAD_DIR
+
+
+def _timed(check) -> dict:
+    start = time.perf_counter()
+    try:
+        ok, detail = check()
+    except Exception as e:
+        ok, detail = False, str(e)
+    return {"ok": ok, "latency_ms": round((time.perf_counter() - start) * 1000, 3), "detail": detail}
+
+
+class ReadinessChecker:
+    """
+    Dependency checks behind /ready.
+
+    The DB probe is cached for READY_DB_PROBE_INTERVAL_SECONDS and only
+    one caller runs it at a time, so a load balancer polling every worker
+    cannot turn /ready into DB load. Until warm_up() has finished the
+    worker reports not ready without running any check.
+    """
+
+    def __init__(self, get_engine=None, get_upload_dir=None, session_factory=None):
+        self._get_engine = get_engine or _default_engine
+        self._get_upload_dir = get_upload_dir or _default_upload_dir
+        self._session_factory = session_factory
+        self.warm = False
+        self.warm_error = None
+        self._probe_lock = threading.Lock()
+        self._db_result = None
+        self._db_checked_at = 0.0
+
+    def _probe_database(self):
+        with self._get_engine().connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True, "SELECT 1 succeeded"
+
+    def check_database(self) -> dict:
+        fresh = time.monotonic() - self._db_checked_at < settings.READY_DB_PROBE_INTERVAL_SECONDS
+        if self._db_result is not None and fresh:
+            return {**self._db_result, "cached": True}
+        if not self._probe_lock.acquire(blocking=False):
+            # Someone else is probing right now; report the last known state
+            if self._db_result is not None:
+                return {**self._db_result, "cached": True}
+            return {"ok": False, "latency_ms": 0.0, "detail": "probe in progress", "cached": True}
+        try:
+            self._db_result = _timed(self._probe_database)
+            self._db_checked_at = time.monotonic()
+            return {**self._db_result, "cached": False}
+        finally:
+            self._probe_lock.release()
+
+    def check_pool(self) -> dict:
+        def check():
+            pool = self._get_engine().pool
+            if not hasattr(pool, "checkedout"):
+                return True, f"{type(pool).__name__} has no size limit"
+            capacity = pool.size() + max(getattr(pool, "_max_overflow", 0), 0)
+            in_use = pool.checkedout()
+            saturation = in_use / capacity if capacity else 0.0
+            detail = f"{in_use}/{capacity} connections in use"
+            return saturation < settings.READY_POOL_SATURATION, detail
+        return _timed(check)
+
+    def check_upload_dir(self) -> dict:
+        def check():
+            upload_dir = self._get_upload_dir()
+            with tempfile.NamedTemporaryFile(dir=upload_dir, prefix=".ready-"):
+                pass
+            return True, f"{upload_dir} is writable"
+        return _timed(check)
+
+    def check_caches(self) -> dict:
+        def check():
+            from app.crud import suggest as crud_suggest
+            warm = crud_suggest.is_warm()
+            return warm, "reference caches loaded" if warm else "reference caches cold"
+        return _timed(check)
+
+    def run(self):
+        """Return (ready, checks)"""
+        if not self.warm:
+            detail = f"warm-up failed: {self.warm_error}" if self.warm_error else "warming up"
+            return False, {"startup": {"ok": False, "latency_ms": 0.0, "detail": detail}}
+
+        checks = {
+            "database": self.check_database(),
+            "pool": self.check_pool(),
+            "upload_dir": self.check_upload_dir(),
+            "caches": self.check_caches(),
+        }
+        return all(check["ok"] for check in checks.values()), checks
+
+    def warm_up(self):
+        """Load reference caches; the worker becomes ready once this succeeds"""
+        from app.crud import suggest as crud_suggest
+
+        if self._session_factory is None:
+            from app.database import SessionLocal
+            self._session_factory = SessionLocal
+        db = self._session_factory()
+        try:
+            crud_suggest.warm_indexes(db)
+            self.warm = True
+            self.warm_error = None
+        except Exception as e:
+            self.warm_error = str(e)
+            logger.error(f"Warm-up failed: {str(e)}")
+        finally:
+            db.close()
+
+    def start_warm_up(self):
+        """Warm up in the background, retrying until it succeeds"""
+        def run():
+            while not self.warm:
+                self.warm_up()
+                if not self.warm:
+                    time.sleep(settings.READY_WARMUP_RETRY_SECONDS)
+
+        threading.Thread(target=run, name="warm-up", daemon=True).start()
+
+
+readiness = ReadinessChecker()
@@ -0,0 +1,272 @@
+"""
+Idempotency-Key handling for POST endpoints.
+
+The first request with a key runs and its response is stored for
+IDEMPOTENCY_TTL_SECONDS; retries with the same key and body replay it.
+The default "local" store lives in one process, so it only protects
+retries that reach the same worker: with several workers (serve.py,
+SO_REUSEPORT) a retry on a new connection can land on another worker
+and repeat the write. Set IDEMPOTENCY_BACKEND=redis there; serve.py
+logs a warning when it starts several workers without it.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "expires_at", "done", "status_code", "body", "event")
+
+    def __init__(self, fingerprint: str, expires_at: float):
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+        self.done = False
+        self.status_code = None
+        self.body = None  # compact JSON bytes
+        self.event = threading.Event()
+
+
+class IdempotencyStore:
+    """
+    In-process map of idempotency key -> (status code, JSON body).
+
+    Entries live for `ttl` seconds and the store holds at most
+    `max_entries` keys; both are enforced by dropping from the front of
+    an insertion-ordered dict, so eviction is O(1) amortized. While the
+    first request for a key is still running, later requests with the
+    same key block on it and then replay its result. Failed executions
+    are not stored, so the client can retry them.
+    """
+
+    def __init__(self, ttl: int = None, max_entries: int = None):
+        self.ttl = ttl or settings.IDEMPOTENCY_TTL_SECONDS
+        self.max_entries = max_entries or settings.IDEMPOTENCY_MAX_KEYS
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _evict(self, now: float):
+        """Drop expired entries and make room for one more key"""
+        while self._entries:
+            entry = next(iter(self._entries.values()))
+            if entry.expires_at > now and len(self._entries) < self.max_entries:
+                break
+            # In-flight entries are never evicted, waiters still need them
+            if not entry.done:
+                break
+            self._entries.popitem(last=False)
+
+    def execute(self, key: str, fingerprint: str, func, status_code: int):
+        """
+        Run `func` once per key and return (status_code, body_bytes, replayed).
+
+        Raises HTTPException(422) when the key is reused with a different payload
+        and HTTPException(409) when the in-flight original takes too long.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._evict(now)
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = _Entry(fingerprint, now + self.ttl)
+                    self._entries[key] = entry
+                    owner = True
+                else:
+                    owner = False
+
+            if entry.fingerprint != fingerprint:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="Idempotency-Key was already used with a different request body"
+                )
+
+            if owner:
+                return self._run(key, entry, func, status_code)
+
+            if not entry.event.wait(settings.IDEMPOTENCY_WAIT_SECONDS):
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is still being processed"
+                )
+            if entry.done:
+                return entry.status_code, entry.body, True
+            # The original failed and was discarded; try to become the owner
+
+    def _run(self, key: str, entry: _Entry, func, status_code: int):
+        try:
+            body = json.dumps(jsonable_encoder(func()), separators=(",", ":"), ensure_ascii=False).encode()
+        except BaseException:
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            entry.event.set()
+            raise
+
+        entry.status_code = status_code
+        entry.body = body
+        entry.done = True
+        entry.event.set()
+        return status_code, body, False
+
+
+# The claim scripts act only while the key still holds the caller's claim (its owner token)
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_COMPLETE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+class RedisIdempotencyStore:
+    """
+    Idempotency store shared by every worker.
+
+    The first request claims the key with SET NX, storing a random owner
+    token. The claim is a lease of `claim_seconds` that a background
+    thread renews while the handler runs, so a slow handler keeps it and
+    a worker that dies mid-request releases it when the lease lapses.
+    Renewing, releasing and replacing the claim with the finished response
+    (kept for `ttl` seconds) are Lua compare-and-set scripts on the token,
+    so a worker that lost its claim never overwrites the new owner's.
+    Duplicates poll the key until the response is there.
+    """
+
+    POLL_SECONDS = 0.05
+
+    def __init__(self, url: str = None, ttl: int = None, prefix: str = "goodservices:idempotency:", client=None,
+                 claim_seconds: float = None):
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url or settings.IDEMPOTENCY_REDIS_URL)
+        self._client = client
+        self._release = client.register_script(_RELEASE_SCRIPT)
+        self._renew = client.register_script(_RENEW_SCRIPT)
+        self._complete = client.register_script(_COMPLETE_SCRIPT)
+        self.ttl = ttl or settings.IDEMPOTENCY_TTL_SECONDS
+        self.claim_seconds = claim_seconds or settings.IDEMPOTENCY_CLAIM_SECONDS
+        self._prefix = prefix
+
+    def execute(self, key: str, fingerprint: str, func, status_code: int):
+        """Same contract as IdempotencyStore.execute"""
+        key = self._prefix + key
+        while True:
+            claim = json.dumps({"fingerprint": fingerprint, "token": uuid.uuid4().hex})
+            if self._client.set(key, claim, nx=True, px=int(self.claim_seconds * 1000)):
+                return self._run(key, claim, fingerprint, func, status_code)
+
+            deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+            while True:
+                raw = self._client.get(key)
+                if raw is None:
+                    break  # the original failed or its claim lapsed; try to become the owner
+                entry = json.loads(raw)
+                if entry["fingerprint"] != fingerprint:
+                    raise HTTPException(
+                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        detail="Idempotency-Key was already used with a different request body"
+                    )
+                if "body" in entry:
+                    return entry["status_code"], entry["body"].encode(), True
+                if time.monotonic() > deadline:
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail="A request with this Idempotency-Key is still being processed"
+                    )
+                time.sleep(self.POLL_SECONDS)
+
+    def _keep_claim(self, key: str, claim: str, done: threading.Event):
+        """Renew the claim every third of its lease until `done` is set or the claim is lost"""
+        lease_ms = int(self.claim_seconds * 1000)
+        while not done.wait(self.claim_seconds / 3):
+            try:
+                if not self._renew(keys=[key], args=[claim, lease_ms]):
+                    logger.warning(f"Idempotency claim on {key} was lost while its request was running")
+                    return
+            except Exception as e:
+                # Keep trying, the lease has two more thirds to go
+                logger.error(f"Failed to renew idempotency claim on {key}: {str(e)}")
+
+    def _run(self, key: str, claim: str, fingerprint: str, func, status_code: int):
+        done = threading.Event()
+        threading.Thread(target=self._keep_claim, args=(key, claim, done), daemon=True).start()
+        try:
+            body = json.dumps(jsonable_encoder(func()), separators=(",", ":"), ensure_ascii=False).encode()
+        except BaseException:
+            done.set()
+            self._release(keys=[key], args=[claim])
+            raise
+        done.set()
+        result = json.dumps({"fingerprint": fingerprint, "status_code": status_code, "body": body.decode()})
+        if not self._complete(keys=[key], args=[claim, result, self.ttl]):
+            logger.warning(f"Idempotency claim on {key} was lost before its response was stored")
+        return status_code, body, False
+
+
+def create_store():
+    if settings.IDEMPOTENCY_BACKEND == "redis":
+        return RedisIdempotencyStore(settings.IDEMPOTENCY_REDIS_URL)
+    return IdempotencyStore()
+
+
+_store = None
+
+
+def get_idempotency_store():
+    global _store
+    if _store is None:
+        _store = create_store()
+    return _store
+
+
+def fingerprint(payload) -> str:
+    """Stable hash of a request body model"""
+    data = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def run_idempotent(idempotency_key: str, scope: str, payload, func, status_code: int):
+    """
+    Execute `func` (returning the JSON-able response body) at most once per
+    (scope, Idempotency-Key). Without a key `func` simply runs.
+    """
+    if not idempotency_key:
+        return func()
+
+    code, body, replayed = get_idempotency_store().execute(
+        f"{scope}:{idempotency_key}", fingerprint(payload), func, status_code
+    )
+    headers = {REPLAY_HEADER: "true"} if replayed else {}
+    return Response(content=body, status_code=code, media_type="application/json", headers=headers)
+
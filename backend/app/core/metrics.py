@@ -0,0 +1,361 @@
+import contextvars
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from sqlalchemy import event
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labelvalues):
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(v) for v in labelvalues)
+
+    def samples(self) -> list:
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labelvalues, amount: float = 1):
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *labelvalues):
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, *labelvalues, amount: float = 1):
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labelvalues, amount: float = 1):
+        self.inc(*labelvalues, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labelvalues):
+        key = self._key(labelvalues)
+        # Per-bucket (non-cumulative) counts; the last slot is +Inf
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> list:
+        with self._lock:
+            return [[list(key), [list(s[0]), s[1], s[2]]] for key, s in self._values.items()]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}"
+
+
+def _fmt(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """
+    Process-local metrics plus optional file-backed aggregation.
+
+    With METRICS_MULTIPROC_DIR set every worker writes its snapshot to
+    <dir>/<pid>.json from a background thread (start_flusher), off the
+    event loop and the request path, and /metrics merges all snapshots:
+    counters and histograms are summed over every file (so totals survive
+    recycled workers), gauges only over workers that are still alive.
+    """
+
+    def __init__(self, multiproc_dir: str = None):
+        self.multiproc_dir = multiproc_dir
+        self._metrics = {}
+        self._collectors = []
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+        self._flusher_stop = threading.Event()
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collect):
+        """`collect()` runs before every snapshot, typically to set gauges from live state"""
+        self._collectors.append(collect)
+
+    def snapshot(self) -> dict:
+        for collect in self._collectors:
+            try:
+                collect()
+            except Exception as e:
+                logger.error(f"Metrics collector failed: {str(e)}")
+        return {
+            "pid": os.getpid(),
+            "metrics": {name: metric.samples() for name, metric in self._metrics.items()}
+        }
+
+    def _snapshot_path(self, pid: int) -> str:
+        return os.path.join(self.multiproc_dir, f"{pid}.json")
+
+    def flush(self):
+        """Write this worker's snapshot atomically"""
+        if not self.multiproc_dir:
+            return
+        with self._flush_lock:
+            os.makedirs(self.multiproc_dir, exist_ok=True)
+            path = self._snapshot_path(os.getpid())
+            tmp = f"{path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp, path)
+
+    def _flush_quietly(self):
+        try:
+            self.flush()
+        except OSError as e:
+            logger.error(f"Failed to write metrics snapshot: {str(e)}")
+
+    def _flush_loop(self):
+        while not self._flusher_stop.wait(settings.METRICS_FLUSH_INTERVAL_SECONDS):
+            self._flush_quietly()
+
+    def start_flusher(self):
+        """Write the snapshot every METRICS_FLUSH_INTERVAL_SECONDS until stop_flusher()"""
+        if not self.multiproc_dir or self._flusher is not None:
+            return
+        self._flusher_stop.clear()
+        self._flusher = threading.Thread(target=self._flush_loop, name="metrics-flusher", daemon=True)
+        self._flusher.start()
+
+    def stop_flusher(self):
+        """Stop the flusher and write a final snapshot, so a stopping worker's counts are kept"""
+        if self._flusher is None:
+            return
+        self._flusher_stop.set()
+        self._flusher.join()
+        self._flusher = None
+        self._flush_quietly()
+
+    def _snapshots(self) -> list:
+        if not self.multiproc_dir:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.multiproc_dir, "*.json")):
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # being replaced right now
+        return snapshots
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        snapshots = self._snapshots()
+        lines = []
+        for name, metric in self._metrics.items():
+            merged = {}
+            for snap in snapshots:
+                if metric.kind == "gauge" and snap["pid"] != os.getpid() and not _pid_alive(snap["pid"]):
+                    continue
+                for labelvalues, value in snap["metrics"].get(name, []):
+                    key = tuple(labelvalues)
+                    if metric.kind == "histogram":
+                        state = merged.setdefault(key, [[0] * len(value[0]), 0.0, 0])
+                        state[0] = [a + b for a, b in zip(state[0], value[0])]
+                        state[1] += value[1]
+                        state[2] += value[2]
+                    else:
+                        merged[key] = merged.get(key, 0) + value
+
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key in sorted(merged):
+                value = merged[key]
+                if metric.kind == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(list(metric.buckets) + [float("inf")], value[0]):
+                        cumulative += count
+                        le = _labels(metric.labelnames, key, ("le", _fmt(float(bound))))
+                        lines.append(f"{name}_bucket{le} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(metric.labelnames, key)} {_fmt(value[1])}")
+                    lines.append(f"{name}_count{_labels(metric.labelnames, key)} {value[2]}")
+                else:
+                    lines.append(f"{name}{_labels(metric.labelnames, key)} {_fmt(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+registry = Registry(settings.METRICS_MULTIPROC_DIR or None)
+
+REQUESTS_TOTAL = registry.counter(
+    "http_requests_total", "HTTP requests by route template, method and status code",
+    ("method", "route", "status"))
+REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template and method",
+    ("method", "route"))
+REQUESTS_IN_FLIGHT = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being served")
+DB_POOL_SIZE = registry.gauge(
+    "db_pool_size", "Configured size of each database connection pool, by route class and primary/replica",
+    ("route_class", "target"))
+DB_POOL_CHECKED_OUT = registry.gauge(
+    "db_pool_checked_out", "Database connections currently in use, by route class and primary/replica",
+    ("route_class", "target"))
+DB_POOL_OVERFLOW = registry.gauge(
+    "db_pool_overflow", "Database connections opened beyond the pool size, by route class and primary/replica",
+    ("route_class", "target"))
+UPLOADS_TOTAL = registry.counter("upload_files_total", "Uploaded files by type", ("type",))
+UPLOAD_BYTES_TOTAL = registry.counter("upload_bytes_total", "Bytes received through file uploads")
+SSE_CONNECTIONS = registry.gauge("sse_connections", "Open server-sent event streams")
+DB_QUERIES_TOTAL = registry.counter("db_queries_total", "SQL statements executed")
+STATS_CACHE_LOOKUPS = registry.counter(
+    "stats_cache_lookups_total", "Statistics result cache lookups by cache and result (hit/miss)",
+    ("cache", "result"))
+ADMISSION_REJECTED = registry.counter(
+    "admission_rejected_total", "Requests answered 503 by admission control, by route class and reason",
+    ("route_class", "reason"))
+RATE_LIMITED = registry.counter(
+    "rate_limited_total", "Requests answered 429 by the rate limiter, by rule", ("rule",))
+REQUEST_QUERIES = registry.histogram(
+    "http_request_db_queries", "SQL statements executed per request by route template and method",
+    ("method", "route"), buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89))
+
+# Per-request statement counter; threadpool workers copy the context, so they share the list
+_request_queries = contextvars.ContextVar("request_queries", default=None)
+
+
+def instrument_engine(engine):
+    """Count statements executed through `engine`, attributed to the current request"""
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        DB_QUERIES_TOTAL.inc()
+        counter = _request_queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+
+def _collect_db_pool():
+    from app import database
+
+    for route_class, target, engine in database.named_engines():
+        pool = engine.pool
+        # Only QueuePool reports sizes; SQLite's static/singleton pools do not
+        if hasattr(pool, "checkedout"):
+            DB_POOL_SIZE.set(pool.size(), route_class, target)
+            DB_POOL_CHECKED_OUT.set(pool.checkedout(), route_class, target)
+            DB_POOL_OVERFLOW.set(max(pool.overflow(), 0), route_class, target)
+
+
+def _collect_sse():
+    from app.core.events import event_bus
+
+    SSE_CONNECTIONS.set(event_bus.stats()["connections"])
+
+
+registry.add_collector(_collect_db_pool)
+registry.add_collector(_collect_sse)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route request counts, latency and in-flight requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        queries = [0]
+        token = _request_queries.set(queries)
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            _request_queries.reset(token)
+            # Route template keeps label cardinality bounded (no raw ids in paths)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            REQUESTS_TOTAL.inc(method, route_path, status_code)
+            REQUEST_DURATION.observe(time.perf_counter() - start, method, route_path)
+            REQUEST_QUERIES.observe(queries[0], method, route_path)
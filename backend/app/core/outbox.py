@@ -0,0 +1,126 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Purge processed events every N polling cycles
+PURGE_EVERY = 600
+
+
+class OutboxDispatcher:
+    """
+    Drains the outbox table into registered consumers.
+
+    Each consumer has its own checkpoint row. A batch is handed to the
+    consumer together with the session it runs in, and the checkpoint
+    is advanced in that same transaction, so a crash before commit just
+    redelivers the batch (at-least-once). Consumers that write derived
+    tables through the given session get exactly-once updates for free.
+
+    Ids are assigned at insert but become visible at commit, so a
+    transaction can commit a lower id after a higher one has been
+    checkpointed. Only events older than `safety_lag` seconds are read,
+    which leaves in-flight transactions that much time to commit (as the
+    delta sync watermark does).
+    """
+
+    def __init__(self, session_factory=None, batch_size: int = None, safety_lag: float = None):
+        self._session_factory = session_factory
+        self.batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+        self.safety_lag = settings.OUTBOX_SAFETY_LAG_SECONDS if safety_lag is None else safety_lag
+        self._consumers = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self, name: str, handler):
+        """Register `handler(db, events)`; it is called with batches of event dicts in id order"""
+        self._consumers[name] = handler
+
+    @property
+    def consumers(self) -> list:
+        return list(self._consumers)
+
+    def _session(self):
+        if self._session_factory is None:
+            from app.database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    def drain_consumer(self, name: str) -> int:
+        """Process one batch for one consumer, returns the number of events handled"""
+        from app.crud import outbox as crud_outbox
+
+        handler = self._consumers[name]
+        db = self._session()
+        try:
+            checkpoint = crud_outbox.get_checkpoint(db, name, for_update=True)
+            cutoff = datetime.utcnow() - timedelta(seconds=self.safety_lag) if self.safety_lag else None
+            events = crud_outbox.fetch_events(db, checkpoint.last_event_id, self.batch_size, before=cutoff)
+            if not events:
+                db.commit()
+                return 0
+            handler(db, events)
+            checkpoint.last_event_id = events[-1]["id"]
+            db.commit()
+            return len(events)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Outbox consumer {name} failed, batch will be retried: {str(e)}")
+            return 0
+        finally:
+            db.close()
+
+    def drain_once(self) -> int:
+        """Give every consumer one batch"""
+        return sum(self.drain_consumer(name) for name in list(self._consumers))
+
+    def drain(self) -> int:
+        """Run batches until every consumer has caught up"""
+        total = 0
+        while True:
+            handled = self.drain_once()
+            total += handled
+            if handled == 0:
+                return total
+
+    def purge(self) -> int:
+        from app.crud import outbox as crud_outbox
+
+        db = self._session()
+        try:
+            cutoff = datetime.utcnow() - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+            return crud_outbox.purge_events(db, self.consumers, cutoff)
+        finally:
+            db.close()
+
+    def _run(self):
+        cycles = 0
+        while not self._stop.is_set():
+            handled = self.drain_once()
+            cycles += 1
+            if cycles % PURGE_EVERY == 0:
+                try:
+                    self.purge()
+                except Exception as e:
+                    logger.error(f"Outbox purge failed: {str(e)}")
+            # Keep draining without sleeping while batches come back full
+            if handled < self.batch_size:
+                self._stop.wait(settings.OUTBOX_POLL_INTERVAL_SECONDS)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+dispatcher = OutboxDispatcher()
@@ -0,0 +1,214 @@
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from starlette.concurrency import run_in_threadpool
+from app.database import get_session_factory
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+# Leaf frames of threads parked on I/O or a lock; skipped unless include_idle is set
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("socket.py", "accept"),
+    ("base_events.py", "_run_once"),
+    ("thread.py", "_worker"),
+}
+
+
+def _frame_key(code) -> tuple:
+    parts = code.co_filename.replace("\\", "/").split("/")
+    return (code.co_name, "/".join(parts[-2:]), code.co_firstlineno)
+
+
+class SamplingProfiler:
+    """
+    Wall-clock stack sampler over all threads.
+
+    A background thread reads sys._current_frames() every `interval`
+    seconds and counts identical stacks, so the cost is proportional to
+    the sampling rate, not to how much code the sampled threads run.
+    """
+
+    def __init__(self, interval: float = 0.005, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks = Counter()  # (thread name, (frame key, ...) root first) -> samples
+        self.samples = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self, own_ident: int):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            leaf = frame.f_code
+            if not self.include_idle and (os.path.basename(leaf.co_filename), leaf.co_name) in IDLE_LEAVES:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_key(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[(names.get(ident, str(ident)), tuple(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.is_set():
+            self._sample(own_ident)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+        return self
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's folded format: `thread;frame;frame count` per line"""
+        lines = []
+        for (thread_name, stack), count in self.stacks.most_common():
+            frames = ";".join(f"{name} ({path}:{line})" for name, path, line in stack)
+            lines.append(f"{thread_name};{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, name: str = "GoodServices API") -> dict:
+        """Sampled profile per thread in the speedscope file format"""
+        frame_index = {}
+        frames = []
+        by_thread = OrderedDict()
+        for (thread_name, stack), count in self.stacks.items():
+            indices = []
+            for key in stack:
+                if key not in frame_index:
+                    frame_index[key] = len(frames)
+                    frames.append({"name": key[0], "file": key[1], "line": key[2]})
+                indices.append(frame_index[key])
+            samples, weights = by_thread.setdefault(thread_name, ([], []))
+            samples.append(indices)
+            weights.append(count * self.interval)
+
+        profiles = []
+        for thread_name, (samples, weights) in by_thread.items():
+            profiles.append({
+                "type": "sampled",
+                "name": thread_name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "goodservices-sampling-profiler",
+            "shared": {"frames": frames},
+            "profiles": profiles
+        }
+
+
+def profile_for(seconds: float, interval: float, include_idle: bool = False) -> SamplingProfiler:
+    """Sample every thread for `seconds`, blocking the caller"""
+    profiler = SamplingProfiler(interval, include_idle).start()
+    time.sleep(seconds)
+    return profiler.stop()
+
+
+# Per-request profiles kept for admins to download
+recent_profiles = OrderedDict()
+MAX_RECENT_PROFILES = 20
+_profile_ids = itertools.count(1)
+_recent_lock = threading.Lock()
+
+
+def _store_profile(profiler: SamplingProfiler, method: str, path: str) -> str:
+    profile_id = f"{os.getpid()}-{next(_profile_ids)}"
+    with _recent_lock:
+        recent_profiles[profile_id] = {"method": method, "path": path, "profiler": profiler}
+        while len(recent_profiles) > MAX_RECENT_PROFILES:
+            recent_profiles.popitem(last=False)
+    return profile_id
+
+
+def _profile_token(scope):
+    """Bearer token of a request that asks to be profiled, else None"""
+    headers = dict(scope.get("headers") or [])
+    if headers.get(PROFILE_HEADER.encode()) not in (b"1", b"true"):
+        return None
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    if not authorization.startswith("Bearer "):
+        return None
+    return authorization[len("Bearer "):]
+
+
+def _is_admin(token: str) -> bool:
+    """The get_current_admin check, account lookup included, so removed admins cannot profile"""
+    from app.dependencies import get_current_admin, get_current_user
+
+    db = get_session_factory()()
+    try:
+        get_current_admin(get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token), db))
+        return True
+    except HTTPException:
+        return False
+    finally:
+        db.close()
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a single request when an admin sends `X-Profile: 1`.
+
+    The profile is kept in memory and its id returned in X-Profile-Id;
+    fetch it from /api/v1/admin/profiles/{id}. Other threads are sampled
+    too, so concurrent requests show up in the profile.
+    """
+
+    def __init__(self, app, interval: float = 0.001):
+        self.app = app
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send):
+        token = _profile_token(scope) if scope["type"] == "http" else None
+        if token is None or not await run_in_threadpool(_is_admin, token):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = SamplingProfiler(self.interval).start()
+        profile_id = None
+
+        async def send_wrapper(message):
+            nonlocal profile_id
+            if message["type"] == "http.response.start":
+                profiler.stop()
+                profile_id = _store_profile(profiler, scope["method"], scope["path"])
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_ID_HEADER.lower().encode(), profile_id.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if profile_id is None:
+                profiler.stop()
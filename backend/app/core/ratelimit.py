@@ -0,0 +1,223 @@
+"""
+Token-bucket rate limiting.
+
+RATE_LIMIT_RULES maps "<METHOD> <path>" (exact path, no query string) to
+"<requests>/<second|minute|hour>": a bucket of that many tokens refilled
+at that rate, one per client. Clients are identified by the JWT `sub`
+when the request carries a valid bearer token and by IP otherwise.
+
+Allowed responses on a limited route carry RateLimit-Limit,
+RateLimit-Remaining, RateLimit-Reset and RateLimit-Policy headers;
+throttled ones are a 429 with the same headers plus Retry-After.
+
+The local store keeps buckets in this process only, so with N workers a
+client may get up to N times its limit; RATE_LIMIT_BACKEND=redis shares
+the buckets between workers (needs the optional `redis` package).
+"""
+import math
+import threading
+import time
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse
+from app.core.config import settings
+from app.core.metrics import RATE_LIMITED
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+
+class Rule:
+    def __init__(self, name: str, spec: str):
+        count, _, period = spec.partition("/")
+        if period not in PERIODS or not count.isdigit() or int(count) < 1:
+            raise ValueError(f"Invalid rate limit {spec!r} for {name!r}, expected e.g. '10/minute'")
+        self.name = name
+        self.limit = int(count)
+        self.window = PERIODS[period]
+        self.rate = self.limit / self.window  # tokens per second
+
+    @property
+    def policy(self) -> str:
+        return f"{self.limit};w={self.window}"
+
+
+def parse_rules(rules: dict) -> dict:
+    return {name: Rule(name, spec) for name, spec in rules.items()}
+
+
+class LocalRateLimitStore:
+    """
+    Buckets in a dict: key -> (tokens, updated at, full at).
+
+    take() is O(1); every `compact_interval` seconds one pass drops the
+    buckets that have refilled completely, since a missing bucket means
+    a full one.
+    """
+    blocking = False
+
+    def __init__(self, compact_interval: float = 60.0):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.compact_interval = compact_interval
+        self._compacted_at = time.monotonic()
+
+    def take(self, key: str, rate: float, burst: int, now: float = None):
+        """(allowed, tokens left) after trying to take one token"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            state = self._buckets.get(key)
+            tokens = burst if state is None else min(burst, state[0] + (now - state[1]) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+            if now - self._compacted_at >= self.compact_interval:
+                self._compact(now)
+        return allowed, tokens
+
+    def _compact(self, now: float):
+        self._buckets = {key: state for key, state in self._buckets.items() if state[2] > now}
+        self._compacted_at = now
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+# KEYS[1] = bucket; ARGV = rate, burst, now. Returns {allowed, tokens left}
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1])
+if tokens == nil then
+    tokens = burst
+else
+    tokens = math.min(burst, tokens + math.max(0, now - tonumber(state[2])) * rate)
+end
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisRateLimitStore:
+    """Buckets shared by every worker, updated atomically by a Lua script and expired once full"""
+    blocking = True
+
+    def __init__(self, url: str, prefix: str = "goodservices:ratelimit:"):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._take = self._client.register_script(_TAKE_SCRIPT)
+        self._prefix = prefix
+
+    def take(self, key: str, rate: float, burst: int, now: float = None):
+        now = time.time() if now is None else now
+        allowed, tokens = self._take(keys=[self._prefix + key], args=[rate, burst, now])
+        return bool(allowed), float(tokens)
+
+    def clear(self):
+        for key in self._client.scan_iter(match=self._prefix + "*"):
+            self._client.delete(key)
+
+
+def create_store():
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimitStore(settings.RATE_LIMIT_REDIS_URL)
+    return LocalRateLimitStore(settings.RATE_LIMIT_COMPACT_INTERVAL_SECONDS)
+
+
+def client_key(scope) -> str:
+    """Bucket owner: user:<sub> for a valid bearer token, otherwise ip:<client address>"""
+    from app.core.security import decode_access_token
+
+    headers = dict(scope["headers"])
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    if authorization[:7].lower() == "bearer ":
+        payload = decode_access_token(authorization[7:])
+        if payload and payload.get("sub") is not None:
+            return f"user:{payload['sub']}"
+    forwarded = headers.get(b"x-forwarded-for") if settings.RATE_LIMIT_TRUST_FORWARDED_FOR else None
+    if forwarded:
+        return f"ip:{forwarded.decode('latin-1').split(',')[0].strip()}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class RateLimiter:
+    def __init__(self, rules: dict, store):
+        self.rules = parse_rules(rules)
+        self.store = store
+
+    async def check(self, scope):
+        """(rule, allowed, headers) for a limited route, or None"""
+        rule = self.rules.get(f"{scope['method']} {scope['path']}")
+        if rule is None:
+            return None
+        key = f"{rule.name}|{client_key(scope)}"
+        if self.store.blocking:
+            allowed, tokens = await run_in_threadpool(self.store.take, key, rule.rate, rule.limit)
+        else:
+            allowed, tokens = self.store.take(key, rule.rate, rule.limit)
+        headers = {
+            "RateLimit-Limit": str(rule.limit),
+            "RateLimit-Remaining": str(int(tokens)),
+            "RateLimit-Reset": str(math.ceil((rule.limit - tokens) / rule.rate)),
+            "RateLimit-Policy": rule.policy,
+        }
+        if not allowed:
+            headers["Retry-After"] = str(math.ceil((1 - tokens) / rule.rate))
+        return rule, allowed, headers
+
+
+_limiter = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter(settings.RATE_LIMIT_RULES, create_store())
+    return _limiter
+
+
+class RateLimitMiddleware:
+    """ASGI middleware answering 429 once a client's bucket for the route is empty"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        result = await get_rate_limiter().check(scope)
+        if result is None:
+            await self.app(scope, receive, send)
+            return
+
+        rule, allowed, headers = result
+        if not allowed:
+            RATE_LIMITED.inc(rule.name)
+            response = JSONResponse(status_code=429, content={"detail": "Too many requests, retry later"},
+                                    headers=headers)
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                response_headers = MutableHeaders(scope=message)
+                for name, value in headers.items():
+                    response_headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,149 @@
+"""
+Read-replica routing.
+
+Sessions opened for a read-only request (GET/HEAD) send their plain
+SELECTs to a replica chosen round-robin from the healthy ones; writes,
+SELECT ... FOR UPDATE and everything after the session's first write go
+to the primary. A user whose request committed a write keeps reading
+from the primary for READ_YOUR_WRITES_SECONDS, so a list fetched right
+after creating a request contains it even if the replicas lag.
+
+The "recently wrote" window is kept per process: with several workers
+keep replication lag well under the window, or a user's next request
+may land on a worker that does not know about their write.
+"""
+import itertools
+import logging
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import TextClause
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaSet:
+    """Round-robin over replica engines, skipping the ones that failed recently"""
+
+    def __init__(self, engines: list, retry_seconds: float = None):
+        self.engines = list(engines)
+        self.retry_seconds = settings.REPLICA_RETRY_SECONDS if retry_seconds is None else retry_seconds
+        self._counter = itertools.count()
+        self._down_until = {}  # id(engine) -> monotonic time it is tried again
+        self._lock = threading.Lock()
+        for engine in self.engines:
+            event.listen(engine, "handle_error", self._on_error)
+
+    def _on_error(self, context):
+        if context.is_disconnect and context.engine is not None:
+            self.mark_down(context.engine)
+
+    def __len__(self):
+        return len(self.engines)
+
+    def candidates(self):
+        """Healthy replicas, starting with the next one in round-robin order"""
+        if not self.engines:
+            return []
+        start = next(self._counter) % len(self.engines)
+        now = time.monotonic()
+        order = self.engines[start:] + self.engines[:start]
+        return [engine for engine in order if self._down_until.get(id(engine), 0.0) <= now]
+
+    def mark_down(self, engine):
+        with self._lock:
+            self._down_until[id(engine)] = time.monotonic() + self.retry_seconds
+        logger.warning(f"Replica {engine.url!r} failed, skipping it for {self.retry_seconds}s")
+
+    def status(self) -> list:
+        now = time.monotonic()
+        return [
+            {"url": engine.url.render_as_string(hide_password=True),
+             "healthy": self._down_until.get(id(engine), 0.0) <= now}
+            for engine in self.engines
+        ]
+
+
+class RecentWriters:
+    """Users who committed a write in the last `window` seconds"""
+
+    def __init__(self, window: float = None):
+        self._window = window
+        self._until = {}  # user id -> monotonic expiry
+        self._compact_at = 1024
+        self._lock = threading.Lock()
+
+    @property
+    def window(self) -> float:
+        return settings.READ_YOUR_WRITES_SECONDS if self._window is None else self._window
+
+    def record(self, user_id: int):
+        now = time.monotonic()
+        with self._lock:
+            self._until[user_id] = now + self.window
+            if len(self._until) >= self._compact_at:
+                # Drop expired entries whenever the map doubles, so recording stays amortised O(1)
+                self._until = {key: until for key, until in self._until.items() if until > now}
+                self._compact_at = max(1024, 2 * len(self._until))
+
+    def __contains__(self, user_id) -> bool:
+        return self._until.get(user_id, 0.0) > time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._until.clear()
+
+
+recent_writers = RecentWriters()
+
+
+def _is_read(clause) -> bool:
+    if isinstance(clause, TextClause):
+        return clause.text.lstrip()[:6].upper() == "SELECT"
+    return bool(getattr(clause, "is_select", False)) and getattr(clause, "_for_update_arg", None) is None
+
+
+class RoutingSession(Session):
+    """
+    Session choosing its bind per statement.
+
+    `info["replicas"]` is the ReplicaSet (given by the sessionmaker);
+    get_db() sets `info["read_only"]` for GET requests and
+    get_current_user() sets `info["user_id"]` before its first query.
+    """
+
+    def _replica(self):
+        if "replica" not in self.info:
+            self.info["replica"] = None
+            replicas = self.info.get("replicas")
+            for engine in replicas.candidates() if replicas else []:
+                try:
+                    # Check out the connection now, so a dead replica falls through to the next one
+                    self.connection(bind_arguments={"bind": engine})
+                except DBAPIError:
+                    replicas.mark_down(engine)
+                    continue
+                self.info["replica"] = engine
+                break
+        return self.info["replica"]
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        read = not self._flushing and clause is not None and _is_read(clause)
+        if not read:
+            self.info["wrote"] = True
+        elif (self.info.get("read_only") and not self.info.get("wrote")
+              and self.info.get("user_id") not in recent_writers):
+            replica = self._replica()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _remember_writer(session):
+    user_id = session.info.get("user_id")
+    if session.info.get("wrote") and user_id is not None:
+        recent_writers.record(user_id)
@@ -0,0 +1,218 @@
+"""
+Pre-fork production server.
+
+The master binds the listening socket once, forks `workers` uvicorn
+processes that all accept on it, and replaces any worker that exits
+(for example after serving `max_requests` requests). On SIGTERM or
+SIGINT it asks every worker to shut down gracefully and kills the ones
+still running after the graceful timeout. With `reuse_port` each
+worker binds its own SO_REUSEPORT socket instead and the kernel
+balances connections between them.
+
+    python serve.py --workers 16 --max-requests 10000
+"""
+import argparse
+import logging
+import os
+import random
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from app.core.config import settings
+
+logger = logging.getLogger("goodservices.server")
+
+# A worker dying this soon after being spawned counts as a boot failure
+BOOT_FAILURE_SECONDS = 2.0
+MAX_BOOT_FAILURES = 5
+
+
+def bind_socket(host: str, port: int, reuse_port: bool = False) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+class PreforkServer:
+    def __init__(self, app: str = "app.main:app", host: str = "127.0.0.1", port: int = 8000, workers: int = 1,
+                 max_requests: int = 0, max_requests_jitter: int = 0, graceful_timeout: int = 30,
+                 reuse_port: bool = False, preload: bool = False, log_level: str = "info",
+                 access_log: bool = False):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.reuse_port = reuse_port
+        self.preload = preload
+        self.log_level = log_level
+        self.access_log = access_log
+        self.children = {}  # pid -> (worker index, spawned at)
+        self._socket = None
+        self._stopping = False
+        self._boot_failures = 0
+        self._metrics_dir = None  # created by run(), removed on shutdown
+
+    # Worker side
+
+    def _worker_max_requests(self):
+        if not self.max_requests:
+            return None
+        # Jitter keeps workers from all recycling at the same moment
+        return self.max_requests + random.randint(0, self.max_requests_jitter)
+
+    def _run_worker(self, index: int):
+        import uvicorn
+
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, signal.SIG_DFL)
+        random.seed(os.getpid())
+        sock = bind_socket(self.host, self.port, reuse_port=True) if self.reuse_port else self._socket
+
+        config = uvicorn.Config(
+            self.app, log_level=self.log_level, access_log=self.access_log,
+            limit_max_requests=self._worker_max_requests(),
+            timeout_graceful_shutdown=self.graceful_timeout,
+        )
+        uvicorn.Server(config).run(sockets=[sock])
+
+    # Master side
+
+    def spawn(self, index: int) -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._run_worker(index)
+            except BaseException:
+                logger.exception(f"Worker {index} crashed")
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = (index, time.monotonic())
+        return pid
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+
+    def _reap(self):
+        """Collect exited workers and start replacements"""
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            index, spawned_at = self.children.pop(pid, (None, None))
+            if index is None or self._stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if time.monotonic() - spawned_at < BOOT_FAILURE_SECONDS and code != 0:
+                self._boot_failures += 1
+                if self._boot_failures >= MAX_BOOT_FAILURES:
+                    logger.error("Workers keep failing to boot, shutting down")
+                    self._stopping = True
+                    return
+                time.sleep(min(self._boot_failures, 5))
+            else:
+                self._boot_failures = 0
+            logger.info(f"Worker {index} (pid {pid}) exited with {code}, restarting")
+            self.spawn(index)
+
+    def shutdown(self):
+        """SIGTERM every worker, then SIGKILL those still running after the graceful timeout"""
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self.children and time.monotonic() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                self.children.pop(pid, None)
+            else:
+                time.sleep(0.1)
+        for pid in list(self.children):
+            logger.warning(f"Worker pid {pid} did not stop in time, killing it")
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self.children.clear()
+
+    def run(self) -> int:
+        if self.workers > 1 and settings.IDEMPOTENCY_BACKEND == "local":
+            logger.warning("Idempotency keys are kept per worker: a retry reaching another worker runs again. "
+                           "Set IDEMPOTENCY_BACKEND=redis to share them")
+        if self.workers > 1 and not settings.METRICS_MULTIPROC_DIR:
+            # /metrics has to merge every worker's counters
+            self._metrics_dir = tempfile.mkdtemp(prefix="goodservices-metrics-")
+            settings.METRICS_MULTIPROC_DIR = os.environ["METRICS_MULTIPROC_DIR"] = self._metrics_dir
+        if not self.reuse_port:
+            self._socket = bind_socket(self.host, self.port)
+        if self.preload:
+            # Imported once and shared copy-on-write; app.database drops inherited
+            # pooled connections in each child (see os.register_at_fork there)
+            import uvicorn.importer
+            uvicorn.importer.import_from_string(self.app)
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        logger.info(f"Listening on {self.host}:{self.port} with {self.workers} workers (pid {os.getpid()})")
+        for index in range(self.workers):
+            self.spawn(index)
+        try:
+            while not self._stopping:
+                self._reap()
+                time.sleep(0.2)
+        finally:
+            self.shutdown()
+            if self._socket:
+                self._socket.close()
+            if self._metrics_dir:
+                shutil.rmtree(self._metrics_dir, ignore_errors=True)
+        return 1 if self._boot_failures >= MAX_BOOT_FAILURES else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes")
+    parser.add_argument("--app", default="app.main:app")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS,
+                        help="worker processes; 0 = one per CPU")
+    parser.add_argument("--max-requests", type=int, default=settings.SERVER_MAX_REQUESTS,
+                        help="recycle a worker after this many requests; 0 = never")
+    parser.add_argument("--max-requests-jitter", type=int, default=settings.SERVER_MAX_REQUESTS_JITTER)
+    parser.add_argument("--graceful-timeout", type=int, default=settings.SERVER_GRACEFUL_TIMEOUT_SECONDS)
+    parser.add_argument("--reuse-port", action="store_true", help="one SO_REUSEPORT socket per worker")
+    parser.add_argument("--preload", action="store_true", help="import the app in the master before forking")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    server = PreforkServer(
+        app=args.app, host=args.host, port=args.port, workers=args.workers or os.cpu_count() or 1,
+        max_requests=args.max_requests, max_requests_jitter=args.max_requests_jitter,
+        graceful_timeout=args.graceful_timeout, reuse_port=args.reuse_port, preload=args.preload,
+        log_level=args.log_level, access_log=args.access_log,
+    )
+    sys.exit(server.run())
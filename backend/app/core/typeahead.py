@@ -0,0 +1,100 @@
+from bisect import bisect_left, bisect_right
+import heapq
+
+try:
+    from pypinyin import lazy_pinyin, Style
+except ImportError:  # pinyin keys are optional
+    lazy_pinyin = None
+    Style = None
+
+def normalize(text: str) -> str:
+    """Normalize a search key: trim, collapse spaces, casefold"""
+    if not text:
+        return ""
+    return " ".join(text.split()).casefold()
+
+
+def pinyin_keys(text: str) -> list:
+    """Return full pinyin and initials for a Chinese string, e.g. 广州 -> ['guangzhou', 'gz']"""
+    if not text or lazy_pinyin is None:
+        return []
+    syllables = [s for s in lazy_pinyin(text) if s.strip()]
+    initials = [s for s in lazy_pinyin(text, style=Style.FIRST_LETTER) if s.strip()]
+    keys = ["".join(syllables).casefold(), "".join(initials).casefold()]
+    return [k for k in keys if k and k != normalize(text)]
+
+
+class PrefixIndex:
+    """
+    Immutable prefix index over (key, item_id, weight) entries.
+
+    Keys are kept in a sorted array, so the keys sharing a prefix form one
+    contiguous range found by two bisects; several keys may point at the
+    same item. A sparse table of range maxima over the weights ranks that
+    range without scanning it: a lookup costs O(log n) plus O(log limit)
+    per returned item (and per duplicate key of a returned item), however
+    many keys share the prefix.
+    """
+
+    def __init__(self, entries):
+        rows = sorted(
+            (normalize(key), item_id, weight)
+            for key, item_id, weight in entries
+            if normalize(key)
+        )
+        self._keys = [row[0] for row in rows]
+        self._ids = [row[1] for row in rows]
+        self._weights = [row[2] for row in rows]
+
+        # _best[j][i]: position of the heaviest entry in [i, i + 2**j), earliest on ties
+        self._best = [list(range(len(rows)))]
+        span = 1
+        while span * 2 <= len(rows):
+            prev = self._best[-1]
+            self._best.append([self._heavier(prev[i], prev[i + span]) for i in range(len(rows) - span * 2 + 1)])
+            span *= 2
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _heavier(self, a: int, b: int) -> int:
+        return b if self._weights[b] > self._weights[a] else a
+
+    def _heaviest(self, lo: int, hi: int) -> int:
+        """Position of the heaviest entry in the non-empty range [lo, hi)"""
+        level = (hi - lo).bit_length() - 1
+        table = self._best[level]
+        return self._heavier(table[lo], table[hi - (1 << level)])
+
+    def search(self, prefix: str, limit: int = 10) -> list:
+        """Return up to `limit` distinct item ids whose keys start with `prefix`, heaviest first"""
+        prefix = normalize(prefix)
+        if not prefix or limit <= 0:
+            return []
+
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_right(self._keys, prefix + "\U0010ffff", lo)
+        if lo == hi:
+            return []
+
+        # Pop the heaviest remaining entry and split its range around it.
+        # Ties keep key order, so equal-weight items come back alphabetically
+        def candidate(a, b):
+            pos = self._heaviest(a, b)
+            return (-self._weights[pos], pos, a, b)
+
+        heap = [candidate(lo, hi)]
+        result = []
+        seen = set()
+        while heap and len(result) < limit:
+            _, pos, a, b = heapq.heappop(heap)
+            item_id = self._ids[pos]
+            # An item's first pop is its heaviest key, later ones are duplicates
+            if item_id not in seen:
+                seen.add(item_id)
+                result.append(item_id)
+            if a < pos:
+                heapq.heappush(heap, candidate(a, pos))
+            if pos + 1 < b:
+                heapq.heappush(heap, candidate(pos + 1, b))
+        return result
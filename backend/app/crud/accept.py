@@ -1,26 +1,53 @@
+from datetime import datetime
 from sqlalchemy.orm import Session
 from app.models.accept_info import AcceptInfo
 from app.models.service_response import ServiceResponse
+from app.models.service_request import ServiceRequest
+from app.crud import outbox as crud_outbox
+from app.crud import stats as crud_stats
+from app.database import on_commit
+from app.crud.service_response import response_snapshot
 
 def accept_service_response(db: Session, response_id: int):
     db_response = db.query(ServiceResponse).filter(ServiceResponse.response_id == response_id).first()
     if not db_response:
         return None
 
+    now = datetime.utcnow()
     db_response.response_state = 1
+    db_response.update_date = now
 
     # Get the service request to extract publisher info
-    from app.models.service_request import ServiceRequest
     db_request = db.query(ServiceRequest).filter(ServiceRequest.sr_id == db_response.sr_id).first()
 
     db_accept = AcceptInfo(
         response_id=response_id,
         srid=db_response.sr_id,
         psr_userid=db_request.psr_userid,
-        response_userid=db_response.response_userid
+        response_userid=db_response.response_userid,
+        createdate=now
     )
     db.add(db_accept)
 
+    # Accepting a response completes the request, in the same transaction
+    db_request.ps_state = 2
+    db_request.ps_updatedate = now
+    db.flush()
+
+    crud_outbox.add_event(db, "response.accepted", crud_outbox.SERVICE_RESPONSE, response_id, {
+        **response_snapshot(db_response),
+        "accept_id": db_accept.id,
+        "accepted_at": db_accept.createdate,
+        "psr_userid": db_request.psr_userid,
+        "cityID": db_request.cityID,
+        "stype_id": db_request.stype_id,
+        "ps_begindate": db_request.ps_begindate,
+        "ps_state": db_request.ps_state
+    })
+
+    # Completions are counted in the accept month: only ranges reaching it change
+    on_commit(db, lambda: crud_stats.invalidate_months({now.year * 12 + now.month - 1}))
+
     db.commit()
     db.refresh(db_accept)
     return db_accept
@@ -31,6 +58,9 @@ def reject_service_response(db: Session, response_id: int):
         return None
 
     db_response.response_state = 2
+    db_response.update_date = datetime.utcnow()
+    crud_outbox.add_event(db, "response.rejected", crud_outbox.SERVICE_RESPONSE,
+                          response_id, response_snapshot(db_response))
     db.commit()
     db.refresh(db_response)
     return db_response
@@ -0,0 +1,170 @@
+import json
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.orm import Session, aliased
+from app.core.config import settings
+from app.core.sketch import DDSketch
+from app.models.latency import LatencySketch
+from app.models.service_request import ServiceRequest
+from app.models.service_response import ServiceResponse
+from app.models.accept_info import AcceptInfo
+from app.crud import outbox as crud_outbox
+from app.crud import stats as crud_stats
+
+# Outbox consumer keeping the latency sketches current
+CONSUMER = "stats_latency"
+
+# Metrics, both measured from sr_info.ps_begindate
+FIRST_RESPONSE = "first_response"  # until the request's first response_info.response_date
+ACCEPT = "accept"  # until each accept_info.createdate
+METRICS = (FIRST_RESPONSE, ACCEPT)
+
+QUANTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99}
+# Histogram bucket lower bounds in seconds: <1h, 1-6h, 6h-1d, 1-3d, 3-7d, 7-30d, 30d+
+HISTOGRAM_EDGES = [0, 3600, 6 * 3600, 86400, 3 * 86400, 7 * 86400, 30 * 86400]
+
+
+def _as_datetime(value) -> datetime:
+    """Outbox payloads carry datetimes as 'YYYY-MM-DD HH:MM:SS[.ffffff]' strings"""
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _sample(metric: str, at, begin, city_id, stype_id):
+    """(sketch cell, seconds) for one observation; responses before ps_begindate count as 0"""
+    at, begin = _as_datetime(at), _as_datetime(begin)
+    month_id = crud_stats.bucket_month_id(at.year * 12 + at.month - 1)
+    return (metric, month_id, int(city_id), int(stype_id)), max((at - begin).total_seconds(), 0.0)
+
+
+def event_samples(events: list) -> list:
+    """[(cell, seconds)] observed by a batch of outbox events"""
+    samples = []
+    for event in events:
+        payload = event["payload"]
+        if payload.get("ps_begindate") is None:
+            continue
+        if event["type"] == "response.created" and payload.get("first_response"):
+            samples.append(_sample(FIRST_RESPONSE, payload["response_date"], payload["ps_begindate"],
+                                   payload["cityID"], payload["stype_id"]))
+        elif event["type"] == "response.accepted":
+            samples.append(_sample(ACCEPT, payload["accepted_at"], payload["ps_begindate"],
+                                   payload["cityID"], payload["stype_id"]))
+    return samples
+
+
+def apply_events(db: Session, events: list):
+    """Outbox consumer: add a batch's observations to the stored sketches (committed by the dispatcher)"""
+    values_by_cell = defaultdict(list)
+    for cell, seconds in event_samples(events):
+        values_by_cell[cell].append(seconds)
+
+    for (metric, month_id, city_id, stype_id), values in values_by_cell.items():
+        row = db.get(LatencySketch, (metric, month_id, city_id, stype_id))
+        if row is None:
+            sketch = DDSketch(settings.LATENCY_SKETCH_RELATIVE_ACCURACY)
+            row = LatencySketch(metric=metric, monthID=month_id, cityID=city_id, stype_id=stype_id)
+            db.add(row)
+        else:
+            sketch = DDSketch.from_dict(json.loads(row.sketch))
+        for seconds in values:
+            sketch.add(seconds)
+        row.sketch = json.dumps(sketch.to_dict())
+
+
+def _observations(db: Session):
+    """Every (metric, at, ps_begindate, cityID, stype_id) in the base tables, streamed"""
+    earlier = aliased(ServiceResponse)
+    first_responses = select(
+        ServiceResponse.response_date, ServiceRequest.ps_begindate, ServiceRequest.cityID, ServiceRequest.stype_id
+    ).join(
+        ServiceRequest, ServiceRequest.sr_id == ServiceResponse.sr_id
+    ).where(
+        ServiceResponse.response_date.isnot(None),
+        ~select(earlier.response_id).where(
+            earlier.sr_id == ServiceResponse.sr_id, earlier.response_id < ServiceResponse.response_id
+        ).exists()
+    )
+    accepts = select(
+        AcceptInfo.createdate, ServiceRequest.ps_begindate, ServiceRequest.cityID, ServiceRequest.stype_id
+    ).join(ServiceRequest, ServiceRequest.sr_id == AcceptInfo.srid)
+
+    for metric, query in ((FIRST_RESPONSE, first_responses), (ACCEPT, accepts)):
+        for row in db.execute(query.execution_options(yield_per=1000)):
+            yield (metric,) + tuple(row)
+
+
+def rebuild_latency(db: Session) -> int:
+    """
+    Recompute every sketch from the base tables and commit.
+
+    Like rebuild_report(), the consumer checkpoint moves to the newest
+    event in the same transaction. Returns the number of sketches written.
+    """
+    checkpoint = crud_outbox.get_checkpoint(db, CONSUMER, for_update=True)
+    last_event_id = crud_outbox.get_max_event_id(db)
+
+    sketches = {}
+    for metric, at, begin, city_id, stype_id in _observations(db):
+        cell, seconds = _sample(metric, at, begin, city_id, stype_id)
+        if cell not in sketches:
+            sketches[cell] = DDSketch(settings.LATENCY_SKETCH_RELATIVE_ACCURACY)
+        sketches[cell].add(seconds)
+
+    db.query(LatencySketch).delete(synchronize_session=False)
+    db.add_all([
+        LatencySketch(metric=metric, monthID=month_id, cityID=city_id, stype_id=stype_id,
+                      sketch=json.dumps(sketch.to_dict()))
+        for (metric, month_id, city_id, stype_id), sketch in sketches.items()
+    ])
+    checkpoint.last_event_id = last_event_id
+    checkpoint.updated_at = datetime.utcnow()
+    db.commit()
+    return len(sketches)
+
+
+def _summary(sketch: DDSketch) -> dict:
+    summary = {"count": sketch.count}
+    for name, q in QUANTILES.items():
+        value = sketch.quantile(q)
+        summary[name] = round(value, 1) if value is not None else None
+    summary["histogram"] = sketch.histogram(HISTOGRAM_EDGES)
+    return summary
+
+
+def get_latency(db: Session, first_bucket: int, last_bucket: int, city_id: int = None,
+                service_type_id: int = None) -> dict:
+    """Per-month and whole-range quantiles and histograms, merged from the stored sketches"""
+    query = db.query(LatencySketch).filter(
+        LatencySketch.monthID >= crud_stats.bucket_month_id(first_bucket),
+        LatencySketch.monthID <= crud_stats.bucket_month_id(last_bucket)
+    )
+    if city_id:
+        query = query.filter(LatencySketch.cityID == city_id)
+    if service_type_id:
+        query = query.filter(LatencySketch.stype_id == service_type_id)
+
+    months = range(first_bucket, last_bucket + 1)
+    accuracy = settings.LATENCY_SKETCH_RELATIVE_ACCURACY
+    merged = {(metric, b): DDSketch(accuracy) for metric in METRICS for b in months}
+    for row in query:
+        bucket = crud_stats.month_key_to_bucket(int(row.monthID))
+        merged[(row.metric, bucket)].merge(DDSketch.from_dict(json.loads(row.sketch)))
+
+    result = {
+        "months": [crud_stats.bucket_label(b) for b in months],
+        "unit": "seconds",
+        "histogram_edges": HISTOGRAM_EDGES,
+    }
+    for metric in METRICS:
+        per_month = [_summary(merged[(metric, b)]) for b in months]
+        overall = DDSketch(accuracy)
+        for b in months:
+            overall.merge(merged[(metric, b)])
+        result[metric] = {
+            "count": [s["count"] for s in per_month],
+            **{name: [s[name] for s in per_month] for name in QUANTILES},
+            "histogram": [s["histogram"] for s in per_month],
+            "overall": _summary(overall)
+        }
+    return result
@@ -0,0 +1,103 @@
+import json
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.outbox import OutboxEvent, OutboxCheckpoint
+
+# Aggregate types
+SERVICE_REQUEST = "service_request"
+SERVICE_RESPONSE = "service_response"
+
+# Payload field holding the aggregate owner, copied to OutboxEvent.user_id
+_OWNER_FIELDS = {
+    SERVICE_REQUEST: "psr_userid",
+    SERVICE_RESPONSE: "response_userid",
+}
+
+
+def add_event(db: Session, event_type: str, aggregate_type: str, aggregate_id: int, payload: dict):
+    """
+    Stage an outbox event in the caller's transaction.
+
+    Does not commit: the event becomes visible together with the state
+    change it describes, or not at all.
+    """
+    event = OutboxEvent(
+        event_type=event_type,
+        aggregate_type=aggregate_type,
+        aggregate_id=aggregate_id,
+        user_id=payload.get(_OWNER_FIELDS.get(aggregate_type)),
+        payload=json.dumps(payload, default=str, ensure_ascii=False)
+    )
+    db.add(event)
+    return event
+
+
+def get_checkpoint(db: Session, consumer: str, for_update: bool = False) -> OutboxCheckpoint:
+    query = db.query(OutboxCheckpoint).filter(OutboxCheckpoint.consumer == consumer)
+    if for_update:
+        # Serializes the same consumer across workers on MySQL; a no-op on SQLite
+        query = query.with_for_update()
+    checkpoint = query.first()
+    if checkpoint is None:
+        checkpoint = OutboxCheckpoint(consumer=consumer, last_event_id=0)
+        db.add(checkpoint)
+        db.flush()
+    return checkpoint
+
+
+def fetch_events(db: Session, after_id: int, limit: int, before: datetime = None) -> list:
+    """Events after `after_id` in id order, optionally only those written before `before`"""
+    query = db.query(OutboxEvent).filter(OutboxEvent.id > after_id)
+    if before is not None:
+        query = query.filter(OutboxEvent.created_at < before)
+    rows = query.order_by(OutboxEvent.id).limit(limit).all()
+    return [
+        {
+            "id": row.id,
+            "type": row.event_type,
+            "aggregate_type": row.aggregate_type,
+            "aggregate_id": row.aggregate_id,
+            "payload": json.loads(row.payload),
+            "created_at": row.created_at
+        }
+        for row in rows
+    ]
+
+
+def get_max_event_id(db: Session, before: datetime = None) -> int:
+    """Highest event id, optionally only among events written before `before`"""
+    query = db.query(func.max(OutboxEvent.id))
+    if before is not None:
+        query = query.filter(OutboxEvent.created_at < before)
+    return query.scalar() or 0
+
+def get_min_event_id(db: Session) -> int:
+    return db.query(func.min(OutboxEvent.id)).scalar() or 0
+
+def get_deleted_ids(db: Session, aggregate_type: str, user_id: int, after_id: int) -> list:
+    """Ids of a user's aggregates deleted after event `after_id`"""
+    rows = db.query(OutboxEvent.aggregate_id).filter(
+        OutboxEvent.user_id == user_id,
+        OutboxEvent.aggregate_type == aggregate_type,
+        OutboxEvent.id > after_id,
+        OutboxEvent.event_type.like("%.deleted")
+    ).distinct().all()
+    return [row.aggregate_id for row in rows]
+
+def purge_events(db: Session, consumers: list, older_than: datetime) -> int:
+    """Delete events older than `older_than` that every listed consumer has already processed"""
+    if not consumers:
+        return 0
+    checkpoints = db.query(OutboxCheckpoint.last_event_id).filter(
+        OutboxCheckpoint.consumer.in_(consumers)
+    ).all()
+    if len(checkpoints) < len(consumers):
+        return 0
+    low_watermark = min(row.last_event_id for row in checkpoints)
+    deleted = db.query(OutboxEvent).filter(
+        OutboxEvent.id <= low_watermark,
+        OutboxEvent.created_at < older_than
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
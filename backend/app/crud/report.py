@@ -0,0 +1,109 @@
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.database import on_commit
+from app.models.report import Report
+from app.models.service_request import ServiceRequest
+from app.models.accept_info import AcceptInfo
+from app.crud import outbox as crud_outbox
+from app.crud import stats as crud_stats
+
+# Outbox consumer keeping the report table current
+CONSUMER = "stats_report"
+
+
+def month_bucket(value) -> int:
+    """Month bucket of a datetime, or of an outbox payload datetime string"""
+    if isinstance(value, str):
+        return crud_stats.parse_month(value[:7])
+    return value.year * 12 + value.month - 1
+
+
+def _cell(payload: dict, date_field: str):
+    """(month bucket, stype_id, cityID) a request snapshot counts under"""
+    if payload.get(date_field) is None:
+        return None
+    return month_bucket(payload[date_field]), payload["stype_id"], str(payload["cityID"])
+
+
+def event_deltas(events: list) -> dict:
+    """
+    Fold outbox events into {(month bucket, stype_id, cityID): [published, completed]} deltas.
+
+    A request is published in its ps_begindate month under its current
+    city and type, so updates that change any of those move it. A
+    completion is counted once, in the accept month, under the city and
+    type the request had when it was accepted.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for event in events:
+        payload = event["payload"]
+        if event["type"] == "request.created":
+            cell = _cell(payload, "ps_begindate")
+            if cell:
+                deltas[cell][0] += 1
+        elif event["type"] == "request.deleted":
+            cell = _cell(payload, "ps_begindate")
+            if cell:
+                deltas[cell][0] -= 1
+        elif event["type"] == "request.updated" and payload.get("before"):
+            old, new = _cell(payload["before"], "ps_begindate"), _cell(payload, "ps_begindate")
+            if old != new:
+                if old:
+                    deltas[old][0] -= 1
+                if new:
+                    deltas[new][0] += 1
+        elif event["type"] == "response.accepted":
+            cell = _cell(payload, "accepted_at")
+            if cell:
+                deltas[cell][1] += 1
+    return {cell: delta for cell, delta in deltas.items() if delta != [0, 0]}
+
+
+def apply_events(db: Session, events: list):
+    """Outbox consumer: add a batch's deltas to the report rows (committed by the dispatcher)"""
+    deltas = event_deltas(events)
+    for (bucket, stype_id, city_id), (published, completed) in deltas.items():
+        row = db.get(Report, (crud_stats.bucket_month_id(bucket), stype_id, city_id))
+        if row is None:
+            row = Report(monthID=crud_stats.bucket_month_id(bucket), stype_id=stype_id, cityID=city_id,
+                         ps_num=0, rs_num=0)
+            db.add(row)
+        row.ps_num += published
+        row.rs_num += completed
+
+    if deltas:
+        buckets = {bucket for bucket, _, _ in deltas}
+        on_commit(db, lambda: crud_stats.invalidate_cube(buckets))
+
+
+def rebuild_report(db: Session) -> int:
+    """
+    Recompute the report table from sr_info/accept_info and commit.
+
+    The consumer checkpoint is locked first and moved to the newest
+    event in the same transaction, so events already reflected in the
+    recount are not applied again. Returns the number of rows written.
+    """
+    checkpoint = crud_outbox.get_checkpoint(db, CONSUMER, for_update=True)
+    last_event_id = crud_outbox.get_max_event_id(db)
+
+    first, last_begin = db.query(func.min(ServiceRequest.ps_begindate), func.max(ServiceRequest.ps_begindate)).one()
+    last_accept = db.query(func.max(AcceptInfo.createdate)).scalar()
+    counts = {}
+    if first is not None:
+        last = max(month_bucket(d) for d in (last_begin, last_accept) if d is not None)
+        counts = crud_stats.monthly_counts(db, month_bucket(first), last, dimensions=("city", "stype"))
+
+    db.query(Report).delete(synchronize_session=False)
+    db.add_all([
+        Report(monthID=crud_stats.bucket_month_id(bucket), stype_id=stype_id, cityID=str(city_id),
+               ps_num=published, rs_num=completed)
+        for (bucket, city_id, stype_id), (published, completed) in counts.items()
+    ])
+    checkpoint.last_event_id = last_event_id
+    checkpoint.updated_at = datetime.utcnow()
+    db.commit()
+    crud_stats.invalidate_cube()
+    return len(counts)
@@ -1,25 +1,81 @@
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from app.models.service_request import ServiceRequest
+from app.models.user import BUser
+from app.models.city_info import CityInfo
+from app.models.service_type import ServiceType
 from app.schemas.service_request import ServiceRequestCreate, ServiceRequestUpdate
+from app.crud import outbox as crud_outbox
+from app.crud import stats as crud_stats
+from app.database import on_commit
 from math import ceil
 from datetime import datetime
 
+def request_snapshot(db_request: ServiceRequest) -> dict:
+    """Fields downstream consumers (rollups, caches, sync) need from an outbox event"""
+    return {
+        "sr_id": db_request.sr_id,
+        "psr_userid": db_request.psr_userid,
+        "cityID": db_request.cityID,
+        "stype_id": db_request.stype_id,
+        "ps_begindate": db_request.ps_begindate,
+        "ps_state": db_request.ps_state
+    }
+
+def _invalidate_stats(db: Session, *snapshots):
+    """Drop cached statistics for the ps_begindate months of `snapshots` once the transaction commits"""
+    buckets = {s["ps_begindate"].year * 12 + s["ps_begindate"].month - 1 for s in snapshots if s["ps_begindate"]}
+    on_commit(db, lambda: crud_stats.invalidate_months(buckets))
+
 def get_service_request(db: Session, request_id: int):
     return db.query(ServiceRequest).filter(ServiceRequest.sr_id == request_id).first()
 
-def get_service_requests(db: Session, page: int = 1, size: int = 10, user_id: int = None,
-                         stype_id: int = None, city_id: int = None, ps_state: int = None):
-    # Log the received parameters for debugging
-    print(f"CRUD get_service_requests called with params: page={page}, size={size}, user_id={user_id}, stype_id={stype_id}, city_id={city_id}, ps_state={ps_state}")
-    
-    # Use joinedload to eagerly load relationships
-    from sqlalchemy.orm import joinedload
-    query = db.query(ServiceRequest).options(
-        joinedload(ServiceRequest.user),
-        joinedload(ServiceRequest.city),
-        joinedload(ServiceRequest.service_type)
-    )
-    
+def get_service_request_version(db: Session, request_id: int):
+    """(sr_id, ps_updatedate, ps_state, row_version) of a service request by primary key, or None"""
+    return db.query(
+        ServiceRequest.sr_id, ServiceRequest.ps_updatedate, ServiceRequest.ps_state, ServiceRequest.row_version
+    ).filter(ServiceRequest.sr_id == request_id).first()
+
+def get_service_requests_by_ids(db: Session, ids: list) -> dict:
+    """
+    Service requests as dicts with publisher_name and service_type_name,
+    keyed by sr_id in the order of `ids`; ids that do not exist are left
+    out. One IN query for the requests and one each for the user and
+    service type names.
+    """
+    rows = db.query(ServiceRequest).filter(ServiceRequest.sr_id.in_(ids)).all()
+    user_ids = {row.psr_userid for row in rows}
+    stype_ids = {row.stype_id for row in rows}
+    user_names = dict(db.query(BUser.id, BUser.uname).filter(BUser.id.in_(user_ids)).all()) if user_ids else {}
+    type_names = dict(
+        db.query(ServiceType.id, ServiceType.typename).filter(ServiceType.id.in_(stype_ids)).all()
+    ) if stype_ids else {}
+
+    requests = {}
+    for row in rows:
+        request_dict = {column.name: getattr(row, column.name) for column in ServiceRequest.__table__.columns}
+        request_dict["publisher_name"] = user_names.get(row.psr_userid, "Unknown")
+        request_dict["service_type_name"] = type_names.get(row.stype_id, "Unknown")
+        requests[row.sr_id] = request_dict
+    return {item_id: requests[item_id] for item_id in ids if item_id in requests}
+
+# Allowed `fields` of GET /service-requests: the sr_info columns plus the joined display names
+LIST_FIELDS = {
+    **{column.name: column for column in ServiceRequest.__table__.columns},
+    "publisher_name": func.coalesce(BUser.uname, "Unknown"),
+    "city_name": func.coalesce(CityInfo.cityName, "Unknown"),
+}
+
+def parse_list_fields(fields: str) -> list:
+    """Distinct field names of a comma-separated `fields` value; ValueError for unknown or no fields"""
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in LIST_FIELDS]
+    if unknown or not names:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}" if unknown else "No fields given")
+    return names
+
+def _filter_requests(query, user_id: int = None, stype_id: int = None, city_id: int = None,
+                     ps_state: int = None, updated_since: datetime = None):
     if user_id is not None:
         query = query.filter(ServiceRequest.psr_userid == user_id)
         print(f"Applied user_id filter: {user_id}")
@@ -32,6 +88,26 @@ def get_service_requests(db: Session, page: int = 1, size: int = 10, user_id: in
     if ps_state is not None:
         query = query.filter(ServiceRequest.ps_state == ps_state)
         print(f"Applied ps_state filter: {ps_state}")
+    if updated_since is not None:
+        # Served by idx_sr_user_updated (psr_userid, ps_updatedate) when combined with user_id
+        query = query.filter(ServiceRequest.ps_updatedate >= updated_since)
+    return query
+
+def get_service_requests(db: Session, page: int = 1, size: int = 10, user_id: int = None,
+                         stype_id: int = None, city_id: int = None, ps_state: int = None,
+                         updated_since: datetime = None):
+    # Log the received parameters for debugging
+    print(f"CRUD get_service_requests called with params: page={page}, size={size}, user_id={user_id}, stype_id={stype_id}, city_id={city_id}, ps_state={ps_state}")
+    
+    # Use joinedload to eagerly load relationships
+    from sqlalchemy.orm import joinedload
+    query = db.query(ServiceRequest).options(
+        joinedload(ServiceRequest.user),
+        joinedload(ServiceRequest.city),
+        joinedload(ServiceRequest.service_type)
+    )
+    
+    query = _filter_requests(query, user_id, stype_id, city_id, ps_state, updated_since)
 
     total = query.count()
     items = query.offset((page - 1) * size).limit(size).all()
@@ -46,6 +122,32 @@ def get_service_requests(db: Session, page: int = 1, size: int = 10, user_id: in
         "total_pages": ceil(total / size) if size > 0 else 0
     }
 
+def get_service_request_fields(db: Session, fields: list, page: int = 1, size: int = 10, user_id: int = None,
+                               stype_id: int = None, city_id: int = None, ps_state: int = None):
+    """
+    A page of get_service_requests as dicts holding only `fields` (names
+    from LIST_FIELDS). Only those columns are selected, and users or
+    cities are joined only when their name is asked for, so no ORM
+    objects are built.
+    """
+    query = db.query(*(LIST_FIELDS[name].label(name) for name in fields)).select_from(ServiceRequest)
+    if "publisher_name" in fields:
+        query = query.outerjoin(BUser, BUser.id == ServiceRequest.psr_userid)
+    if "city_name" in fields:
+        query = query.outerjoin(CityInfo, CityInfo.cityID == ServiceRequest.cityID)
+    query = _filter_requests(query, user_id, stype_id, city_id, ps_state)
+
+    total = query.count()
+    items = [row._asdict() for row in query.offset((page - 1) * size).limit(size)]
+
+    return {
+        "items": items,
+        "total": total,
+        "page": page,
+        "size": size,
+        "total_pages": ceil(total / size) if size > 0 else 0
+    }
+
 def create_service_request(db: Session, request: ServiceRequestCreate, user_id: int):
     # Log the incoming request data to debug file_list
     print(f"Creating service request with data: {request.model_dump()}")
@@ -54,9 +156,14 @@ def create_service_request(db: Session, request: ServiceRequestCreate, user_id:
     db_request = ServiceRequest(
         **request.model_dump(),
         psr_userid=user_id,
-        ps_state=0
+        ps_state=0,
+        ps_updatedate=datetime.utcnow()
     )
     db.add(db_request)
+    db.flush()
+    snapshot = request_snapshot(db_request)
+    crud_outbox.add_event(db, "request.created", crud_outbox.SERVICE_REQUEST, db_request.sr_id, snapshot)
+    _invalidate_stats(db, snapshot)
     db.commit()
     db.refresh(db_request)
     
@@ -75,9 +182,28 @@ def update_service_request(db: Session, request_id: int, request_update: Service
     if update_data:
         update_data['ps_updatedate'] = datetime.utcnow()
 
+    before = request_snapshot(db_request)
     for field, value in update_data.items():
         setattr(db_request, field, value)
 
+    after = request_snapshot(db_request)
+    crud_outbox.add_event(db, "request.updated", crud_outbox.SERVICE_REQUEST,
+                          request_id, {**after, "before": before})
+    if any(before[field] != after[field] for field in ("ps_begindate", "cityID", "stype_id")):
+        _invalidate_stats(db, before, after)
+    db.commit()
+    db.refresh(db_request)
+    return db_request
+
+def cancel_service_request(db: Session, request_id: int):
+    db_request = get_service_request(db, request_id)
+    if not db_request:
+        return None
+
+    db_request.ps_state = -1
+    db_request.ps_updatedate = datetime.utcnow()
+    crud_outbox.add_event(db, "request.cancelled", crud_outbox.SERVICE_REQUEST,
+                          request_id, request_snapshot(db_request))
     db.commit()
     db.refresh(db_request)
     return db_request
@@ -88,7 +214,11 @@ def delete_service_request(db: Session, request_id: int):
         if not db_request:
             return False
 
+        snapshot = request_snapshot(db_request)
         db.delete(db_request)
+        crud_outbox.add_event(db, "request.deleted", crud_outbox.SERVICE_REQUEST,
+                              request_id, snapshot)
+        _invalidate_stats(db, snapshot)
         db.commit()
         return True
     except Exception as e:
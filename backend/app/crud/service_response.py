@@ -4,11 +4,30 @@ from app.models.service_request import ServiceRequest
 from app.models.user import BUser
 from app.models.accept_info import AcceptInfo
 from app.schemas.service_response import ServiceResponseCreate, ServiceResponseUpdate
+from app.crud import outbox as crud_outbox
 from math import ceil
+from datetime import datetime
+
+def response_snapshot(db_response: ServiceResponse) -> dict:
+    """Fields downstream consumers need from an outbox event"""
+    return {
+        "response_id": db_response.response_id,
+        "sr_id": db_response.sr_id,
+        "response_userid": db_response.response_userid,
+        "response_state": db_response.response_state,
+        "response_date": db_response.response_date
+    }
 
 def get_service_response(db: Session, response_id: int):
     return db.query(ServiceResponse).filter(ServiceResponse.response_id == response_id).first()
 
+def get_service_response_version(db: Session, response_id: int):
+    """(response_id, update_date, response_state, row_version) of a service response by primary key, or None"""
+    return db.query(
+        ServiceResponse.response_id, ServiceResponse.update_date, ServiceResponse.response_state,
+        ServiceResponse.row_version
+    ).filter(ServiceResponse.response_id == response_id).first()
+
 def get_service_response_with_details(db: Session, response_id: int):
     """Get service response with responder details if accepted"""
     response = db.query(ServiceResponse).filter(ServiceResponse.response_id == response_id).first()
@@ -44,8 +63,43 @@ def get_service_response_with_details(db: Session, response_id: int):
     print(f"DEBUG: get_service_response_with_details returning: {response_dict}")
     return response_dict
 
+def get_service_responses_by_ids(db: Session, ids: list) -> dict:
+    """
+    Service responses as dicts with responder_name / responder_phone
+    (as in get_service_responses), keyed by response_id in the order of
+    `ids`; ids that do not exist are left out. One IN query for the
+    responses, one for the accept records of accepted ones and one for
+    the responders.
+    """
+    rows = db.query(ServiceResponse).filter(ServiceResponse.response_id.in_(ids)).all()
+    accepted_ids = [row.response_id for row in rows if row.response_state == 1]
+    accepted_by = dict(db.query(AcceptInfo.response_id, AcceptInfo.response_userid).filter(
+        AcceptInfo.response_id.in_(accepted_ids)
+    ).all()) if accepted_ids else {}
+
+    # Accepted responses show the responder from the accept record, the rest the response author
+    responder_ids = {
+        row.response_id: accepted_by.get(row.response_id) if row.response_state == 1 else row.response_userid
+        for row in rows
+    }
+    user_ids = {user_id for user_id in responder_ids.values() if user_id is not None}
+    users = {
+        user.id: user for user in db.query(BUser.id, BUser.uname, BUser.phoneNo).filter(BUser.id.in_(user_ids))
+    } if user_ids else {}
+
+    responses = {}
+    for row in rows:
+        response_dict = {column.name: getattr(row, column.name) for column in ServiceResponse.__table__.columns}
+        responder = users.get(responder_ids[row.response_id])
+        if responder:
+            response_dict["responder_name"] = responder.uname
+            response_dict["responder_phone"] = responder.phoneNo
+        responses[row.response_id] = response_dict
+    return {item_id: responses[item_id] for item_id in ids if item_id in responses}
+
 def get_service_responses(db: Session, page: int = 1, size: int = 10, user_id: int = None,
-                          sr_id: int = None, response_state: int = None, city_id: int = None):
+                          sr_id: int = None, response_state: int = None, city_id: int = None,
+                          updated_since: datetime = None):
     # Base query for service responses
     # Join with ServiceRequest to enable city filtering
     query = db.query(ServiceResponse).join(ServiceRequest, ServiceResponse.sr_id == ServiceRequest.sr_id)
@@ -58,6 +112,9 @@ def get_service_responses(db: Session, page: int = 1, size: int = 10, user_id: i
         query = query.filter(ServiceResponse.response_state == response_state)
     if city_id is not None:
         query = query.filter(ServiceRequest.cityID == city_id)
+    if updated_since is not None:
+        # Served by idx_response_user_updated (response_userid, update_date) when combined with user_id
+        query = query.filter(ServiceResponse.update_date >= updated_since)
     
     total = query.count()
     items = query.offset((page - 1) * size).limit(size).all()
@@ -106,11 +163,34 @@ def get_service_responses(db: Session, page: int = 1, size: int = 10, user_id: i
     }
 
 def create_service_response(db: Session, response: ServiceResponseCreate, user_id: int):
+    now = datetime.utcnow()
     db_response = ServiceResponse(
         **response.model_dump(),
-        response_userid=user_id
+        response_userid=user_id,
+        response_date=now,
+        update_date=now
     )
     db.add(db_response)
+    db.flush()
+
+    # The first response moves the request from 'Published' to 'In Response'
+    payload = response_snapshot(db_response)
+    db_request = db.query(ServiceRequest).filter(ServiceRequest.sr_id == db_response.sr_id).first()
+    if db_request:
+        first_response = db_request.ps_state == 0
+        if first_response:
+            db_request.ps_state = 1
+            db_request.ps_updatedate = now
+        payload.update({
+            "first_response": first_response,
+            "psr_userid": db_request.psr_userid,
+            "cityID": db_request.cityID,
+            "stype_id": db_request.stype_id,
+            "ps_begindate": db_request.ps_begindate,
+            "ps_state": db_request.ps_state
+        })
+    crud_outbox.add_event(db, "response.created", crud_outbox.SERVICE_RESPONSE,
+                          db_response.response_id, payload)
     db.commit()
     db.refresh(db_response)
     return db_response
@@ -123,7 +203,23 @@ def update_service_response(db: Session, response_id: int, response_update: Serv
     update_data = response_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_response, field, value)
+    db_response.update_date = datetime.utcnow()
     
+    crud_outbox.add_event(db, "response.updated", crud_outbox.SERVICE_RESPONSE,
+                          response_id, response_snapshot(db_response))
+    db.commit()
+    db.refresh(db_response)
+    return db_response
+
+def cancel_service_response(db: Session, response_id: int):
+    db_response = get_service_response(db, response_id)
+    if not db_response:
+        return None
+
+    db_response.response_state = 3
+    db_response.update_date = datetime.utcnow()
+    crud_outbox.add_event(db, "response.cancelled", crud_outbox.SERVICE_RESPONSE,
+                          response_id, response_snapshot(db_response))
     db.commit()
     db.refresh(db_response)
     return db_response
@@ -133,10 +229,20 @@ def delete_service_response(db: Session, response_id: int):
     if not db_response:
         return False
     
+    snapshot = response_snapshot(db_response)
     db.delete(db_response)
+    crud_outbox.add_event(db, "response.deleted", crud_outbox.SERVICE_RESPONSE,
+                          response_id, snapshot)
     db.commit()
     return True
 
+def get_responder_ids(db: Session, request_id: int) -> list:
+    """Distinct ids of users who responded to a service request"""
+    rows = db.query(ServiceResponse.response_userid).filter(
+        ServiceResponse.sr_id == request_id
+    ).distinct().all()
+    return [row.response_userid for row in rows]
+
 def has_responses(db: Session, request_id: int) -> bool:
     """
     Check if a service request has any responses.
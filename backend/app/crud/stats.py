@@ -1,8 +1,293 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
+import threading
+import time
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import func, extract, select, case, and_, union_all, literal
+from app.core.config import settings
+from app.core.metrics import STATS_CACHE_LOOKUPS
 from app.models.service_request import ServiceRequest
 from app.models.accept_info import AcceptInfo
-from datetime import datetime, timedelta
+from app.models.report import Report
+from app.models.city_info import CityInfo
+from app.models.service_type import ServiceType
+from datetime import datetime
+
+# Optional breakdowns of the monthly counts
+DIMENSIONS = {
+    "city": ServiceRequest.cityID,
+    "stype": ServiceRequest.stype_id,
+}
+
+
+def parse_month(month: str) -> int:
+    """'YYYY-MM' -> month bucket (months since year 0), so month arithmetic is integer arithmetic"""
+    year, month_num = map(int, month.split('-'))
+    if not 1 <= month_num <= 12:
+        raise ValueError(f"Invalid month: {month}")
+    return year * 12 + month_num - 1
+
+
+def bucket_label(bucket: int) -> str:
+    year, month_index = divmod(bucket, 12)
+    return f"{year:04d}-{month_index + 1:02d}"
+
+
+def bucket_month_id(bucket: int) -> str:
+    """Month bucket -> report.monthID ('YYYYMM')"""
+    year, month_index = divmod(bucket, 12)
+    return f"{year:04d}{month_index + 1:02d}"
+
+
+def bucket_start(bucket: int) -> datetime:
+    year, month_index = divmod(bucket, 12)
+    return datetime(year, month_index + 1, 1)
+
+
+def _month_key(column, dialect_name: str):
+    """Month of a datetime column, as cheap as the backend allows"""
+    if dialect_name == 'sqlite':
+        # DateTime is stored as ISO text, so the month is its 'YYYY-MM' prefix
+        return func.substr(column, 1, 7)
+    if dialect_name == 'mysql':
+        return extract('year_month', column)  # YYYYMM
+    return extract('year', column) * 100 + extract('month', column)
+
+
+def month_key_to_bucket(key) -> int:
+    if isinstance(key, str):
+        return parse_month(key[:7])
+    year, month_num = divmod(int(key), 100)
+    return year * 12 + month_num - 1
+
+
+def monthly_counts_query(dialect_name: str, first_bucket: int, last_bucket: int, city_id: int = None,
+                         service_type_id: int = None, dimensions=()):
+    """
+    Published and completed counts in one scan of sr_info LEFT JOIN accept_info.
+
+    Groups by (published month, completed month, *dimensions): a request
+    counts as published in its ps_begindate month (once, on its first
+    accept row when it has several) and each accept in the range counts
+    as completed in its own month. Dates are filtered with half-open
+    ranges so the ps_begindate index applies; month keys are only
+    computed for grouping. Use monthly_counts() to fold the groups.
+    """
+    start = bucket_start(first_bucket)
+    end = bucket_start(last_bucket + 1)
+    published_month = _month_key(ServiceRequest.ps_begindate, dialect_name)
+    completed_month = case(
+        (and_(AcceptInfo.createdate >= start, AcceptInfo.createdate < end),
+         _month_key(AcceptInfo.createdate, dialect_name))
+    )
+    earlier = aliased(AcceptInfo)
+    first_row = case(
+        (AcceptInfo.id.is_(None), 1),
+        # Only probed for requests with an accept (accept_info.srid index)
+        (~select(earlier.id).where(earlier.srid == AcceptInfo.srid, earlier.id < AcceptInfo.id).exists(), 1),
+        else_=0
+    )
+    dimension_columns = [DIMENSIONS[name].label(name) for name in dimensions]
+
+    query = select(
+        published_month.label('published_month'),
+        completed_month.label('completed_month'),
+        *dimension_columns,
+        func.sum(first_row).label('published'),
+        func.count(completed_month).label('completed')
+    ).select_from(ServiceRequest).outerjoin(
+        AcceptInfo, AcceptInfo.srid == ServiceRequest.sr_id
+    ).where(
+        ServiceRequest.ps_begindate >= start,
+        ServiceRequest.ps_begindate < end
+    )
+    if city_id:
+        query = query.where(ServiceRequest.cityID == city_id)
+    if service_type_id:
+        query = query.where(ServiceRequest.stype_id == service_type_id)
+    return query.group_by(published_month, completed_month, *[DIMENSIONS[name] for name in dimensions])
+
+
+def monthly_counts(db: Session, first_bucket: int, last_bucket: int, city_id: int = None,
+                   service_type_id: int = None, dimensions=()) -> dict:
+    """{(month bucket, *dimension values): [published, completed]}"""
+    query = monthly_counts_query(
+        db.bind.dialect.name, first_bucket, last_bucket, city_id, service_type_id, dimensions
+    )
+    counts = {}
+    for row in db.execute(query):
+        dims = tuple(row[2:2 + len(dimensions)])
+        published, completed = int(row.published or 0), int(row.completed or 0)
+        if published:
+            key = (month_key_to_bucket(row.published_month),) + dims
+            counts.setdefault(key, [0, 0])[0] += published
+        if completed:
+            key = (month_key_to_bucket(row.completed_month),) + dims
+            counts.setdefault(key, [0, 0])[1] += completed
+    return counts
+
+
+def monthly_rows_query(dialect_name: str, first_bucket: int, last_bucket: int, city_id: int = None,
+                       service_type_id: int = None, dimensions=()):
+    """
+    Per (month, *dimensions) counts as rows ordered by month then dimensions.
+
+    Same numbers as monthly_counts(), but from two pre-grouped halves
+    (published by ps_begindate month, completed by accept month) under
+    UNION ALL and ORDER BY, so a caller can stream the result and fold
+    adjacent rows instead of holding every group at once.
+    """
+    start = bucket_start(first_bucket)
+    end = bucket_start(last_bucket + 1)
+    dimension_columns = [DIMENSIONS[name] for name in dimensions]
+
+    def in_range(query):
+        query = query.where(ServiceRequest.ps_begindate >= start, ServiceRequest.ps_begindate < end)
+        if city_id:
+            query = query.where(ServiceRequest.cityID == city_id)
+        if service_type_id:
+            query = query.where(ServiceRequest.stype_id == service_type_id)
+        return query
+
+    published_month = _month_key(ServiceRequest.ps_begindate, dialect_name)
+    published = in_range(select(
+        published_month.label('month'),
+        *[column.label(name) for name, column in zip(dimensions, dimension_columns)],
+        func.count().label('published'),
+        literal(0).label('completed')
+    ).select_from(ServiceRequest)).group_by(published_month, *dimension_columns)
+
+    completed_month = _month_key(AcceptInfo.createdate, dialect_name)
+    completed = in_range(select(
+        completed_month.label('month'),
+        *[column.label(name) for name, column in zip(dimensions, dimension_columns)],
+        literal(0).label('published'),
+        func.count().label('completed')
+    ).select_from(AcceptInfo).join(
+        ServiceRequest, ServiceRequest.sr_id == AcceptInfo.srid
+    ).where(
+        AcceptInfo.createdate >= start,
+        AcceptInfo.createdate < end
+    )).group_by(completed_month, *dimension_columns)
+
+    combined = union_all(published, completed).subquery()
+    order = [combined.c.month] + [combined.c[name] for name in dimensions]
+    return select(combined).order_by(*order)
+
+
+def iter_monthly_rows(db: Session, first_bucket: int, last_bucket: int, city_id: int = None,
+                      service_type_id: int = None, dimensions=()):
+    """
+    Yield (month bucket, *dimension values, published, completed) in order, from a streamed cursor.
+
+    Without dimensions every month of the range is yielded, zeros
+    included; with dimensions only non-empty cells are.
+    """
+    query = monthly_rows_query(
+        db.bind.dialect.name, first_bucket, last_bucket, city_id, service_type_id, dimensions
+    )
+    current, counts = None, [0, 0]
+    next_bucket = first_bucket
+    for row in db.execute(query.execution_options(yield_per=1000)):
+        key = (month_key_to_bucket(row.month),) + tuple(row[1:1 + len(dimensions)])
+        if key != current:
+            if current is not None:
+                yield current + tuple(counts)
+            if not dimensions:
+                # Months with neither publications nor completions
+                for bucket in range(next_bucket, key[0]):
+                    yield (bucket, 0, 0)
+                next_bucket = key[0] + 1
+            current, counts = key, [0, 0]
+        counts[0] += int(row.published)
+        counts[1] += int(row.completed)
+    if current is not None:
+        yield current + tuple(counts)
+    if not dimensions:
+        for bucket in range(next_bucket, last_bucket + 1):
+            yield (bucket, 0, 0)
+
+
+class RangeCache:
+    """
+    Results keyed by (first_bucket, last_bucket, *arguments).
+
+    invalidate() drops only the entries whose month range contains a
+    month a write touched, so results over closed months survive writes
+    to the current one. A build that raced with an invalidation is
+    returned but not stored.
+    """
+
+    def __init__(self, name: str, max_entries: int):
+        self.name = name
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (expires_at or None, value)
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, key: tuple, build, ttl: float = None):
+        """Cached value for `key`, else build() it; `ttl` None keeps it until invalidated"""
+        entry = self._entries.get(key)
+        if entry and (entry[0] is None or time.monotonic() < entry[0]):
+            self.hits += 1
+            STATS_CACHE_LOOKUPS.inc(self.name, "hit")
+            return entry[1]
+        self.misses += 1
+        STATS_CACHE_LOOKUPS.inc(self.name, "miss")
+
+        generation = self._generation
+        value = build()
+        with self._lock:
+            if generation == self._generation:
+                if key not in self._entries and len(self._entries) >= self.max_entries:
+                    self._entries.pop(next(iter(self._entries)))  # oldest entry
+                self._entries[key] = (time.monotonic() + ttl if ttl is not None else None, value)
+        return value
+
+    def invalidate(self, buckets=None):
+        """Drop entries whose range contains any of `buckets`, or all of them"""
+        with self._lock:
+            self._generation += 1
+            if buckets is None:
+                self._entries.clear()
+                return
+            for key in list(self._entries):
+                if any(key[0] <= b <= key[1] for b in buckets):
+                    del self._entries[key]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None
+        }
+
+
+_monthly_cache = RangeCache("monthly", settings.STATS_CACHE_MAX_ENTRIES)
+_cube_cache = RangeCache("cube", settings.STATS_CUBE_CACHE_MAX_RANGES)
+
+
+def current_bucket() -> int:
+    now = datetime.utcnow()
+    return now.year * 12 + now.month - 1
+
+
+def invalidate_months(buckets):
+    """Called after commits that change sr_info/accept_info counts in `buckets`"""
+    _monthly_cache.invalidate(buckets)
+
+
+def invalidate():
+    """Drop every cached statistics result"""
+    _monthly_cache.invalidate()
+    _cube_cache.invalidate()
+
+
+def cache_stats() -> dict:
+    return {cache.name: cache.stats() for cache in (_monthly_cache, _cube_cache)}
+
 
 def get_monthly_statistics(
     db: Session,
@@ -13,102 +298,101 @@ def get_monthly_statistics(
     page: int = 1,
     size: int = 10
 ):
-    # Parse start date as first day of the month
-    start_date = datetime.strptime(f"{start_month}-01", "%Y-%m-%d")
-    
-    # Parse end date as last day of the month
-    end_year, end_month_num = map(int, end_month.split('-'))
-    if end_month_num == 12:
-        end_year += 1
-        end_month_num = 1
-    else:
-        end_month_num += 1
-    end_date = datetime(end_year, end_month_num, 1) - timedelta(days=1)
-
-    # Detect database type and use appropriate date formatting
-    db_dialect = db.bind.dialect.name
-    if db_dialect == 'sqlite':
-        # SQLite uses strftime
-        date_format_func = lambda col: func.strftime('%Y-%m', col)
-    else:
-        # MySQL uses date_format
-        date_format_func = lambda col: func.date_format(col, '%Y-%m')
-
-    # Build base needs query with filters
-    needs_query = db.query(
-        date_format_func(ServiceRequest.ps_begindate).label('month'),
-        func.count(ServiceRequest.sr_id).label('published_count')
-    ).filter(
-        ServiceRequest.ps_begindate >= start_date,
-        ServiceRequest.ps_begindate <= end_date
-    )
+    first_bucket = parse_month(start_month)
+    last_bucket = parse_month(end_month)
 
-    # Apply optional filters
-    if city_id:
-        needs_query = needs_query.filter(ServiceRequest.cityID == city_id)
-    if service_type_id:
-        needs_query = needs_query.filter(ServiceRequest.stype_id == service_type_id)
+    # Normalized key: 0 and None both mean "no filter"; page/size are applied after the cache
+    city_id, service_type_id = city_id or None, service_type_id or None
+    counts = _monthly_cache.get_or_build(
+        (first_bucket, last_bucket, city_id, service_type_id),
+        lambda: monthly_counts(db, first_bucket, last_bucket, city_id, service_type_id),
+        # Invalidation only reaches this worker's cache, so every range also expires for writes made
+        # by other workers; closed months change rarely (back-dated writes) and get the longer TTL
+        ttl=(settings.STATS_CACHE_OPEN_TTL_SECONDS if last_bucket >= current_bucket()
+             else settings.STATS_CACHE_CLOSED_TTL_SECONDS)
+    )
 
-    needs_query = needs_query.group_by('month')
+    # Month spine straight from the integer bucket range
+    buckets = range(first_bucket, last_bucket + 1)
+    months = [bucket_label(b) for b in buckets]
+    published = [counts.get((b,), (0, 0))[0] for b in buckets]
+    completed = [counts.get((b,), (0, 0))[1] for b in buckets]
 
-    # Build completed services query by joining with ServiceRequest to ensure 
-    # completed services are only counted if they correspond to published needs
-    completed_query = db.query(
-        date_format_func(AcceptInfo.createdate).label('month'),
-        func.count(AcceptInfo.id).label('completed_count')
-    ).join(
-        ServiceRequest, AcceptInfo.srid == ServiceRequest.sr_id
-    ).filter(
-        AcceptInfo.createdate >= start_date,
-        AcceptInfo.createdate <= end_date,
-        ServiceRequest.ps_begindate >= start_date,
-        ServiceRequest.ps_begindate <= end_date
-    )
-    
-    # Apply same optional filters to completed query
-    if city_id:
-        completed_query = completed_query.filter(ServiceRequest.cityID == city_id)
-    if service_type_id:
-        completed_query = completed_query.filter(ServiceRequest.stype_id == service_type_id)
-        
-    completed_query = completed_query.group_by('month')
-    
-    needs_data = {row.month: row.published_count for row in needs_query.all()}
-    completed_data = {row.month: row.completed_count for row in completed_query.all()}
-    
-    months = []
-    current = start_date
-    while current <= end_date:
-        month_str = current.strftime('%Y-%m')
-        months.append(month_str)
-        if current.month == 12:
-            current = current.replace(year=current.year + 1, month=1)
-        else:
-            current = current.replace(month=current.month + 1)
-    
     chart_data = {
         "months": months,
-        "published": [needs_data.get(m, 0) for m in months],
-        "completed": [completed_data.get(m, 0) for m in months]
+        "published": published,
+        "completed": completed
     }
-    
-    table_items = [
+
+    start_idx = (page - 1) * size
+    end_idx = start_idx + size
+    paginated_items = [
         {
-            "month": m,
-            "publishedCount": needs_data.get(m, 0),
-            "completedCount": completed_data.get(m, 0)
+            "month": months[i],
+            "publishedCount": published[i],
+            "completedCount": completed[i]
         }
-        for m in months
+        for i in range(start_idx, min(end_idx, len(months)))
     ]
-    
-    start_idx = (page - 1) * size
-    end_idx = start_idx + size
-    paginated_items = table_items[start_idx:end_idx]
-    
+
     return {
         "chart_data": chart_data,
         "items": paginated_items,
-        "total": len(table_items),
+        "total": len(months),
         "page": page,
         "size": size
     }
+
+
+def build_cube(db: Session, first_bucket: int, last_bucket: int) -> dict:
+    """
+    Month x city x service type counts from the report rollup, columnar.
+
+    Dimension values are sent once (months, cities, service_types) and
+    each non-empty cell is a position in the parallel `cells` arrays,
+    holding indexes into those dimensions plus its two counts.
+    """
+    rows = db.query(
+        Report.monthID, Report.cityID, Report.stype_id, Report.ps_num, Report.rs_num
+    ).filter(
+        Report.monthID >= bucket_month_id(first_bucket),
+        Report.monthID <= bucket_month_id(last_bucket),
+        (Report.ps_num != 0) | (Report.rs_num != 0)
+    ).all()
+
+    city_ids = sorted({int(row.cityID) for row in rows})
+    stype_ids = sorted({row.stype_id for row in rows})
+    city_names = dict(db.query(CityInfo.cityID, CityInfo.cityName).filter(CityInfo.cityID.in_(city_ids))) \
+        if city_ids else {}
+    stype_names = dict(db.query(ServiceType.id, ServiceType.typename).filter(ServiceType.id.in_(stype_ids))) \
+        if stype_ids else {}
+    city_index = {city_id: i for i, city_id in enumerate(city_ids)}
+    stype_index = {stype_id: i for i, stype_id in enumerate(stype_ids)}
+
+    cells = {"month": [], "city": [], "stype": [], "published": [], "completed": []}
+    for row in sorted(rows, key=lambda r: (r.monthID, int(r.cityID), r.stype_id)):
+        cells["month"].append(month_key_to_bucket(int(row.monthID)) - first_bucket)
+        cells["city"].append(city_index[int(row.cityID)])
+        cells["stype"].append(stype_index[row.stype_id])
+        cells["published"].append(row.ps_num)
+        cells["completed"].append(row.rs_num)
+
+    return {
+        "months": [bucket_label(b) for b in range(first_bucket, last_bucket + 1)],
+        "cities": {"ids": city_ids, "names": [city_names.get(i) for i in city_ids]},
+        "service_types": {"ids": stype_ids, "names": [stype_names.get(i) for i in stype_ids]},
+        "cells": cells
+    }
+
+
+def get_cube(db: Session, first_bucket: int, last_bucket: int) -> dict:
+    """Cached build_cube(); entries expire after STATS_CUBE_CACHE_TTL_SECONDS or when their months change"""
+    return _cube_cache.get_or_build(
+        (first_bucket, last_bucket), lambda: build_cube(db, first_bucket, last_bucket),
+        ttl=settings.STATS_CUBE_CACHE_TTL_SECONDS
+    )
+
+
+def invalidate_cube(buckets=None):
+    """Drop cached cubes covering any of `buckets`, or all of them"""
+    _cube_cache.invalidate(buckets)
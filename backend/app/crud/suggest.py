@@ -0,0 +1,113 @@
+import threading
+import time
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.typeahead import PrefixIndex, normalize, pinyin_keys
+from app.models.city_info import CityInfo
+from app.models.service_request import ServiceRequest
+
+_lock = threading.Lock()
+_indexes = {}  # name -> (built_at, index, payload_by_id)
+
+
+def _build_city_index(db: Session):
+    # Same duplicate English cities (Beijing and Shanghai) as /cities are left out
+    cities = db.query(CityInfo.cityID, CityInfo.cityName, CityInfo.provinceName).filter(
+        CityInfo.cityID.notin_([1, 2])
+    ).all()
+    entries = []
+    payloads = {}
+    for city in cities:
+        payloads[city.cityID] = {
+            "id": city.cityID,
+            "name": city.cityName,
+            "province": city.provinceName
+        }
+        # City name outranks province and pinyin matches
+        entries.append((city.cityName, city.cityID, 2))
+        for key in pinyin_keys(city.cityName):
+            entries.append((key, city.cityID, 1))
+        entries.append((city.provinceName, city.cityID, 0))
+        for key in pinyin_keys(city.provinceName):
+            entries.append((key, city.cityID, 0))
+    return PrefixIndex(entries), payloads
+
+
+def _build_title_index(db: Session):
+    # Cancelled requests (ps_state=-1) are neither suggested nor counted towards popularity
+    rows = db.query(
+        ServiceRequest.sr_title,
+        func.count(ServiceRequest.sr_id).label("cnt")
+    ).filter(
+        ServiceRequest.ps_state != -1
+    ).group_by(ServiceRequest.sr_title).order_by(
+        func.count(ServiceRequest.sr_id).desc()
+    ).limit(settings.SUGGEST_MAX_TITLES).all()
+
+    # Titles differing only in case/spacing collapse into one suggestion
+    merged = {}
+    for row in rows:
+        key = normalize(row.sr_title)
+        if key in merged:
+            merged[key]["count"] += row.cnt
+        else:
+            merged[key] = {"title": row.sr_title.strip(), "count": row.cnt}
+
+    entries = []
+    for key, payload in merged.items():
+        entries.append((key, key, payload["count"]))
+        for pinyin in pinyin_keys(payload["title"]):
+            entries.append((pinyin, key, payload["count"]))
+    return PrefixIndex(entries), merged
+
+
+_BUILDERS = {
+    "cities": _build_city_index,
+    "titles": _build_title_index,
+}
+
+
+def get_index(db: Session, name: str):
+    """Return (index, payloads) for `name`, rebuilding it when older than the cache TTL"""
+    entry = _indexes.get(name)
+    if entry and time.monotonic() - entry[0] < settings.SUGGEST_CACHE_TTL_SECONDS:
+        return entry[1], entry[2]
+
+    with _lock:
+        entry = _indexes.get(name)
+        if entry and time.monotonic() - entry[0] < settings.SUGGEST_CACHE_TTL_SECONDS:
+            return entry[1], entry[2]
+        index, payloads = _BUILDERS[name](db)
+        _indexes[name] = (time.monotonic(), index, payloads)
+        return index, payloads
+
+
+def warm_indexes(db: Session):
+    """Build every suggestion index up front"""
+    for name in _BUILDERS:
+        get_index(db, name)
+
+
+def is_warm() -> bool:
+    """True once every suggestion index has been built"""
+    return all(name in _indexes for name in _BUILDERS)
+
+
+def invalidate(name: str = None):
+    """Drop one cached index, or all of them"""
+    with _lock:
+        if name is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(name, None)
+
+
+def suggest_cities(db: Session, q: str, limit: int = 10):
+    index, payloads = get_index(db, "cities")
+    return [payloads[city_id] for city_id in index.search(q, limit)]
+
+
+def suggest_titles(db: Session, q: str, limit: int = 10):
+    index, payloads = get_index(db, "titles")
+    return [payloads[key] for key in index.search(q, limit)]
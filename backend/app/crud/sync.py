@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.crud import outbox as crud_outbox
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def encode_watermark(ts: datetime, seq: int) -> str:
+    """Opaque watermark: update-time cutoff in epoch ms plus the outbox change sequence"""
+    return f"{(ts - EPOCH) // timedelta(milliseconds=1)}.{seq}"
+
+
+def decode_watermark(token: str):
+    """Inverse of encode_watermark, raises ValueError for malformed tokens"""
+    ts_part, _, seq_part = token.partition(".")
+    ts_ms, seq = int(ts_part), int(seq_part)
+    if ts_ms < 0 or seq < 0:
+        raise ValueError("negative watermark")
+    return EPOCH + timedelta(milliseconds=ts_ms), seq
+
+
+def current_watermark(db: Session) -> str:
+    """
+    Watermark for data read from now on.
+
+    Both halves trail the clock by SYNC_SAFETY_LAG_SECONDS so rows and
+    events from transactions still in flight are picked up by the next
+    sync; the overlap only re-sends rows, which clients upsert by id.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.SYNC_SAFETY_LAG_SECONDS)
+    return encode_watermark(cutoff, crud_outbox.get_max_event_id(db, before=cutoff))
+
+
+def get_changes(db: Session, since: str, user_id: int, aggregate_type: str, fetch_rows) -> dict:
+    """
+    Rows of `user_id` changed since the watermark `since`.
+
+    `fetch_rows(updated_since, size)` returns the usual paginated dict for
+    rows updated at or after `updated_since`. Deleted rows come back as ids
+    in `deleted`. `reset` tells the client to drop its copy and reload,
+    either because the change log no longer reaches back to the watermark
+    or because there are more changes than one sync returns.
+    """
+    since_ts, since_seq = decode_watermark(since)
+    watermark = current_watermark(db)
+
+    # Tombstones older than the retained outbox are gone
+    retention_start = datetime.utcnow() - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+    if since_ts < retention_start or crud_outbox.get_min_event_id(db) > since_seq + 1:
+        return {"items": [], "deleted": [], "watermark": watermark, "reset": True}
+
+    result = fetch_rows(since_ts, settings.SYNC_MAX_CHANGES)
+    if result["total"] > settings.SYNC_MAX_CHANGES:
+        return {"items": [], "deleted": [], "watermark": watermark, "reset": True}
+
+    return {
+        "items": result["items"],
+        "deleted": crud_outbox.get_deleted_ids(db, aggregate_type, user_id, since_seq),
+        "watermark": watermark,
+        "reset": False
+    }
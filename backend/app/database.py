@@ -1,24 +1,124 @@
-from sqlalchemy import create_engine
+import os
+import threading
+from starlette.requests import Request
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from app.core.config import settings
+from app.core.config import get_settings
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    echo=False  # Set True for SQL debugging
-)
+Base = declarative_base()
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Created by get_engine() on first use (normally the app's lifespan startup),
+# so importing models or CRUD modules never touches the database settings.
+# Every route class (see app.core.admission) has its own primary and replica
+# engines, i.e. its own connection pools and statement timeout.
+_engines = {}  # route class -> primary engine
+_replicas = {}  # route class -> ReplicaSet
+_session_factories = {}  # route class -> sessionmaker
+_engine_lock = threading.Lock()
 
-Base = declarative_base()
+
+def _create_engine(url: str, route_class: str):
+    from sqlalchemy.engine import make_url
+    from app.core import admission
+
+    # SQLite's file and memory pools take no size options
+    options = {} if make_url(url).get_backend_name() == "sqlite" else admission.pool_options(route_class)
+    engine = create_engine(
+        url,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        echo=False,  # Set True for SQL debugging
+        **options
+    )
+    admission.limit_statement_time(engine, admission.statement_timeout_ms(route_class))
+    return engine
+
+
+def get_engine(route_class: str = "interactive"):
+    """The primary engine of `route_class`; all engines are created on the first call"""
+    if not _engines:
+        with _engine_lock:
+            if not _engines:
+                from app.core.admission import ROUTE_CLASSES
+                from app.core.replicas import ReplicaSet, RoutingSession
+
+                settings = get_settings()
+                for name in ROUTE_CLASSES:
+                    engine = _create_engine(settings.DATABASE_URL, name)
+                    _replicas[name] = ReplicaSet([_create_engine(url, name) for url in settings.DATABASE_REPLICA_URLS])
+                    _session_factories[name] = sessionmaker(
+                        autocommit=False, autoflush=False, bind=engine,
+                        class_=RoutingSession, info={"replicas": _replicas[name]}
+                    )
+                    _engines[name] = engine
+    return _engines[route_class]
+
+
+def get_replicas(route_class: str = "interactive"):
+    get_engine()
+    return _replicas[route_class]
+
+
+def get_session_factory(route_class: str = "interactive"):
+    get_engine()
+    return _session_factories[route_class]
+
+
+def named_engines() -> list:
+    """(route class, "primary" or "replica<N>", engine) for every engine created so far"""
+    return [
+        (name, target, engine)
+        for name in list(_engines)
+        for target, engine in (
+            ("primary", _engines[name]),
+            *((f"replica{index}", replica) for index, replica in enumerate(_replicas[name].engines)),
+        )
+    ]
 
 
-def get_db():
-    """Dependency for database sessions"""
-    db = SessionLocal()
+def all_engines() -> list:
+    """Every engine created so far (primaries and replicas of all route classes)"""
+    return [engine for _, _, engine in named_engines()]
+
+
+def dispose_engine():
+    """Close every pooled connection; the engines reconnect if used again"""
+    for engine in all_engines():
+        engine.dispose()
+
+
+def _drop_inherited_connections():
+    for engine in all_engines():
+        engine.dispose(close=False)
+
+
+# A forked worker must not reuse connections pooled by its parent: drop them
+# (without closing the parent's sockets) so each process opens its own
+os.register_at_fork(after_in_child=_drop_inherited_connections)
+
+
+def __getattr__(name):
+    # `database.engine` and `from app.database import SessionLocal` still work
+    if name == "engine":
+        return get_engine()
+    if name == "SessionLocal":
+        return get_session_factory()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_db(request: Request):
+    """Dependency for database sessions; GET requests may read from a replica"""
+    from app.core.admission import INTERACTIVE, route_class
+
+    db = get_session_factory(route_class(request.url.path) or INTERACTIVE)()
+    db.info["read_only"] = request.method in ("GET", "HEAD")
     try:
         yield db
     finally:
         db.close()
+
+
+def on_commit(db, callback):
+    """Run `callback()` after the session's next commit, e.g. to drop caches the commit made stale"""
+    event.listen(db, "after_commit", lambda session: callback(), once=True)
@@ -1,7 +1,8 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import logging
 from sqlalchemy.orm import Session
+from app.core.config import settings
 from app.database import get_db
 from app.core.security import decode_access_token
 from app.models.user import BUser
@@ -43,6 +44,8 @@ def get_current_user(
             )
 
         user_id_int = int(user_id)
+        # Read-your-writes: a user who just wrote is routed to the primary (see app.core.replicas)
+        db.info["user_id"] = user_id_int
         
         # If user_id is 0, this is the admin user (dummy user created during authentication)
         if user_id_int == 0:
@@ -101,3 +104,26 @@ def get_current_admin(
             detail="Admin access required"
         )
     return current_user
+
+def get_batch_ids(
+    ids: str = Query(..., description="Comma-separated ids, at most BATCH_MAX_IDS")
+) -> list:
+    """Distinct ids of a batch lookup, in request order"""
+    try:
+        parsed = list(dict.fromkeys(int(part) for part in ids.split(",") if part.strip()))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids must be comma-separated integers"
+        )
+    if not parsed:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids must not be empty"
+        )
+    if len(parsed) > settings.BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.BATCH_MAX_IDS} ids per batch"
+        )
+    return parsed
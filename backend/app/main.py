@@ -1,34 +1,120 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from app.core.config import settings
-from app.api.v1 import auth, user, service_requests, service_responses, match, stats, files, data
-
-app = FastAPI(
-    title=settings.PROJECT_NAME,
-    version=settings.VERSION,
-    openapi_url=f"{settings.API_V1_PREFIX}/openapi.json"
-)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.CORS_ORIGINS,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-app.include_router(auth.router, prefix=f"{settings.API_V1_PREFIX}/auth", tags=["Authentication"])
-app.include_router(user.router, prefix=f"{settings.API_V1_PREFIX}/users", tags=["Users"])
-app.include_router(service_requests.router, prefix=f"{settings.API_V1_PREFIX}/service-requests", tags=["Service Requests"])
-app.include_router(service_responses.router, prefix=f"{settings.API_V1_PREFIX}/service-responses", tags=["Service Responses"])
-app.include_router(match.router, prefix=f"{settings.API_V1_PREFIX}/match", tags=["Service Matching"])
-app.include_router(stats.router, prefix=f"{settings.API_V1_PREFIX}/stats", tags=["Statistics"])
-app.include_router(files.router, prefix=f"{settings.API_V1_PREFIX}/files", tags=["File Management"])
-app.include_router(data.router, prefix=f"{settings.API_V1_PREFIX}", tags=["Data"])
-@app.get("/")
-def root():
-    return {"message": "GoodServices API", "version": settings.VERSION}
-
-@app.get("/health")
-def health_check():
-    return {"status": "healthy"}
+"""
+Application factory.
+
+Importing this module does no work: routers, middleware and their
+dependencies are imported by create_app(), and the database engine,
+upload directory, outbox dispatcher and reference caches are set up by
+the lifespan when the server starts. `app.main:app` is built on first
+access, so uvicorn and the tests can keep using it.
+
+    uvicorn app.main:create_app --factory
+"""
+from contextlib import asynccontextmanager
+
+
+@asynccontextmanager
+async def lifespan(app):
+    from app.core.config import settings
+    from app.core.events import event_bus
+    from app.core.outbox import dispatcher as outbox_dispatcher
+    from app.core.metrics import instrument_engine, registry as metrics_registry
+    from app.core.health import readiness
+    from app.crud import report as crud_report, latency as crud_latency
+    from app.database import get_engine, all_engines, dispose_engine
+    from app.api.v1.files import ensure_upload_dir
+
+    get_engine()
+    for engine in all_engines():
+        instrument_engine(engine)
+    ensure_upload_dir()
+    outbox_dispatcher.register(crud_report.CONSUMER, crud_report.apply_events)
+    outbox_dispatcher.register(crud_latency.CONSUMER, crud_latency.apply_events)
+    if settings.OUTBOX_DISPATCH_ENABLED:
+        outbox_dispatcher.start()
+    readiness.start_warm_up()
+    metrics_registry.start_flusher()
+    try:
+        yield
+    finally:
+        metrics_registry.stop_flusher()
+        outbox_dispatcher.stop()
+        event_bus.close()
+        dispose_engine()
+
+
+def create_app():
+    from fastapi import FastAPI
+    from fastapi.responses import PlainTextResponse, JSONResponse
+    from fastapi.middleware.cors import CORSMiddleware
+    from sqlalchemy.exc import OperationalError
+    from app.core.config import settings
+    from app.core.metrics import MetricsMiddleware, registry as metrics_registry
+    from app.core.profiler import ProfilingMiddleware
+    from app.core.admission import AdmissionMiddleware, statement_timeout_handler
+    from app.core.ratelimit import RateLimitMiddleware
+    from app.core.compression import CompressionMiddleware
+    from app.core.health import readiness
+    from app.api.v1 import auth, user, service_requests, service_responses, match, stats, files, data, events, admin
+
+    app = FastAPI(
+        title=settings.PROJECT_NAME,
+        version=settings.VERSION,
+        openapi_url=f"{settings.API_V1_PREFIX}/openapi.json",
+        lifespan=lifespan,
+    )
+
+    # Inside CORS, so 429s and 503s still get CORS headers; throttled clients never queue for a slot
+    app.add_middleware(AdmissionMiddleware)
+    app.add_middleware(RateLimitMiddleware)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.CORS_ORIGINS,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.add_middleware(ProfilingMiddleware)
+    app.add_middleware(CompressionMiddleware)
+    app.add_middleware(MetricsMiddleware)
+    app.add_exception_handler(OperationalError, statement_timeout_handler)
+
+    app.include_router(auth.router, prefix=f"{settings.API_V1_PREFIX}/auth", tags=["Authentication"])
+    app.include_router(user.router, prefix=f"{settings.API_V1_PREFIX}/users", tags=["Users"])
+    app.include_router(service_requests.router, prefix=f"{settings.API_V1_PREFIX}/service-requests", tags=["Service Requests"])
+    app.include_router(service_responses.router, prefix=f"{settings.API_V1_PREFIX}/service-responses", tags=["Service Responses"])
+    app.include_router(match.router, prefix=f"{settings.API_V1_PREFIX}/match", tags=["Service Matching"])
+    app.include_router(stats.router, prefix=f"{settings.API_V1_PREFIX}/stats", tags=["Statistics"])
+    app.include_router(files.router, prefix=f"{settings.API_V1_PREFIX}/files", tags=["File Management"])
+    app.include_router(data.router, prefix=f"{settings.API_V1_PREFIX}", tags=["Data"])
+    app.include_router(events.router, prefix=f"{settings.API_V1_PREFIX}/events", tags=["Events"])
+    app.include_router(admin.router, prefix=f"{settings.API_V1_PREFIX}/admin", tags=["Admin"])
+
+    @app.get("/")
+    def root():
+        return {"message": "GoodServices API", "version": settings.VERSION}
+
+    @app.get("/health")
+    def health_check():
+        return {"status": "healthy"}
+
+    @app.get("/ready")
+    def readiness_check():
+        ready, checks = readiness.run()
+        return JSONResponse(
+            status_code=200 if ready else 503,
+            content={"status": "ready" if ready else "not ready", "checks": checks}
+        )
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+    return app
+
+
+def __getattr__(name):
+    # `from app.main import app` / `uvicorn app.main:app` build the default app once
+    if name == "app":
+        app = globals()["app"] = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -4,3 +4,6 @@ from app.models.city_info import CityInfo
 from app.models.service_request import ServiceRequest
 from app.models.service_response import ServiceResponse
 from app.models.accept_info import AcceptInfo
+from app.models.outbox import OutboxEvent, OutboxCheckpoint
+from app.models.report import Report
+from app.models.latency import LatencySketch
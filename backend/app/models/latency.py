@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String, Text
+from app.database import Base
+
+
+class LatencySketch(Base):
+    """Quantile sketch of one latency metric per (month, city, service type), maintained from the outbox"""
+    __tablename__ = "latency_sketch"
+
+    metric = Column(String(20), primary_key=True)  # "first_response" or "accept"
+    monthID = Column(String(6), primary_key=True)  # YYYYMM of the response / accept
+    cityID = Column(Integer, primary_key=True)
+    stype_id = Column(Integer, primary_key=True)
+    sketch = Column(Text, nullable=False)  # JSON, see app.core.sketch.DDSketch.to_dict
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from datetime import datetime
+from app.database import Base
+
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox_event"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    event_type = Column(String(50), nullable=False)
+    aggregate_type = Column(String(30), nullable=False)
+    aggregate_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=True)  # owner of the aggregate (psr_userid / response_userid)
+    payload = Column(Text, nullable=False)  # JSON
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        # Delta sync: tombstones for one user's aggregates after a sequence number
+        Index("idx_outbox_user_seq", "user_id", "aggregate_type", "id"),
+    )
+
+
+class OutboxCheckpoint(Base):
+    __tablename__ = "outbox_checkpoint"
+
+    consumer = Column(String(50), primary_key=True)
+    last_event_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String
+from app.database import Base
+
+
+class Report(Base):
+    """Monthly rollup per (month, service type, city), maintained from the outbox"""
+    __tablename__ = "report"
+
+    monthID = Column(String(6), primary_key=True)  # YYYYMM
+    stype_id = Column(Integer, primary_key=True)
+    cityID = Column(String(255), primary_key=True)
+    ps_num = Column(Integer, nullable=False, default=0)  # requests published that month
+    rs_num = Column(Integer, nullable=False, default=0)  # requests completed (accepted) that month
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, event
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -17,7 +17,22 @@ class ServiceRequest(Base):
     ps_begindate = Column(DateTime, nullable=False)
     ps_state = Column(Integer, default=0, nullable=False)
     ps_updatedate = Column(DateTime, nullable=True)
+    # Bumped by every UPDATE; part of the detail ETag, as ps_updatedate has one-second resolution on MySQL
+    row_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     user = relationship("BUser", backref="service_requests")
     service_type = relationship("ServiceType")
     city = relationship("CityInfo")
+
+    __table_args__ = (
+        # Delta sync of /service-requests/my
+        Index("idx_sr_user_updated", "psr_userid", "ps_updatedate"),
+        # Monthly statistics: range scan on ps_begindate, covering the city/type breakdowns
+        Index("idx_sr_begindate", "ps_begindate", "cityID", "stype_id"),
+    )
+
+
+@event.listens_for(ServiceRequest, "before_update")
+def _bump_row_version(mapper, connection, target):
+    # Incremented in SQL, so concurrent updates of the same row each get their own version
+    target.row_version = ServiceRequest.row_version + 1
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, event
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -15,7 +15,20 @@ class ServiceResponse(Base):
     response_state = Column(Integer, default=0)
     response_date = Column(DateTime, default=datetime.utcnow)
     update_date = Column(DateTime, nullable=True)
+    # Bumped by every UPDATE; part of the detail ETag, as update_date has one-second resolution on MySQL
+    row_version = Column(Integer, nullable=False, default=0, server_default="0")
     file_list = Column(String(400), nullable=False)
 
     user = relationship("BUser", backref="service_responses")
     service_request = relationship("ServiceRequest", backref="responses")
+
+    __table_args__ = (
+        # Delta sync of /service-responses/my
+        Index("idx_response_user_updated", "response_userid", "update_date"),
+    )
+
+
+@event.listens_for(ServiceResponse, "before_update")
+def _bump_row_version(mapper, connection, target):
+    # Incremented in SQL, so concurrent updates of the same row each get their own version
+    target.row_version = ServiceResponse.row_version + 1
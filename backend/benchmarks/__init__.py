@@ -0,0 +1,6 @@
+"""
+Load-testing and benchmark tooling.
+
+Run the modules from the backend directory, e.g.
+`python -m benchmarks.datagen --help`.
+"""
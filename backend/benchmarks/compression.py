@@ -0,0 +1,130 @@
+"""
+CPU cost against bytes saved for response compression.
+
+Renders real list pages of GET /service-requests and GET /service-responses
+from an in-memory database seeded by benchmarks.datagen, and compresses
+each body with every available codec at a few levels (zstd and br only
+when the optional packages are installed). Reports the compressed size,
+the compression ratio, the CPU time per response and the bytes saved per
+millisecond of CPU:
+
+    python -m benchmarks.compression --size 2000 --page-sizes 10,50,100 --output compression.json
+
+COMPRESSION_MIN_SIZE should sit where the bytes saved stop paying for
+the CPU (and for the extra round trip of a bigger TCP window not being
+needed anyway); the table makes that visible for our payloads.
+"""
+import argparse
+import json
+import platform
+import time
+from datetime import datetime
+from benchmarks import micro
+
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 4, 11), "zstd": (1, 3, 10)}
+
+
+def codecs(names: list = None) -> list:
+    """(name, level, codec) for every available codec and level"""
+    from app.core.compression import BrotliCodec, GzipCodec, ZstdCodec
+
+    found = []
+    for name, factory in (("gzip", GzipCodec), ("br", BrotliCodec), ("zstd", ZstdCodec)):
+        if names and name not in names:
+            continue
+        for level in LEVELS[name]:
+            try:
+                found.append((name, level, factory(level)))
+            except ImportError:
+                break
+    return found
+
+
+def payloads(env) -> dict:
+    """Rendered JSON bodies of one list page of each endpoint, by endpoint"""
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from app.api.v1 import service_requests, service_responses
+
+    with env.SessionLocal() as db, micro._quiet():
+        user = env.current_user(db)
+        pages = {
+            "GET /service-requests": service_requests.get_service_requests(
+                page=1, size=env.page_size, user_id=None, stype_id=None, city_id=None, ps_state=None, fields=None,
+                db=db, current_user=user),
+            "GET /service-responses": service_responses.get_service_responses(
+                page=1, size=env.page_size, user_id=None, sr_id=None, response_state=None, city_id=None,
+                db=db, current_user=user),
+        }
+    return {name: JSONResponse(content=jsonable_encoder(page)).body for name, page in pages.items()}
+
+
+def measure(body: bytes, codec, min_time: float = 0.2) -> dict:
+    """Compressed size and CPU time per compression of `body`"""
+    compressed = codec.compress(body)
+    number, elapsed = 0, 0.0
+    start_cpu = time.process_time()
+    start = time.perf_counter()
+    while elapsed < min_time:
+        codec.compress(body)
+        number += 1
+        elapsed = time.perf_counter() - start
+    cpu_us = (time.process_time() - start_cpu) / number * 1e6
+    saved = len(body) - len(compressed)
+    return {
+        "bytes_in": len(body),
+        "bytes_out": len(compressed),
+        "ratio": round(len(body) / len(compressed), 2),
+        "cpu_us": round(cpu_us, 1),
+        "wall_us": round(elapsed / number * 1e6, 1),
+        "saved_bytes_per_cpu_ms": round(saved / (cpu_us / 1000), 0) if cpu_us else None,
+    }
+
+
+def run(size: int, page_sizes: list, names: list = None, min_time: float = 0.2) -> list:
+    results = []
+    for page_size in page_sizes:
+        env = micro.Environment(size, page_size)
+        try:
+            bodies = payloads(env)
+        finally:
+            env.close()
+        for endpoint, body in bodies.items():
+            for name, level, codec in codecs(names):
+                results.append({"endpoint": endpoint, "page_size": page_size, "codec": name, "level": level,
+                                **measure(body, codec, min_time)})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CPU cost against bytes saved for response compression")
+    parser.add_argument("--size", type=int, default=2000, help="service requests to seed")
+    parser.add_argument("--page-sizes", default="10,50,100", help="comma-separated rows per list page")
+    parser.add_argument("--codec", action="append", help="only these codecs (gzip, br, zstd)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per measurement")
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    results = run(args.size, [int(p) for p in args.page_sizes.split(",")], args.codec, args.min_time)
+    print(f"{'endpoint':24s} {'rows':>4s} {'codec':>5s} {'lvl':>3s} {'bytes':>8s} {'->':>8s} {'ratio':>6s} "
+          f"{'cpu us':>8s} {'saved B/cpu ms':>14s}")
+    for r in results:
+        print(f"{r['endpoint']:24s} {r['page_size']:4d} {r['codec']:>5s} {r['level']:3d} {r['bytes_in']:8d} "
+              f"{r['bytes_out']:8d} {r['ratio']:6.2f} {r['cpu_us']:8.1f} {r['saved_bytes_per_cpu_ms']:14.0f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "meta": {
+                    "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "size": args.size,
+                },
+                "results": results,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,507 @@
+"""
+HTTP load test for the API.
+
+Boots the app with uvicorn against a seeded SQLite file (generated with
+benchmarks.datagen on first use) and drives a weighted mix of browse,
+detail, create, respond, accept and admin stats calls from `concurrency`
+virtual users, for a fixed duration per concurrency level:
+
+    python -m benchmarks.load_test --db ./bench.db --concurrency 1,8,32 --duration 20 \\
+        --output results.json
+
+    # Exit 1 when throughput or p95 regress by more than 10% against an earlier run
+    python -m benchmarks.load_test --db ./bench.db --baseline results.json --tolerance 0.1
+
+With --base-url the harness targets a server that is already running;
+--database-url must then point at the (datagen-seeded) database it
+serves, which is read for ids and accounts, and it should run with
+SERVER_ENV (no rate limiting, no outbox dispatcher) like the server the
+harness boots itself. Queries per request are taken from the server's
+/metrics (http_request_db_queries).
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+from collections import deque
+from datetime import datetime
+import httpx
+from sqlalchemy import create_engine, text
+
+# get_current_user only recognises the admin account named "admin"
+ADMIN_USERNAME = "admin"
+ADMIN_PASSWORD = "admin"
+# Settings of the server under test: all virtual users log in and browse from one client IP, which
+# the rate limits would turn into 429s, and a background dispatcher would compete for the SQLite lock
+SERVER_ENV = {"RATE_LIMIT_ENABLED": "false", "OUTBOX_DISPATCH_ENABLED": "false"}
+DEFAULT_MIX = {"browse": 50, "detail": 25, "create": 8, "respond": 8, "accept": 4, "stats": 5}
+API = "/api/v1"
+
+# (method, route template) of each operation, as labelled in /metrics
+OPERATION_ROUTES = {
+    "browse": ("GET", f"{API}/service-requests"),
+    "detail": ("GET", f"{API}/service-requests/{{request_id}}"),
+    "create": ("POST", f"{API}/service-requests"),
+    "respond": ("POST", f"{API}/service-responses"),
+    "accept": ("POST", f"{API}/match/accept/{{response_id}}"),
+    "stats": ("GET", f"{API}/stats/monthly"),
+}
+
+
+def ensure_admin(engine, username: str = ADMIN_USERNAME, password: str = ADMIN_PASSWORD):
+    """auser_table is not an ORM model; create it on SQLite and add the benchmark admin"""
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS auser_table (aname VARCHAR(50) PRIMARY KEY, apwd VARCHAR(50))"
+            ))
+        exists = conn.execute(text("SELECT 1 FROM auser_table WHERE aname = :name"), {"name": username}).first()
+        if not exists:
+            conn.execute(text("INSERT INTO auser_table (aname, apwd) VALUES (:name, :pwd)"),
+                         {"name": username, "pwd": password})
+
+
+def prepare_database(path: str, users: int, requests: int, responses: int, seed: int) -> str:
+    """Seed `path` with benchmarks.datagen unless it already exists; returns its URL"""
+    from benchmarks import datagen
+
+    url = f"sqlite:///{os.path.abspath(path)}"
+    engine = create_engine(url)
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        from app.database import Base
+        import app.models  # noqa: F401  registers every table on Base.metadata
+        Base.metadata.create_all(bind=engine)
+        print(f"Seeding {path} ...")
+        datagen.generate(engine, users, requests, responses, seed=seed)
+    ensure_admin(engine)
+    engine.dispose()
+    return url
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(database_url: str, port: int, extra_env: dict = None, timeout: float = 120.0,
+                 workers: int = None):
+    """Run uvicorn (or serve.py with `workers` processes) in a subprocess and wait until /ready answers 200"""
+    env = {**os.environ, "DATABASE_URL": database_url, **(extra_env or {})}
+    if workers:
+        command = [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port),
+                   "--workers", str(workers), "--log-level", "warning"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+                   "--log-level", "warning", "--no-access-log"]
+    process = subprocess.Popen(
+        command,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env, stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/ready", timeout=2).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("Server did not become ready in time")
+
+
+class Workload:
+    """Ids and accounts the operations draw from, plus state shared between virtual users"""
+
+    def __init__(self, engine, accounts: int = 16):
+        with engine.connect() as conn:
+            self.sr_min, self.sr_max = conn.execute(text("SELECT MIN(sr_id), MAX(sr_id) FROM sr_info")).one()
+            first, last = conn.execute(text("SELECT MIN(ps_begindate), MAX(ps_begindate) FROM sr_info")).one()
+            self.city_ids = [row[0] for row in conn.execute(text("SELECT DISTINCT cityID FROM sr_info"))]
+            self.stype_ids = [row[0] for row in conn.execute(text("SELECT id FROM service_type"))]
+            # Low ids publish the most under datagen's skew, so these are the busy accounts
+            self.usernames = [row[0] for row in conn.execute(
+                text("SELECT uname FROM buser_table WHERE uname LIKE 'bench!_%' ESCAPE '!' ORDER BY id LIMIT :n"),
+                {"n": accounts}
+            )]
+            self.dataset = {
+                table: conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+                for table in ("buser_table", "sr_info", "response_info", "accept_info")
+            }
+        if not self.usernames or self.sr_max is None:
+            raise RuntimeError("Database has no datagen users or requests; seed it with benchmarks.datagen")
+        self.first_month = str(first)[:7]
+        self.last_month = str(last)[:7]
+        self.tokens = []
+        self.user_ids = []
+        self.admin_token = None
+        # Requests created during the run (sr_id, owner index) and responses waiting for their owner
+        self.open_requests = deque(maxlen=1000)
+        self.pending = {}
+
+    async def login(self, client: httpx.AsyncClient, password: str, admin_username: str, admin_password: str):
+        for username in self.usernames:
+            response = await client.post(f"{API}/auth/login", json={"username": username, "password": password})
+            response.raise_for_status()
+            data = response.json()["data"]
+            self.tokens.append({"Authorization": f"Bearer {data['token']}"})
+            self.user_ids.append(data["user_info"]["id"])
+        response = await client.post(f"{API}/auth/login",
+                                     json={"username": admin_username, "password": admin_password})
+        response.raise_for_status()
+        self.admin_token = {"Authorization": f"Bearer {response.json()['data']['token']}"}
+        self.pending = {i: deque(maxlen=1000) for i in range(len(self.tokens))}
+
+
+async def op_browse(client, workload, me, rng):
+    params = {"page": rng.randint(1, 10), "size": 10}
+    if rng.random() < 0.3:
+        params["city_id"] = rng.choice(workload.city_ids)
+    if rng.random() < 0.3:
+        params["stype_id"] = rng.choice(workload.stype_ids)
+    return await client.get(f"{API}/service-requests", params=params, headers=workload.tokens[me])
+
+
+async def op_detail(client, workload, me, rng):
+    sr_id = rng.randint(workload.sr_min, workload.sr_max)
+    return await client.get(f"{API}/service-requests/{sr_id}", headers=workload.tokens[me])
+
+
+async def op_create(client, workload, me, rng):
+    response = await client.post(f"{API}/service-requests", headers=workload.tokens[me], json={
+        "sr_title": f"Load test {rng.randrange(1000)}",
+        "stype_id": rng.choice(workload.stype_ids),
+        "cityID": rng.choice(workload.city_ids),
+        "desc": "Created by benchmarks.load_test",
+        "file_list": "",
+        "ps_begindate": datetime.utcnow().isoformat(),
+    })
+    if response.status_code == 201:
+        workload.open_requests.append((response.json()["data"]["sr_id"], me))
+    return response
+
+
+async def op_respond(client, workload, me, rng):
+    target = None
+    for _ in range(5):
+        if not workload.open_requests:
+            break
+        candidate = rng.choice(workload.open_requests)
+        if candidate[1] != me:
+            target = candidate
+            break
+    sr_id, owner = target or (rng.randint(workload.sr_min, workload.sr_max), None)
+    response = await client.post(f"{API}/service-responses", headers=workload.tokens[me], json={
+        "sr_id": sr_id, "title": "Load test response", "desc": "Available this week", "file_list": ""
+    })
+    if response.status_code == 201 and owner is not None:
+        workload.pending[owner].append(response.json()["data"]["id"])
+    return response
+
+
+async def op_accept(client, workload, me, rng):
+    if not workload.pending[me]:
+        return None  # nothing to accept yet; the caller browses instead
+    response_id = workload.pending[me].popleft()
+    return await client.post(f"{API}/match/accept/{response_id}", headers=workload.tokens[me])
+
+
+async def op_stats(client, workload, me, rng):
+    return await client.get(f"{API}/stats/monthly", headers=workload.admin_token, params={
+        "start_month": workload.first_month, "end_month": workload.last_month, "size": 12
+    })
+
+
+OPERATIONS = {
+    "browse": op_browse,
+    "detail": op_detail,
+    "create": op_create,
+    "respond": op_respond,
+    "accept": op_accept,
+    "stats": op_stats,
+}
+
+_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_metrics(exposition: str) -> dict:
+    """{(name, ((label, value), ...)): value} from Prometheus text format"""
+    samples = {}
+    for line in exposition.splitlines():
+        match = _SAMPLE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        key = tuple(sorted(_LABEL.findall(labels or "")))
+        samples[(name, key)] = float(value)
+    return samples
+
+
+def _route_queries(before: dict, after: dict, method: str, route: str):
+    key = tuple(sorted((("method", method), ("route", route))))
+    total = after.get(("http_request_db_queries_sum", key), 0) - before.get(("http_request_db_queries_sum", key), 0)
+    count = after.get(("http_request_db_queries_count", key), 0) - before.get(("http_request_db_queries_count", key), 0)
+    return total, count
+
+
+def percentile(sorted_values: list, p: float):
+    """Nearest-rank percentile"""
+    if not sorted_values:
+        return None
+    rank = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def summarize(latencies: list) -> dict:
+    values = sorted(latencies)
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    return {
+        "p50": round(percentile(values, 50) * 1000, 3),
+        "p95": round(percentile(values, 95) * 1000, 3),
+        "p99": round(percentile(values, 99) * 1000, 3),
+        "mean": round(sum(values) / len(values) * 1000, 3),
+        "max": round(values[-1] * 1000, 3),
+    }
+
+
+async def _drive(client, workload, concurrency: int, duration: float, mix: dict, seed: int, record: dict = None):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    deadline = time.perf_counter() + duration
+
+    async def virtual_user(index: int):
+        rng = random.Random(seed * 1000 + index)
+        me = index % len(workload.tokens)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = await OPERATIONS[name](client, workload, me, rng)
+                if response is None:
+                    name = "browse"
+                    start = time.perf_counter()
+                    response = await op_browse(client, workload, me, rng)
+                status_code = response.status_code
+            except httpx.HTTPError:
+                status_code = 0
+            elapsed = time.perf_counter() - start
+            if record is not None:
+                stats = record.setdefault(name, {"latencies": [], "errors": 0, "status": {}})
+                stats["latencies"].append(elapsed)
+                stats["status"][str(status_code)] = stats["status"].get(str(status_code), 0) + 1
+                if not 200 <= status_code < 300:
+                    stats["errors"] += 1
+
+    await asyncio.gather(*(virtual_user(i) for i in range(concurrency)))
+
+
+async def run_level(client, workload, concurrency: int, duration: float, warmup: float,
+                    mix: dict = None, seed: int = 1) -> dict:
+    """Warm up, then measure one concurrency level; returns its result section"""
+    mix = mix or DEFAULT_MIX
+    if warmup > 0:
+        await _drive(client, workload, concurrency, warmup, mix, seed + 7919)
+
+    before = parse_metrics((await client.get("/metrics")).text)
+    record = {}
+    started = time.perf_counter()
+    await _drive(client, workload, concurrency, duration, mix, seed, record)
+    elapsed = time.perf_counter() - started
+    after = parse_metrics((await client.get("/metrics")).text)
+
+    operations = {}
+    all_latencies = []
+    total_queries = total_counted = 0
+    for name, stats in sorted(record.items()):
+        queries, counted = _route_queries(before, after, *OPERATION_ROUTES[name])
+        total_queries += queries
+        total_counted += counted
+        all_latencies.extend(stats["latencies"])
+        operations[name] = {
+            "requests": len(stats["latencies"]),
+            "errors": stats["errors"],
+            "status": stats["status"],
+            "throughput_rps": round(len(stats["latencies"]) / elapsed, 2),
+            "latency_ms": summarize(stats["latencies"]),
+            "queries_per_request": round(queries / counted, 2) if counted else None,
+        }
+
+    requests = len(all_latencies)
+    errors = sum(op["errors"] for op in operations.values())
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 3),
+        "requests": requests,
+        "errors": errors,
+        "error_rate": round(errors / requests, 4) if requests else 0.0,
+        "throughput_rps": round(requests / elapsed, 2),
+        "latency_ms": summarize(all_latencies),
+        "queries_per_request": round(total_queries / total_counted, 2) if total_counted else None,
+        "operations": operations,
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float, max_error_rate: float) -> list:
+    """Regressions of `result` against `baseline` as human-readable strings (empty means pass)"""
+    failures = []
+    previous = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    for level in result["levels"]:
+        c = level["concurrency"]
+        if level["error_rate"] > max_error_rate:
+            failures.append(f"c={c}: error rate {level['error_rate']:.2%} > {max_error_rate:.2%}")
+        base = previous.get(c)
+        if not base:
+            continue
+        if level["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            failures.append(f"c={c}: throughput {level['throughput_rps']} rps < baseline {base['throughput_rps']} rps")
+        for name, op in level["operations"].items():
+            base_op = base["operations"].get(name)
+            if not base_op or op["latency_ms"]["p95"] is None or base_op["latency_ms"]["p95"] is None:
+                continue
+            if op["latency_ms"]["p95"] > base_op["latency_ms"]["p95"] * (1 + tolerance):
+                failures.append(f"c={c} {name}: p95 {op['latency_ms']['p95']} ms > baseline "
+                                f"{base_op['latency_ms']['p95']} ms")
+            if (op["queries_per_request"] or 0) > (base_op["queries_per_request"] or 0) + 1e-9:
+                failures.append(f"c={c} {name}: {op['queries_per_request']} queries/request > baseline "
+                                f"{base_op['queries_per_request']}")
+    return failures
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_level(level: dict):
+    print(f"\nconcurrency={level['concurrency']}  {level['throughput_rps']} req/s  "
+          f"p50={level['latency_ms']['p50']}ms p95={level['latency_ms']['p95']}ms "
+          f"p99={level['latency_ms']['p99']}ms  errors={level['errors']}  "
+          f"queries/req={level['queries_per_request']}")
+    for name, op in level["operations"].items():
+        print(f"  {name:8s} {op['requests']:7d} req  {op['throughput_rps']:8.1f} req/s  "
+              f"p50={op['latency_ms']['p50']}ms p95={op['latency_ms']['p95']}ms p99={op['latency_ms']['p99']}ms  "
+              f"errors={op['errors']}  queries/req={op['queries_per_request']}")
+
+
+async def run_benchmark(base_url: str, workload: Workload, levels: list, duration: float, warmup: float,
+                        mix: dict, seed: int, password: str, admin_username: str, admin_password: str,
+                        transport=None) -> list:
+    results = []
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits, transport=transport) as client:
+        await workload.login(client, password, admin_username, admin_password)
+        for concurrency in levels:
+            level = await run_level(client, workload, concurrency, duration, warmup, mix, seed)
+            _print_level(level)
+            results.append(level)
+    return results
+
+
+def _parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}")
+        mix[name] = float(weight)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP load test against a seeded database")
+    parser.add_argument("--db", default="bench.db", help="SQLite file to seed (if missing) and serve")
+    parser.add_argument("--base-url", help="target an already running server instead of booting one")
+    parser.add_argument("--database-url", help="database the --base-url server uses (read for ids and accounts)")
+    parser.add_argument("--seed-users", type=int, default=2000)
+    parser.add_argument("--seed-requests", type=int, default=20000)
+    parser.add_argument("--seed-responses", type=int, default=60000)
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated levels")
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds per level")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before each level")
+    parser.add_argument("--mix", type=_parse_mix, default=DEFAULT_MIX,
+                        help="weights, e.g. browse=50,detail=25,create=8,respond=8,accept=4,stats=5")
+    parser.add_argument("--accounts", type=int, default=16, help="distinct users logged in by virtual users")
+    parser.add_argument("--password", default="Pass123", help="password of the datagen users")
+    parser.add_argument("--admin-username", default=ADMIN_USERNAME)
+    parser.add_argument("--admin-password", default=ADMIN_PASSWORD)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON results here")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    args = parser.parse_args(argv)
+
+    levels = [int(c) for c in args.concurrency.split(",")]
+    process = None
+    if args.base_url:
+        if not args.database_url:
+            parser.error("--base-url requires --database-url")
+        base_url, database_url = args.base_url, args.database_url
+    else:
+        database_url = prepare_database(args.db, args.seed_users, args.seed_requests, args.seed_responses, args.seed)
+        port = _free_port()
+        process = start_server(database_url, port, SERVER_ENV)
+        base_url = f"http://127.0.0.1:{port}"
+
+    try:
+        engine = create_engine(database_url)
+        workload = Workload(engine, args.accounts)
+        engine.dispose()
+        levels_result = asyncio.run(run_benchmark(
+            base_url, workload, levels, args.duration, args.warmup, args.mix, args.seed,
+            args.password, args.admin_username, args.admin_password
+        ))
+    finally:
+        if process:
+            process.terminate()
+            process.wait(10)
+
+    result = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": database_url.split("://")[0],
+            "dataset": workload.dataset,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "mix": args.mix,
+            "seed": args.seed,
+        },
+        "levels": levels_result,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        failures = compare(result, baseline, args.tolerance, args.max_error_rate)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
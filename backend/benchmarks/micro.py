@@ -0,0 +1,259 @@
+"""
+Microbenchmarks for CRUD and serialization hot paths.
+
+Each case runs against an in-memory SQLite database filled by
+benchmarks.datagen at every --sizes value (number of service requests;
+users and responses scale with it) and reports the time per call and
+the peak memory allocated during one call:
+
+    python -m benchmarks.micro --sizes 1000,10000 --output before.json
+    # ... apply an optimization ...
+    python -m benchmarks.micro --sizes 1000,10000 --compare before.json
+
+Route functions are called directly (no HTTP), so the numbers isolate
+the CRUD query plus the row-to-dict loops in api/v1/service_requests.py.
+Their debug prints are sent to /dev/null but still formatted.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+CASES = {}
+
+
+def case(name: str):
+    """Register `setup(env) -> callable` under `name`"""
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+class Environment:
+    """In-memory database seeded with `size` requests, plus helpers shared by the cases"""
+
+    def __init__(self, size: int, page_size: int, seed: int = 42):
+        from app.database import Base
+        import app.models  # noqa: F401  registers every table on Base.metadata
+        from benchmarks import datagen
+
+        self.size = size
+        self.page_size = page_size
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=self.engine)
+        datagen.generate(self.engine, users=max(10, size // 10), requests=size, responses=size * 3,
+                         months=12, end_month="2025-06", seed=seed, verbose=False)
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        with self.engine.connect() as conn:
+            self.user_id = conn.execute(text("SELECT MIN(id) FROM buser_table")).scalar()
+            self.sr_id = conn.execute(text("SELECT MIN(sr_id) FROM sr_info")).scalar()
+
+    def current_user(self, db):
+        from app.models.user import BUser
+        return db.query(BUser).filter(BUser.id == self.user_id).first()
+
+    def close(self):
+        self.engine.dispose()
+
+
+@case("crud.service_response.get_service_responses")
+def _get_service_responses(env):
+    from app.crud import service_response as crud_service_response
+
+    def run():
+        with env.SessionLocal() as db:
+            crud_service_response.get_service_responses(db, page=1, size=env.page_size)
+    return run
+
+
+@case("crud.stats.get_monthly_statistics")
+def _get_monthly_statistics(env):
+    from app.crud import stats as crud_stats
+
+    def run():
+        with env.SessionLocal() as db:
+            crud_stats.get_monthly_statistics(db, "2024-07", "2025-06", page=1, size=12)
+    return run
+
+
+@case("ServiceResponseResponse.model_dump")
+def _service_response_model_dump(env):
+    from app.crud import service_response as crud_service_response
+    from app.schemas.service_response import ServiceResponseResponse
+
+    with env.SessionLocal() as db, _quiet():
+        items = crud_service_response.get_service_responses(db, page=1, size=env.page_size)["items"]
+
+    def run():
+        for item in items:
+            ServiceResponseResponse(**item).model_dump()
+    return run
+
+
+@case("core.security.decode_access_token")
+def _decode_access_token(env):
+    from app.core.security import create_access_token, decode_access_token
+
+    token = create_access_token(data={"sub": str(env.user_id), "username": f"bench_{env.user_id}"})
+
+    def run():
+        decode_access_token(token)
+    return run
+
+
+@case("api.service_requests.get_service_requests")
+def _list_service_requests(env):
+    from app.api.v1 import service_requests
+
+    def run():
+        with env.SessionLocal() as db:
+            service_requests.get_service_requests(
+                page=1, size=env.page_size, user_id=None, stype_id=None, city_id=None, ps_state=None, fields=None,
+                db=db, current_user=env.current_user(db)
+            )
+    return run
+
+
+@case("api.service_requests.get_service_requests?fields")
+def _list_service_requests_sparse(env):
+    from app.api.v1 import service_requests
+
+    def run():
+        with env.SessionLocal() as db:
+            service_requests.get_service_requests(
+                page=1, size=env.page_size, user_id=None, stype_id=None, city_id=None, ps_state=None,
+                fields="sr_id,sr_title,ps_state,city_name", db=db, current_user=env.current_user(db)
+            )
+    return run
+
+
+@case("api.service_requests.get_service_request")
+def _get_service_request(env):
+    from fastapi import Response
+    from app.api.v1 import service_requests
+
+    def run():
+        with env.SessionLocal() as db:
+            service_requests.get_service_request(env.sr_id, Response(), if_none_match=None,
+                                                 db=db, current_user=env.current_user(db))
+    return run
+
+
+@contextlib.contextmanager
+def _quiet():
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def measure(func, min_time: float = 0.2, repeat: int = 5) -> dict:
+    """Per-call time (best and median of `repeat` rounds) and peak allocation of one call"""
+    with _quiet():
+        func()  # warm caches and lazy imports
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+            number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+        rounds = [elapsed / number]
+        for _ in range(repeat - 1):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            rounds.append((time.perf_counter() - start) / number)
+
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            func()
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "calls": number * repeat,
+        "per_call_us": {"min": round(min(rounds) * 1e6, 2), "median": round(statistics.median(rounds) * 1e6, 2)},
+        "peak_alloc_kib": round(peak / 1024, 2),
+    }
+
+
+def run(sizes: list, page_size: int, names: list = None, min_time: float = 0.2, repeat: int = 5) -> list:
+    results = []
+    for size in sizes:
+        env = Environment(size, page_size)
+        try:
+            for name, setup in CASES.items():
+                if names and not any(part in name for part in names):
+                    continue
+                result = {"name": name, "size": size, "page_size": page_size,
+                          **measure(setup(env), min_time, repeat)}
+                results.append(result)
+        finally:
+            env.close()
+    return results
+
+
+def _print_results(results: list, previous: dict):
+    print(f"{'case':48s} {'size':>7s} {'us/call':>12s} {'peak KiB':>10s}  vs baseline")
+    for result in results:
+        line = (f"{result['name']:48s} {result['size']:7d} {result['per_call_us']['median']:12.1f} "
+                f"{result['peak_alloc_kib']:10.1f}")
+        before = previous.get((result["name"], result["size"]))
+        if before:
+            ratio = before["per_call_us"]["median"] / result["per_call_us"]["median"]
+            line += f"  {ratio:5.2f}x faster" if ratio >= 1 else f"  {1 / ratio:5.2f}x slower"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks for CRUD and serialization hot paths")
+    parser.add_argument("--sizes", default="1000,10000", help="comma-separated numbers of service requests")
+    parser.add_argument("--page-size", type=int, default=20, help="rows per list call")
+    parser.add_argument("--filter", action="append", help="only run cases whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing round")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write JSON results here")
+    parser.add_argument("--compare", help="JSON results of an earlier run to show speedups against")
+    parser.add_argument("--list", action="store_true", help="list the cases and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(CASES))
+        return
+
+    results = run([int(s) for s in args.sizes.split(",")], args.page_size, args.filter, args.min_time, args.repeat)
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = {(r["name"], r["size"]): r for r in json.load(f)["results"]}
+    _print_results(results, previous)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "meta": {
+                    "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                },
+                "results": results,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Worker scaling benchmark for serve.py.
+
+Starts the pre-fork server with each --workers count against the same
+seeded SQLite file and drives the list/detail endpoints from several
+client processes (so the load generator is not the bottleneck), keeping
+the number of virtual users per worker constant. Prints throughput,
+speedup over one worker and scaling efficiency (speedup / workers):
+
+    python -m benchmarks.scaling --db ./bench.db --workers 1,2,4,8,16 --output scaling.json
+
+Clients share the host with the server, so leave them cores: on a
+16-core host compare up to 12 workers with --clients 4. Scaling can
+only be near-linear up to the number of free cores.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import platform
+import time
+from datetime import datetime
+import httpx
+from sqlalchemy import create_engine
+from benchmarks import load_test
+
+# Read-only mix over the list and detail endpoints
+LIST_MIX = {"browse": 70, "detail": 30}
+
+
+def _client(base_url: str, database_url: str, concurrency: int, duration: float, warmup: float,
+            seed: int, accounts: int, password: str) -> dict:
+    """One load-generating process: returns its latencies and elapsed time"""
+    engine = create_engine(database_url)
+    workload = load_test.Workload(engine, accounts)
+    engine.dispose()
+
+    async def drive():
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+            await workload.login(client, password, load_test.ADMIN_USERNAME, load_test.ADMIN_PASSWORD)
+            if warmup > 0:
+                await load_test._drive(client, workload, concurrency, warmup, LIST_MIX, seed + 7919)
+            record = {}
+            started = time.perf_counter()
+            await load_test._drive(client, workload, concurrency, duration, LIST_MIX, seed, record)
+            return record, time.perf_counter() - started
+
+    record, elapsed = asyncio.run(drive())
+    return {
+        "latencies": [latency for stats in record.values() for latency in stats["latencies"]],
+        "errors": sum(stats["errors"] for stats in record.values()),
+        "elapsed": elapsed,
+    }
+
+
+def measure(base_url: str, database_url: str, concurrency: int, clients: int, duration: float, warmup: float,
+            seed: int = 1, accounts: int = 16, password: str = "Pass123") -> dict:
+    """Throughput and latency of `concurrency` virtual users split across `clients` processes"""
+    clients = max(1, min(clients, concurrency))
+    shares = [concurrency // clients + (1 if i < concurrency % clients else 0) for i in range(clients)]
+    with multiprocessing.get_context("spawn").Pool(clients) as pool:
+        parts = pool.starmap(_client, [
+            (base_url, database_url, share, duration, warmup, seed + i, accounts, password)
+            for i, share in enumerate(shares)
+        ])
+    latencies = sorted(latency for part in parts for latency in part["latencies"])
+    elapsed = max(part["elapsed"] for part in parts)
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": sum(part["errors"] for part in parts),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": load_test.summarize(latencies),
+    }
+
+
+def add_efficiency(results: list) -> list:
+    """Speedup and efficiency of every run relative to the smallest worker count"""
+    base = results[0]
+    for result in results:
+        speedup = result["throughput_rps"] / base["throughput_rps"] if base["throughput_rps"] else 0.0
+        result["speedup"] = round(speedup, 2)
+        result["efficiency"] = round(speedup / (result["workers"] / base["workers"]), 2)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Throughput of the list endpoints by number of workers")
+    parser.add_argument("--db", default="bench.db", help="SQLite file to seed (if missing) and serve")
+    parser.add_argument("--seed-users", type=int, default=2000)
+    parser.add_argument("--seed-requests", type=int, default=20000)
+    parser.add_argument("--seed-responses", type=int, default=60000)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--users-per-worker", type=int, default=8, help="virtual users per server worker")
+    parser.add_argument("--clients", type=int, default=max(1, multiprocessing.cpu_count() // 4),
+                        help="load-generating processes")
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--output", help="write the JSON results here")
+    args = parser.parse_args(argv)
+
+    database_url = load_test.prepare_database(args.db, args.seed_users, args.seed_requests,
+                                              args.seed_responses, seed=1)
+    results = []
+    for workers in [int(w) for w in args.workers.split(",")]:
+        port = load_test._free_port()
+        process = load_test.start_server(database_url, port, load_test.SERVER_ENV, workers=workers)
+        try:
+            result = measure(f"http://127.0.0.1:{port}", database_url, workers * args.users_per_worker,
+                             args.clients, args.duration, args.warmup)
+        finally:
+            process.terminate()
+            process.wait(60)
+        result["workers"] = workers
+        results.append(result)
+        print(f"workers={workers:3d}  {result['throughput_rps']:9.1f} req/s  p50={result['latency_ms']['p50']}ms "
+              f"p95={result['latency_ms']['p95']}ms  errors={result['errors']}")
+
+    add_efficiency(results)
+    print(f"\n{'workers':>7s} {'req/s':>9s} {'speedup':>8s} {'efficiency':>10s}")
+    for result in results:
+        print(f"{result['workers']:7d} {result['throughput_rps']:9.1f} {result['speedup']:8.2f} "
+              f"{result['efficiency']:10.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "meta": {
+                    "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+                    "git_commit": load_test._git_commit(),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "cpu_count": multiprocessing.cpu_count(),
+                    "clients": args.clients,
+                    "users_per_worker": args.users_per_worker,
+                    "mix": LIST_MIX,
+                },
+                "results": results,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
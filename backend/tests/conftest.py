@@ -9,6 +9,7 @@ from httpx import AsyncClient
 from app.main import app
 from app.database import Base, get_db
 from app.core.security import get_password_hash
+from app.core.ratelimit import get_rate_limiter
 from app.models.user import BUser
 from app.models.service_type import ServiceType
 from app.models.city_info import CityInfo
@@ -43,6 +44,12 @@ def event_loop():
     loop.close()
 
 
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """Every test starts with full rate-limit buckets"""
+    get_rate_limiter().store.clear()
+
+
 @pytest.fixture(scope="function")
 def db_session():
     """Create a clean test database for each test"""
@@ -287,3 +294,60 @@ async def created_service_response(client: AsyncClient, authenticated_user_2,
         headers=auth_headers_2
     )
     return response.json()["data"]["id"]
+
+
+@pytest.fixture
+def reference_data(db_session):
+    """Seed cities and service types using the real column names"""
+    cities = [
+        CityInfo(cityID=3, cityName="广州", provinceID=44, provinceName="广东省"),
+        CityInfo(cityID=4, cityName="深圳", provinceID=44, provinceName="广东省"),
+        CityInfo(cityID=5, cityName="杭州", provinceID=33, provinceName="浙江省"),
+        CityInfo(cityID=6, cityName="Guilin", provinceID=45, provinceName="Guangxi"),
+    ]
+    service_types = [
+        ServiceType(id=1, typename="Plumbing"),
+        ServiceType(id=2, typename="Elderly Care"),
+        ServiceType(id=3, typename="Cleaning"),
+    ]
+    db_session.add_all(cities + service_types)
+    db_session.commit()
+
+    return {"cities": cities, "service_types": service_types}
+
+
+async def _register_and_login(client: AsyncClient, user_data: dict) -> dict:
+    await client.post("/api/v1/auth/register", json=user_data)
+    login_response = await client.post("/api/v1/auth/login", json={
+        "username": user_data["uname"],
+        "password": user_data["bpwd"]
+    })
+    return {"Authorization": f"Bearer {login_response.json()['data']['token']}"}
+
+
+@pytest.fixture
+async def member_headers(client: AsyncClient, reference_data, test_user_data):
+    """Authorization headers for a registered user on top of reference_data"""
+    return await _register_and_login(client, test_user_data)
+
+
+@pytest.fixture
+async def member_headers_2(client: AsyncClient, reference_data, test_user_data_2):
+    """Authorization headers for a second registered user"""
+    return await _register_and_login(client, test_user_data_2)
+
+
+@pytest.fixture
+async def admin_headers(client: AsyncClient, db_session, reference_data):
+    """Authorization headers for the built-in admin account (auser_table is not an ORM model)"""
+    from sqlalchemy import text
+    db_session.execute(text("CREATE TABLE IF NOT EXISTS auser_table (aname VARCHAR(50) PRIMARY KEY, apwd VARCHAR(50))"))
+    db_session.execute(text("DELETE FROM auser_table"))
+    db_session.execute(text("INSERT INTO auser_table (aname, apwd) VALUES ('admin', 'admin')"))
+    db_session.commit()
+
+    login_response = await client.post("/api/v1/auth/login", json={
+        "username": "admin",
+        "password": "admin"
+    })
+    return {"Authorization": f"Bearer {login_response.json()['data']['token']}"}
@@ -0,0 +1,107 @@
+import asyncio
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.exc import OperationalError
+from app.core import admission
+from app.core.admission import ConcurrencyLimiter, add_execution_time_hint, is_statement_timeout, route_class
+from app.crud import stats as crud_stats
+
+
+@pytest.fixture(autouse=True)
+def clear_limiters():
+    admission._limiters.clear()
+    yield
+    admission._limiters.clear()
+
+
+class TestRouteClasses:
+    """Test route classification and statement hints"""
+
+    def test_route_class(self):
+        assert route_class("/api/v1/stats/monthly") == "analytic"
+        assert route_class("/api/v1/service-requests") == "interactive"
+        assert route_class("/api/v1/events") is None
+        assert route_class("/health") is None
+
+    def test_execution_time_hint(self):
+        assert add_execution_time_hint("SELECT a FROM t", 5000) == "SELECT /*+ MAX_EXECUTION_TIME(5000) */ a FROM t"
+        assert add_execution_time_hint("\n  select 1", 10) == "select /*+ MAX_EXECUTION_TIME(10) */ 1"
+        assert add_execution_time_hint("UPDATE t SET a = 1", 5000) == "UPDATE t SET a = 1"
+        assert add_execution_time_hint("SELECT a FROM t", 0) == "SELECT a FROM t"
+        hinted = add_execution_time_hint("SELECT a FROM t", 5000)
+        assert add_execution_time_hint(hinted, 100) == hinted
+
+    def test_statement_timeout_detection(self):
+        timeout = OperationalError("SELECT 1", {}, Exception(3024, "maximum statement execution time exceeded"))
+        assert is_statement_timeout(timeout)
+        assert not is_statement_timeout(OperationalError("SELECT 1", {}, Exception(2013, "Lost connection")))
+
+
+@pytest.mark.asyncio
+class TestConcurrencyLimiter:
+    """Test slots, the FIFO queue and fast rejection"""
+
+    async def test_queue_then_reject(self):
+        limiter = ConcurrencyLimiter(limit=1, queue_size=1, queue_timeout=5)
+        assert await limiter.acquire() is None
+
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.queued == 1
+        assert await limiter.acquire() == "queue_full"
+
+        limiter.release()
+        assert await waiting is None
+        assert limiter.stats() == {"limit": 1, "active": 1, "queued": 0, "queue_size": 1}
+        limiter.release()
+        assert limiter.active == 0
+
+    async def test_queue_timeout_and_cancellation(self):
+        limiter = ConcurrencyLimiter(limit=1, queue_size=4, queue_timeout=0.05)
+        await limiter.acquire()
+        assert await limiter.acquire() == "queue_timeout"
+        assert limiter.queued == 0
+
+        limiter.queue_timeout = 5
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        limiter.release()
+        assert (limiter.active, limiter.queued) == (0, 0)
+
+
+@pytest.mark.asyncio
+class TestAdmissionMiddleware:
+    """Test 503s when a route class is saturated"""
+
+    async def test_saturated_analytic_class_does_not_block_interactive(self, client: AsyncClient, admin_headers):
+        admission._limiters["analytic"] = busy = ConcurrencyLimiter(limit=1, queue_size=0, queue_timeout=1)
+        await busy.acquire()  # a long statistics query is running
+
+        response = await client.get("/api/v1/stats/monthly", params={
+            "start_month": "2025-01", "end_month": "2025-03"
+        }, headers=admin_headers)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
+        response = await client.get("/api/v1/service-types", headers=admin_headers)
+        assert response.status_code == 200
+
+        busy.release()
+        response = await client.get("/api/v1/stats/monthly", params={
+            "start_month": "2025-01", "end_month": "2025-03"
+        }, headers=admin_headers)
+        assert response.status_code == 200
+        assert busy.active == 0
+
+    async def test_statement_timeout_is_503(self, client: AsyncClient, admin_headers, monkeypatch):
+        def timed_out(*args, **kwargs):
+            raise OperationalError("SELECT ...", {}, Exception(3024, "maximum statement execution time exceeded"))
+
+        monkeypatch.setattr(crud_stats, "get_monthly_statistics", timed_out)
+        response = await client.get("/api/v1/stats/monthly", params={
+            "start_month": "2020-01", "end_month": "2025-12"
+        }, headers=admin_headers)
+        assert response.status_code == 503
+        assert "Retry-After" in response.headers
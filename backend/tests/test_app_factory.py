@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative `python -X importtime` budgets in microseconds
+IMPORT_MAIN_BUDGET_US = 50_000
+APP_MODULES_BUDGET_US = 400_000
+
+
+def _run(code: str, cwd: str, *flags, env=None):
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code], cwd=cwd, capture_output=True, text=True, timeout=120,
+        env={**os.environ, "PYTHONPATH": BACKEND_DIR, **(env or {})},
+    )
+
+
+def _import_times(stderr: str) -> dict:
+    """module -> (self us, cumulative us) from `python -X importtime` output"""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, module = line[len("import time:"):].split("|")
+        times[module.strip()] = (int(own), int(cumulative))
+    return times
+
+
+class TestImportTime:
+    """Test that importing the app module is cheap and free of side effects"""
+
+    def test_import_main_within_budget(self, tmp_path):
+        result = _run(
+            "import sys, app.main\n"
+            "heavy = [m for m in ('fastapi', 'sqlalchemy', 'app.api.v1.files', 'app.database') if m in sys.modules]\n"
+            "print(heavy)",
+            str(tmp_path), "-X", "importtime",
+        )
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == "[]"
+        assert _import_times(result.stderr)["app.main"][1] < IMPORT_MAIN_BUDGET_US
+        assert not (tmp_path / "uploads").exists()
+
+    def test_create_app_within_budget(self, tmp_path):
+        result = _run("from app.main import create_app; create_app()", str(tmp_path), "-X", "importtime")
+        assert result.returncode == 0, result.stderr
+        times = _import_times(result.stderr)
+        assert "app.api.v1.stats" in times
+        own = sum(t[0] for module, t in times.items() if module == "app" or module.startswith("app."))
+        assert own < APP_MODULES_BUDGET_US
+        # Building the app creates neither the upload directory nor an engine
+        assert not (tmp_path / "uploads").exists()
+
+
+class TestAppFactory:
+    """Test create_app() and its lifespan"""
+
+    def test_factory_returns_independent_apps(self):
+        from app.main import create_app
+
+        first, second = create_app(), create_app()
+        assert first is not second
+        assert {route.path for route in first.routes} == {route.path for route in second.routes}
+        assert "/api/v1/stats/monthly" in {route.path for route in first.routes}
+
+    def test_default_app_is_built_once(self):
+        import sys
+        from app.main import app
+
+        assert sys.modules["app.main"].app is app
+
+    def test_lifespan_sets_up_and_tears_down(self, tmp_path):
+        result = _run(
+            "from fastapi.testclient import TestClient\n"
+            "from app.main import create_app\n"
+            "from app import database\n"
+            "with TestClient(create_app()) as client:\n"
+            "    assert client.get('/health').status_code == 200\n"
+            "    print(bool(database.all_engines()))\n",
+            str(tmp_path),
+            env={"DATABASE_URL": f"sqlite:///{tmp_path / 'app.db'}", "OUTBOX_DISPATCH_ENABLED": "false"},
+        )
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == "True"
+        assert (tmp_path / "uploads").is_dir()
@@ -0,0 +1,88 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+from app.core.config import settings
+
+
+REQUEST_DATA = {
+    "sr_title": "Fix sink",
+    "stype_id": 1,
+    "cityID": 3,
+    "desc": "Leaking",
+    "file_list": "",
+    "ps_begindate": "2025-03-01T10:00:00"
+}
+
+
+class _Statements:
+    """Counts the SELECTs run on an engine, leaving out the full user row loaded by authentication"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.selects = []
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "buser_table.bpwd" not in statement:
+            self.selects.append(statement)
+
+
+@pytest.mark.asyncio
+class TestBatchLookup:
+    """Test the /batch endpoints"""
+
+    async def test_service_requests(self, client: AsyncClient, db_session, member_headers):
+        ids = []
+        for title in ("Fix sink", "Paint wall", "Walk dog"):
+            created = await client.post("/api/v1/service-requests", json={**REQUEST_DATA, "sr_title": title},
+                                        headers=member_headers)
+            ids.append(created.json()["data"]["sr_id"])
+
+        with _Statements(db_session.get_bind()) as statements:
+            response = await client.get("/api/v1/service-requests/batch",
+                                        params={"ids": f"{ids[2]},{ids[0]},999999,{ids[2]}"},
+                                        headers=member_headers)
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert list(data) == [str(ids[2]), str(ids[0])]
+        assert data[str(ids[0])]["sr_title"] == "Fix sink"
+        assert data[str(ids[0])]["publisher_name"]
+        assert data[str(ids[0])]["service_type_name"] != "Unknown"
+        # Requests, publisher names, service type names
+        assert len(statements.selects) == 3
+
+    async def test_service_responses(self, client: AsyncClient, db_session, member_headers, member_headers_2):
+        created = await client.post("/api/v1/service-requests", json=REQUEST_DATA, headers=member_headers)
+        sr_id = created.json()["data"]["sr_id"]
+        ids = []
+        for title in ("I can help", "Me too"):
+            response = await client.post("/api/v1/service-responses", json={
+                "sr_id": sr_id, "title": title, "desc": "Plumber", "file_list": ""
+            }, headers=member_headers_2)
+            ids.append(response.json()["data"]["id"])
+        await client.post(f"/api/v1/match/accept/{ids[0]}", headers=member_headers)
+
+        with _Statements(db_session.get_bind()) as statements:
+            response = await client.get("/api/v1/service-responses/batch", params={"ids": f"{ids[0]},{ids[1]}"},
+                                        headers=member_headers)
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert [data[str(i)]["response_state"] for i in ids] == [1, 0]
+        assert data[str(ids[0])]["responder_name"] == data[str(ids[1])]["responder_name"]
+        # Responses, accept records, responders
+        assert len(statements.selects) == 3
+
+    async def test_invalid_ids(self, client: AsyncClient, member_headers, monkeypatch):
+        monkeypatch.setattr(settings, "BATCH_MAX_IDS", 3)
+        for ids in ("1,two", "", "1,2,3,4"):
+            response = await client.get("/api/v1/service-requests/batch", params={"ids": ids},
+                                        headers=member_headers)
+            assert response.status_code == 400, ids
+        response = await client.get("/api/v1/service-responses/batch", headers=member_headers)
+        assert response.status_code == 422
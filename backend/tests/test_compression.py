@@ -0,0 +1,129 @@
+import gzip
+import sys
+import types
+import pytest
+from httpx import AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from app.core import compression
+from app.core.compression import CompressionMiddleware, GzipCodec, ZstdCodec, negotiate
+from benchmarks import compression as compression_benchmark
+
+ROWS = [{"sr_id": i, "sr_title": f"Fix the sink in flat {i}", "ps_state": 0} for i in range(100)]
+
+
+def _rows(request):
+    return JSONResponse(ROWS)
+
+
+def _small(request):
+    return JSONResponse({"ok": True})
+
+
+def _image(request):
+    return Response(b"\x89PNG" + b"\x00" * 4096, media_type="image/png")
+
+
+def _stream(request):
+    async def chunks():
+        for _ in range(3):
+            yield b"month,published,completed\n" * 100
+    return StreamingResponse(chunks(), media_type="text/csv")
+
+
+app = CompressionMiddleware(Starlette(routes=[
+    Route("/rows", _rows), Route("/small", _small), Route("/image", _image), Route("/stream", _stream),
+    Route("/api/v1/files/report.json", _rows),
+]))
+
+
+class TestNegotiation:
+    """Test Accept-Encoding parsing"""
+
+    def test_negotiate(self):
+        codecs = {"zstd": "zstd", "br": "br", "gzip": "gzip"}
+        assert negotiate("gzip, deflate, br, zstd", codecs) == "zstd"
+        assert negotiate("gzip;q=1.0, br;q=0.5", codecs) == "gzip"
+        assert negotiate("br;q=0, gzip;q=0.1", codecs) == "gzip"
+        assert negotiate("*;q=0.5, zstd;q=0", codecs) == "br"
+        assert negotiate("identity", codecs) is None
+        assert negotiate("", codecs) is None
+        assert negotiate("gzip;q=oops", codecs) is None
+
+
+@pytest.mark.asyncio
+class TestCompressionMiddleware:
+    """Test which responses are compressed"""
+
+    async def _get(self, path: str, encoding: str = "gzip"):
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            return await client.get(path, headers={"Accept-Encoding": encoding})
+
+    async def test_large_json_is_gzipped(self):
+        response = await self._get("/rows")
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert int(response.headers["content-length"]) < len(JSONResponse(ROWS).body) / 4
+        assert response.json() == ROWS
+
+    async def test_skipped_responses(self):
+        for path in ("/small", "/image", "/api/v1/files/report.json"):
+            response = await self._get(path)
+            assert "content-encoding" not in response.headers, path
+        assert (await self._get("/rows", encoding="identity")).headers.get("content-encoding") is None
+
+    async def test_streamed_response(self):
+        response = await self._get("/stream")
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        assert response.text == "month,published,completed\n" * 300
+
+    async def test_large_bodies_are_compressed_in_a_thread(self, monkeypatch):
+        calls = []
+
+        async def spy(func, *args):
+            calls.append(len(args[0]))
+            return func(*args)
+
+        monkeypatch.setattr(compression, "run_in_threadpool", spy)
+        monkeypatch.setattr(compression.settings, "COMPRESSION_THREAD_MIN_SIZE", 2048)
+        await self._get("/rows")
+        assert calls == [len(JSONResponse(ROWS).body)]
+
+
+def test_gzip_codec_streams_and_round_trips():
+    codec = GzipCodec(6)
+    stream = codec.stream()
+    data = stream.compress(b"a" * 1000) + stream.compress(b"b" * 1000) + stream.finish()
+    assert gzip.decompress(data) == b"a" * 1000 + b"b" * 1000
+    assert gzip.decompress(codec.compress(b"c" * 10)) == b"c" * 10
+
+
+def test_compression_benchmark_runs():
+    results = compression_benchmark.run(50, [5], names=["gzip"], min_time=0.001)
+    assert {r["endpoint"] for r in results} == {"GET /service-requests", "GET /service-responses"}
+    assert all(r["ratio"] > 1 and r["cpu_us"] >= 0 for r in results)
+
+
+def test_zstd_codec_does_not_share_compressors(monkeypatch):
+    created = []
+
+    class FakeCompressor:
+        def __init__(self, level):
+            created.append(self)
+
+        def compress(self, data):
+            return data
+
+        def compressobj(self):
+            return self
+
+    monkeypatch.setitem(sys.modules, "zstandard",
+                        types.SimpleNamespace(ZstdCompressor=FakeCompressor, COMPRESSOBJ_FLUSH_BLOCK=1))
+    codec = ZstdCodec(3)
+    codec.compress(b"a")
+    codec.compress(b"b")
+    codec.stream()
+    codec.stream()
+    assert len(created) == 4
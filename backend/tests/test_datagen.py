@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import create_engine, text
+from app.database import Base
+from benchmarks import datagen
+
+
+@pytest.fixture
+def bench_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bench.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def _scalar(engine, sql):
+    with engine.connect() as conn:
+        return conn.execute(text(sql)).scalar()
+
+
+class TestDataGenerator:
+    """Test the synthetic data generator"""
+
+    def test_generates_requested_volumes(self, bench_engine):
+        counts = datagen.generate(
+            bench_engine, users=50, requests=400, responses=1200, batch_size=100,
+            end_month="2025-06", months=12, verbose=False
+        )
+        assert counts["buser_table"] == 50
+        assert counts["sr_info"] == 400
+        assert 1100 <= counts["response_info"] <= 1200
+        assert _scalar(bench_engine, "SELECT COUNT(*) FROM response_info") == counts["response_info"]
+        # Reference data is seeded into empty tables
+        assert _scalar(bench_engine, "SELECT COUNT(*) FROM city_info") == len(datagen.DEFAULT_CITIES)
+
+    def test_rows_are_consistent(self, bench_engine):
+        datagen.generate(bench_engine, users=30, requests=300, responses=900, end_month="2025-06",
+                         months=6, verbose=False)
+        accepts = _scalar(bench_engine, "SELECT COUNT(*) FROM accept_info")
+        assert accepts > 0
+        assert _scalar(bench_engine, "SELECT COUNT(*) FROM sr_info WHERE ps_state = 2") == accepts
+        assert _scalar(bench_engine, "SELECT COUNT(*) FROM response_info WHERE response_state = 1") == accepts
+        assert _scalar(bench_engine, """
+            SELECT COUNT(*) FROM response_info r JOIN sr_info s ON s.sr_id = r.sr_id
+            WHERE r.response_date < s.ps_begindate OR r.response_userid = s.psr_userid
+        """) == 0
+        assert _scalar(bench_engine, """
+            SELECT COUNT(*) FROM accept_info a JOIN response_info r ON r.response_id = a.response_id
+            WHERE r.sr_id != a.srid OR r.response_state != 1
+        """) == 0
+        assert _scalar(bench_engine, "SELECT MIN(ps_begindate) FROM sr_info") >= "2025-01-01"
+        assert _scalar(bench_engine, "SELECT MAX(ps_begindate) FROM sr_info") < "2025-07-01"
+
+    def test_appends_after_existing_rows(self, bench_engine):
+        datagen.generate(bench_engine, users=10, requests=20, responses=40, verbose=False)
+        datagen.generate(bench_engine, users=10, requests=20, responses=40, seed=7, verbose=False)
+        assert _scalar(bench_engine, "SELECT COUNT(*) FROM buser_table") == 20
+        assert _scalar(bench_engine, "SELECT COUNT(*) FROM sr_info") == 40
@@ -0,0 +1,108 @@
+import asyncio
+from datetime import datetime
+import pytest
+from httpx import AsyncClient
+from app.core.etag import etag_matches, weak_etag
+from app.crud import service_request as crud_service_request
+from app.crud import service_response as crud_service_response
+
+
+REQUEST_DATA = {
+    "sr_title": "Fix sink",
+    "stype_id": 1,
+    "cityID": 3,
+    "desc": "Leaking",
+    "file_list": "",
+    "ps_begindate": "2025-03-01T10:00:00"
+}
+
+
+def _not_loaded(*args, **kwargs):
+    raise AssertionError("the full resource should not be loaded on a matching If-None-Match")
+
+
+class TestETag:
+    """Test ETag computation and matching"""
+
+    def test_weak_etag_and_matching(self):
+        etag = weak_etag(1, None, 0)
+        assert etag.startswith('W/"') and etag == weak_etag(1, None, 0)
+        assert etag != weak_etag(1, None, -1)
+        assert etag_matches(etag, etag)
+        assert etag_matches(f'"other", {etag.removeprefix("W/")}', etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches('W/"other"', etag)
+        assert not etag_matches(None, etag)
+
+
+@pytest.mark.asyncio
+class TestConditionalGet:
+    """Test If-None-Match on the detail endpoints"""
+
+    async def test_service_request(self, client: AsyncClient, member_headers, monkeypatch):
+        created = await client.post("/api/v1/service-requests", json=REQUEST_DATA, headers=member_headers)
+        url = f"/api/v1/service-requests/{created.json()['data']['sr_id']}"
+
+        first = await client.get(url, headers=member_headers)
+        etag = first.headers["ETag"]
+        assert etag.startswith('W/"')
+
+        with monkeypatch.context() as m:
+            m.setattr(crud_service_request, "get_service_request", _not_loaded)
+            cached = await client.get(url, headers={**member_headers, "If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+        assert cached.headers["ETag"] == etag
+
+        await asyncio.sleep(0.01)
+        await client.put(f"{url}/cancel", headers=member_headers)
+        changed = await client.get(url, headers={**member_headers, "If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.json()["data"]["ps_state"] == -1
+        assert changed.headers["ETag"] != etag
+
+    async def test_service_response(self, client: AsyncClient, member_headers, member_headers_2, monkeypatch):
+        created = await client.post("/api/v1/service-requests", json=REQUEST_DATA, headers=member_headers)
+        response = await client.post("/api/v1/service-responses", json={
+            "sr_id": created.json()["data"]["sr_id"], "title": "I can help", "desc": "Plumber", "file_list": ""
+        }, headers=member_headers_2)
+        response_id = response.json()["data"]["id"]
+        url = f"/api/v1/service-responses/{response_id}"
+
+        etag = (await client.get(url, headers=member_headers)).headers["ETag"]
+        with monkeypatch.context() as m:
+            m.setattr(crud_service_response, "get_service_response_with_details", _not_loaded)
+            cached = await client.get(url, headers={**member_headers, "If-None-Match": etag})
+        assert cached.status_code == 304
+
+        await client.post(f"/api/v1/match/reject/{response_id}", headers=member_headers)
+        changed = await client.get(url, headers={**member_headers, "If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.json()["data"]["response_state"] == 2
+
+    async def test_edits_within_one_second_change_the_etag(self, client: AsyncClient, db_session, member_headers,
+                                                            monkeypatch):
+        frozen = datetime(2025, 3, 1, 12, 0, 0)  # ps_updatedate as stored by a datetime(0) column
+
+        class _FrozenClock(datetime):
+            @classmethod
+            def utcnow(cls):
+                return frozen
+
+        monkeypatch.setattr(crud_service_request, "datetime", _FrozenClock)
+        created = await client.post("/api/v1/service-requests", json=REQUEST_DATA, headers=member_headers)
+        url = f"/api/v1/service-requests/{created.json()['data']['sr_id']}"
+
+        assert (await client.put(url, json={"sr_title": "First edit"}, headers=member_headers)).status_code == 200
+        etag = (await client.get(url, headers=member_headers)).headers["ETag"]
+        assert (await client.put(url, json={"sr_title": "Second edit"}, headers=member_headers)).status_code == 200
+
+        response = await client.get(url, headers={**member_headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.json()["data"]["sr_title"] == "Second edit"
+        assert response.headers["ETag"] != etag
+
+    async def test_missing_resource_is_not_found(self, client: AsyncClient, member_headers):
+        response = await client.get("/api/v1/service-requests/999999",
+                                    headers={**member_headers, "If-None-Match": "*"})
+        assert response.status_code == 404
@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+from httpx import AsyncClient
+from app.core.events import EventBus, LocalEventBackend, event_bus, format_sse
+
+
+async def _user_id(client: AsyncClient, headers: dict) -> int:
+    response = await client.get("/api/v1/users/me", headers=headers)
+    return response.json()["data"]["id"]
+
+
+@pytest.mark.asyncio
+class TestEventBus:
+    """Test the in-process pub/sub bus"""
+
+    async def test_publish_reaches_only_target_user(self):
+        bus = EventBus(LocalEventBackend())
+        alice = bus.subscribe(1)
+        bob = bus.subscribe(2)
+
+        bus.publish("response.created", [1], {"response_id": 7})
+        message = await asyncio.wait_for(alice.queue.get(), timeout=1)
+
+        assert message["type"] == "response.created"
+        assert message["data"] == {"response_id": 7}
+        assert bob.queue.empty()
+        assert bus.stats()["connections"] == 2
+        assert bus.stats()["delivered"] == 1
+
+        bus.unsubscribe(alice)
+        bus.unsubscribe(bob)
+        assert bus.stats()["connections"] == 0
+
+    async def test_format_sse_frame(self):
+        frame = format_sse({"id": "1-1", "type": "request.cancelled", "data": {"sr_id": 3}})
+        assert frame == 'id: 1-1\nevent: request.cancelled\ndata: {"sr_id": 3}\n\n'
+
+
+@pytest.mark.asyncio
+class TestEventNotifications:
+    """Test that write endpoints publish notifications"""
+
+    async def test_response_lifecycle_notifies_users(self, client: AsyncClient,
+                                                     member_headers, member_headers_2):
+        owner_id = await _user_id(client, member_headers)
+        responder_id = await _user_id(client, member_headers_2)
+        owner_sub = event_bus.subscribe(owner_id)
+        responder_sub = event_bus.subscribe(responder_id)
+        try:
+            create_req = await client.post("/api/v1/service-requests", json={
+                "sr_title": "Fix sink",
+                "stype_id": 1,
+                "cityID": 3,
+                "desc": "Leaking",
+                "file_list": "",
+                "ps_begindate": "2025-03-01T10:00:00"
+            }, headers=member_headers)
+            sr_id = create_req.json()["data"]["sr_id"]
+
+            create_res = await client.post("/api/v1/service-responses", json={
+                "sr_id": sr_id,
+                "title": "I can help",
+                "desc": "Plumber",
+                "file_list": ""
+            }, headers=member_headers_2)
+            response_id = create_res.json()["data"]["id"]
+
+            message = await asyncio.wait_for(owner_sub.queue.get(), timeout=1)
+            assert message["type"] == "response.created"
+            assert message["data"] == {"response_id": response_id, "sr_id": sr_id}
+
+            await client.post(f"/api/v1/match/accept/{response_id}", headers=member_headers)
+            message = await asyncio.wait_for(responder_sub.queue.get(), timeout=1)
+            assert message["type"] == "response.accepted"
+            assert message["data"]["response_id"] == response_id
+        finally:
+            event_bus.unsubscribe(owner_sub)
+            event_bus.unsubscribe(responder_sub)
+
+    async def test_stream_requires_token(self, client: AsyncClient, reference_data):
+        response = await client.get("/api/v1/events")
+        assert response.status_code == 401
+
+    async def test_stats_requires_admin(self, client: AsyncClient, member_headers, admin_headers):
+        response = await client.get("/api/v1/events/stats", headers=member_headers)
+        assert response.status_code == 403
+
+        response = await client.get("/api/v1/events/stats", headers=admin_headers)
+        assert response.status_code == 200
+        assert "connections" in response.json()["data"]
@@ -0,0 +1,52 @@
+import pytest
+from httpx import AsyncClient
+from app.core.health import ReadinessChecker
+from app.crud import suggest as crud_suggest
+from tests.conftest import engine, TestingSessionLocal
+
+
+@pytest.fixture
+def checker(tmp_path, db_session):
+    crud_suggest.invalidate()
+    yield ReadinessChecker(
+        get_engine=lambda: engine,
+        get_upload_dir=lambda: tmp_path,
+        session_factory=TestingSessionLocal
+    )
+    crud_suggest.invalidate()
+
+
+class TestReadinessChecker:
+    """Test readiness checks"""
+
+    def test_not_ready_until_warm(self, checker):
+        ready, checks = checker.run()
+        assert ready is False
+        assert list(checks) == ["startup"]
+
+        checker.warm_up()
+        ready, checks = checker.run()
+        assert ready is True
+        assert set(checks) == {"database", "pool", "upload_dir", "caches"}
+        assert all("latency_ms" in check for check in checks.values())
+
+    def test_database_probe_is_cached(self, checker):
+        assert checker.check_database()["cached"] is False
+        assert checker.check_database()["cached"] is True
+
+    def test_unwritable_upload_dir(self, checker, tmp_path):
+        checker._get_upload_dir = lambda: tmp_path / "missing"
+        checker.warm_up()
+        ready, checks = checker.run()
+        assert ready is False
+        assert checks["upload_dir"]["ok"] is False
+
+
+@pytest.mark.asyncio
+class TestReadyEndpoint:
+    """Test /ready"""
+
+    async def test_ready_fails_fast_before_warm_up(self, client: AsyncClient):
+        response = await client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["checks"]["startup"]["ok"] is False
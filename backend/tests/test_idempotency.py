@@ -0,0 +1,208 @@
+import threading
+import time
+import pytest
+from fastapi import HTTPException
+from httpx import AsyncClient
+from app.core import idempotency
+from app.core.idempotency import IdempotencyStore, RedisIdempotencyStore
+from app.models.service_request import ServiceRequest
+
+
+REQUEST_DATA = {
+    "sr_title": "Fix sink",
+    "stype_id": 1,
+    "cityID": 3,
+    "desc": "Leaking",
+    "file_list": "",
+    "ps_begindate": "2025-03-01T10:00:00"
+}
+
+
+class TestIdempotencyStore:
+    """Test the key -> response store"""
+
+    def test_concurrent_duplicates_run_once(self):
+        store = IdempotencyStore(ttl=60, max_entries=10)
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return {"ok": True}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(store.execute("k", "fp", slow, 201)))
+            for _ in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(calls) == 1
+        assert sorted(replayed for _, _, replayed in results) == [False, True, True, True]
+        assert {body for _, body, _ in results} == {b'{"ok":true}'}
+
+    def test_failure_is_not_stored(self):
+        store = IdempotencyStore(ttl=60, max_entries=10)
+
+        def boom():
+            raise RuntimeError("db down")
+
+        with pytest.raises(RuntimeError):
+            store.execute("k", "fp", boom, 201)
+        assert store.execute("k", "fp", lambda: {"ok": 1}, 201)[2] is False
+
+    def test_ttl_and_capacity_eviction(self):
+        store = IdempotencyStore(ttl=60, max_entries=2)
+        for key in ["a", "b", "c"]:
+            store.execute(key, "fp", lambda: {}, 201)
+        assert len(store) == 2
+
+        expiring = IdempotencyStore(ttl=0.01, max_entries=10)
+        expiring.execute("a", "fp", lambda: {}, 201)
+        time.sleep(0.02)
+        assert expiring.execute("a", "fp", lambda: {}, 201)[2] is False
+
+    def test_key_reuse_with_different_payload(self):
+        store = IdempotencyStore(ttl=60, max_entries=10)
+        store.execute("k", "fp1", lambda: {}, 201)
+        with pytest.raises(HTTPException) as exc:
+            store.execute("k", "fp2", lambda: {}, 201)
+        assert exc.value.status_code == 422
+
+
+class _FakeRedis:
+    """The slice of redis.Redis used by RedisIdempotencyStore, in memory; several stores sharing one act as workers"""
+
+    def __init__(self):
+        self.data = {}  # key -> (value, expires_at or None)
+        self.lock = threading.Lock()
+
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry and entry[1] is not None and time.monotonic() >= entry[1]:
+            del self.data[key]
+            return None
+        return entry
+
+    def set(self, key, value, nx=False, ex=None, px=None):
+        with self.lock:
+            if nx and self._live(key):
+                return None
+            ttl = ex if ex is not None else px / 1000 if px is not None else None
+            self.data[key] = (value.encode(), time.monotonic() + ttl if ttl is not None else None)
+            return True
+
+    def get(self, key):
+        with self.lock:
+            entry = self._live(key)
+            return entry[0] if entry else None
+
+    def register_script(self, script):
+        def run(keys, args):
+            with self.lock:
+                entry = self._live(keys[0])
+                if not entry or entry[0] != args[0].encode():
+                    return 0
+                if script == idempotency._RELEASE_SCRIPT:
+                    del self.data[keys[0]]
+                elif script == idempotency._RENEW_SCRIPT:
+                    self.data[keys[0]] = (entry[0], time.monotonic() + args[1] / 1000)
+                else:
+                    self.data[keys[0]] = (args[1].encode(), time.monotonic() + args[2])
+                return 1
+        return run
+
+
+class TestRedisIdempotencyStore:
+    """Test the store shared between workers"""
+
+    def test_duplicates_on_other_workers_replay(self):
+        redis = _FakeRedis()
+        workers = [RedisIdempotencyStore(client=redis, ttl=60) for _ in range(3)]
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return {"ok": True}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda store=store: results.append(store.execute("k", "fp", slow, 201)))
+            for store in workers
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(calls) == 1
+        assert sorted(replayed for _, _, replayed in results) == [False, True, True]
+        assert {(code, body) for code, body, _ in results} == {(201, b'{"ok":true}')}
+
+        with pytest.raises(HTTPException) as exc:
+            workers[0].execute("k", "other", slow, 201)
+        assert exc.value.status_code == 422
+
+    def test_failure_releases_the_key(self):
+        store = RedisIdempotencyStore(client=_FakeRedis(), ttl=60)
+
+        def boom():
+            raise RuntimeError("db down")
+
+        with pytest.raises(RuntimeError):
+            store.execute("k", "fp", boom, 201)
+        assert store.execute("k", "fp", lambda: {"ok": 1}, 201) == (201, b'{"ok":1}', False)
+
+
+    def test_slow_handler_keeps_its_claim(self):
+        redis = _FakeRedis()
+        workers = [RedisIdempotencyStore(client=redis, ttl=60, claim_seconds=0.3) for _ in range(2)]
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(1.0)  # several times the claim lease
+            return {"ok": True}
+
+        first = threading.Thread(target=workers[0].execute, args=("k", "fp", slow, 201))
+        first.start()
+        time.sleep(0.6)
+        assert workers[1].execute("k", "fp", slow, 201) == (201, b'{"ok":true}', True)
+        first.join()
+        assert len(calls) == 1
+
+    def test_lost_claim_does_not_overwrite_the_new_owner(self):
+        redis = _FakeRedis()
+        store = RedisIdempotencyStore(client=redis, ttl=60)
+
+        def handler():
+            # The claim lapsed and another worker took the key over
+            redis.set("goodservices:idempotency:k", '{"fingerprint": "fp", "token": "other"}')
+            return {"ok": True}
+
+        assert store.execute("k", "fp", handler, 201) == (201, b'{"ok":true}', False)
+        assert redis.get("goodservices:idempotency:k") == b'{"fingerprint": "fp", "token": "other"}'
+
+
+@pytest.mark.asyncio
+class TestIdempotentCreate:
+    """Test Idempotency-Key on POST /service-requests"""
+
+    async def test_retry_returns_same_request(self, client: AsyncClient, db_session, member_headers):
+        headers = {**member_headers, "Idempotency-Key": "retry-1"}
+        first = await client.post("/api/v1/service-requests", json=REQUEST_DATA, headers=headers)
+        retry = await client.post("/api/v1/service-requests", json=REQUEST_DATA, headers=headers)
+
+        assert first.status_code == retry.status_code == 201
+        assert first.json() == retry.json()
+        assert retry.headers.get("Idempotent-Replayed") == "true"
+        assert db_session.query(ServiceRequest).count() == 1
+
+    async def test_without_key_creates_each_time(self, client: AsyncClient, db_session, member_headers):
+        await client.post("/api/v1/service-requests", json=REQUEST_DATA, headers=member_headers)
+        await client.post("/api/v1/service-requests", json=REQUEST_DATA, headers=member_headers)
+        assert db_session.query(ServiceRequest).count() == 2
@@ -0,0 +1,152 @@
+import random
+import pytest
+from datetime import datetime
+from httpx import AsyncClient
+from app.core.outbox import OutboxDispatcher
+from app.core.sketch import DDSketch
+from app.crud import latency as crud_latency
+from app.crud import stats as crud_stats
+from app.models.user import BUser
+from app.models.service_request import ServiceRequest
+from app.models.service_response import ServiceResponse
+from app.models.accept_info import AcceptInfo
+from tests.conftest import TestingSessionLocal
+
+
+class TestDDSketch:
+    """Test the quantile sketch"""
+
+    def test_quantiles_within_relative_accuracy(self):
+        rng = random.Random(7)
+        values = sorted(rng.lognormvariate(9, 2) for _ in range(20000))
+        sketch = DDSketch(0.01)
+        for value in values:
+            sketch.add(value)
+
+        for q in (0.5, 0.9, 0.99):
+            exact = values[int(q * (len(values) - 1))]
+            assert abs(sketch.quantile(q) - exact) <= 0.01 * exact
+        assert len(sketch.bins) < 2000
+
+    def test_merge_and_round_trip(self):
+        left, right, both = DDSketch(0.02), DDSketch(0.02), DDSketch(0.02)
+        for value in range(1, 501):
+            (left if value % 2 else right).add(value)
+            both.add(value)
+        left.merge(DDSketch.from_dict(right.to_dict()))
+
+        assert left.count == both.count == 500
+        assert left.quantile(0.9) == both.quantile(0.9)
+        assert (left.min, left.max) == (1, 500)
+        with pytest.raises(ValueError):
+            left.merge(DDSketch(0.01))
+
+    def test_zero_bin_and_histogram(self):
+        sketch = DDSketch()
+        assert sketch.quantile(0.5) is None
+        for value in (0, 0, 30, 5000, 200000):
+            sketch.add(value)
+        assert sketch.quantile(0.25) == 0.0
+        assert sketch.histogram([0, 3600, 86400]) == [3, 1, 1]
+
+
+@pytest.fixture
+def latency_data(db_session, reference_data):
+    """Request 1 answered after 2h and accepted after 1 day; request 2 answered after 30 days"""
+    db_session.add_all([
+        BUser(id=1, uname="publisher", ctype="ID Card", idno="1", bname="P", bpwd="x", phoneNo="1"),
+        BUser(id=2, uname="responder", ctype="ID Card", idno="2", bname="R", bpwd="x", phoneNo="2"),
+    ])
+    begin = datetime(2025, 1, 10)
+    for sr_id, city_id, answered in ((1, 3, datetime(2025, 1, 10, 2)), (2, 4, datetime(2025, 2, 9))):
+        db_session.add(ServiceRequest(sr_id=sr_id, sr_title="r", stype_id=1, psr_userid=1, cityID=city_id,
+                                      desc="d", file_list="", ps_begindate=begin, ps_state=1))
+        db_session.add(ServiceResponse(response_id=sr_id * 10, response_userid=2, sr_id=sr_id, title="r",
+                                       desc="r", response_state=0, response_date=answered, file_list=""))
+    # A later response to request 1 does not change its time to first response
+    db_session.add(ServiceResponse(response_id=11, response_userid=2, sr_id=1, title="r", desc="r",
+                                   response_state=1, response_date=datetime(2025, 1, 11), file_list=""))
+    db_session.add(AcceptInfo(srid=1, psr_userid=1, response_id=11, response_userid=2,
+                              createdate=datetime(2025, 1, 11)))
+    db_session.commit()
+
+
+class TestLatencySketches:
+    """Test sketch maintenance and queries"""
+
+    def test_rebuild_and_query(self, db_session, latency_data):
+        assert crud_latency.rebuild_latency(db_session) == 3
+        result = crud_latency.get_latency(db_session, crud_stats.parse_month("2025-01"),
+                                          crud_stats.parse_month("2025-02"))
+
+        assert result["months"] == ["2025-01", "2025-02"]
+        first = result["first_response"]
+        assert first["count"] == [1, 1]
+        assert abs(first["p50"][0] - 7200) <= 72
+        assert abs(first["p99"][1] - 30 * 86400) <= 30 * 864
+        assert first["histogram"][0] == [0, 1, 0, 0, 0, 0, 0]
+        assert first["overall"]["count"] == 2
+        assert result["accept"]["count"] == [1, 0]
+        assert result["accept"]["p90"] == [86400.0, None]
+
+        filtered = crud_latency.get_latency(db_session, crud_stats.parse_month("2025-01"),
+                                            crud_stats.parse_month("2025-02"), city_id=4)
+        assert filtered["first_response"]["count"] == [0, 1]
+
+    async def test_consumer_records_first_response_and_accept(self, client: AsyncClient, db_session,
+                                                              member_headers, member_headers_2):
+        create_req = await client.post("/api/v1/service-requests", json={
+            "sr_title": "Fix sink", "stype_id": 1, "cityID": 3, "desc": "Leaking", "file_list": "",
+            "ps_begindate": "2025-03-01T10:00:00"
+        }, headers=member_headers)
+        sr_id = create_req.json()["data"]["sr_id"]
+        response_ids = []
+        for _ in range(2):
+            create_res = await client.post("/api/v1/service-responses", json={
+                "sr_id": sr_id, "title": "I can help", "desc": "Plumber", "file_list": ""
+            }, headers=member_headers_2)
+            response_ids.append(create_res.json()["data"]["id"])
+        await client.post(f"/api/v1/match/accept/{response_ids[1]}", headers=member_headers)
+
+        # Just-written events: no safety lag
+        dispatcher = OutboxDispatcher(session_factory=TestingSessionLocal, safety_lag=0)
+        dispatcher.register(crud_latency.CONSUMER, crud_latency.apply_events)
+        assert dispatcher.drain() == 4
+
+        now = datetime.utcnow()
+        bucket = now.year * 12 + now.month - 1
+        result = crud_latency.get_latency(db_session, bucket, bucket)
+        # Only the first of the two responses counts
+        assert result["first_response"]["count"] == [1]
+        assert result["accept"]["count"] == [1]
+        elapsed = (now - datetime(2025, 3, 1, 10)).total_seconds()
+        assert abs(result["accept"]["p50"][0] - elapsed) <= 0.01 * elapsed + 60
+
+        # A rebuild from the base tables agrees
+        crud_latency.rebuild_latency(db_session)
+        assert crud_latency.get_latency(db_session, bucket, bucket)["first_response"]["count"] == [1]
+        assert dispatcher.drain() == 0
+
+
+@pytest.mark.asyncio
+class TestLatencyEndpoint:
+    """Test /stats/latency"""
+
+    async def test_admin_gets_latency(self, client: AsyncClient, admin_headers, latency_data):
+        response = await client.post("/api/v1/stats/latency/rebuild", headers=admin_headers)
+        assert response.json()["data"]["sketches"] == 3
+
+        response = await client.get("/api/v1/stats/latency", params={
+            "start_month": "2025-01", "end_month": "2025-03", "service_type_id": 1
+        }, headers=admin_headers)
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert data["unit"] == "seconds"
+        assert data["first_response"]["count"] == [1, 1, 0]
+        assert len(data["first_response"]["histogram"][0]) == len(data["histogram_edges"])
+
+    async def test_members_are_forbidden(self, client: AsyncClient, member_headers):
+        response = await client.get("/api/v1/stats/latency", params={
+            "start_month": "2025-01", "end_month": "2025-03"
+        }, headers=member_headers)
+        assert response.status_code == 403
@@ -0,0 +1,44 @@
+import pytest
+from httpx import AsyncClient
+from benchmarks import datagen, load_test
+from tests.conftest import engine
+
+
+class TestReporting:
+    """Test result summaries and the regression check"""
+
+    def test_percentiles_and_metrics_parsing(self):
+        assert load_test.percentile([1, 2, 3, 4], 50) == 2
+        assert load_test.percentile([1, 2, 3, 4], 99) == 4
+        samples = load_test.parse_metrics(
+            '# TYPE x histogram\nhttp_request_db_queries_sum{method="GET",route="/a/{id}"} 12\n'
+        )
+        assert samples[("http_request_db_queries_sum", (("method", "GET"), ("route", "/a/{id}")))] == 12
+
+    def test_compare_flags_regressions(self):
+        def level(rps, p95, queries, error_rate=0.0):
+            return {"concurrency": 8, "throughput_rps": rps, "error_rate": error_rate, "operations": {
+                "browse": {"latency_ms": {"p95": p95}, "queries_per_request": queries}
+            }}
+
+        baseline = {"levels": [level(100, 10.0, 3.0)]}
+        assert load_test.compare({"levels": [level(95, 10.5, 3.0)]}, baseline, 0.1, 0.01) == []
+        failures = load_test.compare({"levels": [level(80, 20.0, 4.0, 0.05)]}, baseline, 0.1, 0.01)
+        assert len(failures) == 4
+
+
+@pytest.mark.asyncio
+class TestRunLevel:
+    """Drive the workload in-process against a small generated data set"""
+
+    async def test_mixed_workload(self, client: AsyncClient, db_session):
+        datagen.generate(engine, users=20, requests=100, responses=200, months=3, verbose=False)
+        load_test.ensure_admin(engine)
+        workload = load_test.Workload(engine, accounts=2)
+        await workload.login(client, "Pass123", load_test.ADMIN_USERNAME, load_test.ADMIN_PASSWORD)
+
+        result = await load_test.run_level(client, workload, concurrency=1, duration=0.5, warmup=0)
+        assert result["requests"] > 0
+        assert result["errors"] == 0
+        assert set(result["latency_ms"]) == {"p50", "p95", "p99", "mean", "max"}
+        assert "browse" in result["operations"]
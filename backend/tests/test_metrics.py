@@ -0,0 +1,119 @@
+import json
+import os
+import time
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+from app import database
+from app.core import metrics
+from app.core.metrics import Registry, instrument_engine
+from app.core.replicas import ReplicaSet
+from tests.conftest import engine
+
+
+class TestRegistry:
+    """Test metric types and text exposition"""
+
+    def test_counter_and_histogram_exposition(self):
+        registry = Registry()
+        requests = registry.counter("req_total", "Requests", ("route",))
+        latency = registry.histogram("lat_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+        requests.inc("/a")
+        requests.inc("/a", amount=2)
+        latency.observe(0.05, "/a")
+        latency.observe(0.5, "/a")
+
+        text = registry.render()
+        assert "# TYPE req_total counter" in text
+        assert 'req_total{route="/a"} 3' in text
+        assert 'lat_seconds_bucket{route="/a",le="0.1"} 1' in text
+        assert 'lat_seconds_bucket{route="/a",le="1"} 2' in text
+        assert 'lat_seconds_bucket{route="/a",le="+Inf"} 2' in text
+        assert 'lat_seconds_count{route="/a"} 2' in text
+
+    def test_multiprocess_snapshots_are_summed(self, tmp_path):
+        worker = Registry(str(tmp_path))
+        worker.counter("jobs_total", "Jobs").inc(amount=2)
+        # A snapshot left behind by another (recycled) worker
+        (tmp_path / "999999.json").write_text(
+            '{"pid": 999999, "metrics": {"jobs_total": [[[], 5]], "busy": [[[], 3]]}}'
+        )
+        worker.gauge("busy", "Busy workers").set(1)
+
+        text = worker.render()
+        assert "jobs_total 7" in text
+        assert "busy 1" in text  # gauges of dead workers are dropped
+        assert os.path.exists(tmp_path / f"{os.getpid()}.json")
+
+    def test_flusher_writes_snapshots_off_the_request_path(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(metrics.settings, "METRICS_FLUSH_INTERVAL_SECONDS", 0.01)
+        worker = Registry(str(tmp_path))
+        jobs = worker.counter("jobs_total", "Jobs")
+        snapshot = tmp_path / f"{os.getpid()}.json"
+
+        def flushed_jobs():
+            try:
+                return json.loads(snapshot.read_text())["metrics"]["jobs_total"][0][1]
+            except (OSError, ValueError):
+                return None
+
+        worker.start_flusher()
+        jobs.inc()
+        deadline = time.monotonic() + 5
+        while flushed_jobs() != 1:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+        jobs.inc()
+        worker.stop_flusher()  # final snapshot on shutdown
+        assert flushed_jobs() == 2
+
+
+def test_pool_gauges_cover_every_engine(tmp_path, monkeypatch):
+    def pooled(name: str, size: int):
+        return create_engine(f"sqlite:///{tmp_path / name}.db", poolclass=QueuePool, pool_size=size)
+
+    interactive, replica, analytic = pooled("primary", 5), pooled("replica", 4), pooled("analytic", 2)
+    monkeypatch.setattr(database, "_engines", {"interactive": interactive, "analytic": analytic})
+    monkeypatch.setattr(database, "_replicas", {"interactive": ReplicaSet([replica]), "analytic": ReplicaSet([])})
+    connection = replica.connect()
+    try:
+        metrics._collect_db_pool()
+    finally:
+        connection.close()
+
+    sizes = {tuple(labels): value for labels, value in metrics.DB_POOL_SIZE.samples()}
+    assert sizes[("interactive", "primary")] == 5
+    assert sizes[("interactive", "replica0")] == 4
+    assert sizes[("analytic", "primary")] == 2
+    checked_out = {tuple(labels): value for labels, value in metrics.DB_POOL_CHECKED_OUT.samples()}
+    assert checked_out[("interactive", "replica0")] == 1
+    assert checked_out[("interactive", "primary")] == 0
+
+
+@pytest.mark.asyncio
+class TestMetricsEndpoint:
+    """Test /metrics"""
+
+    async def test_requests_are_recorded_by_route_template(self, client: AsyncClient, member_headers):
+        await client.get("/api/v1/service-requests/12345", headers=member_headers)
+
+        response = await client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'route="/api/v1/service-requests/{request_id}",status="404"' in response.text
+        assert "http_request_duration_seconds_bucket" in response.text
+        assert "12345" not in response.text
+
+    async def test_queries_are_counted_per_route(self, client: AsyncClient, member_headers):
+        instrument_engine(engine)
+        await client.get("/api/v1/service-requests", headers=member_headers)
+
+        response = await client.get("/metrics")
+        assert "db_queries_total" in response.text
+        line = next(
+            l for l in response.text.splitlines()
+            if l.startswith('http_request_db_queries_sum{method="GET",route="/api/v1/service-requests"}')
+        )
+        assert float(line.split()[-1]) >= 1
@@ -0,0 +1,16 @@
+from benchmarks import micro
+
+
+class TestMicrobenchmarks:
+    """Test the microbenchmark runner"""
+
+    def test_measure_reports_time_and_allocations(self):
+        result = micro.measure(lambda: [0] * 1000, min_time=0.01, repeat=2)
+        assert result["calls"] >= 2
+        assert result["per_call_us"]["min"] <= result["per_call_us"]["median"]
+        assert result["peak_alloc_kib"] > 0
+
+    def test_every_case_runs(self):
+        results = micro.run([50], page_size=5, min_time=0.001, repeat=1)
+        assert [r["name"] for r in results] == list(micro.CASES)
+        assert all(r["per_call_us"]["median"] > 0 for r in results)
@@ -0,0 +1,98 @@
+import pytest
+from datetime import datetime, timedelta
+from httpx import AsyncClient
+from app.core.outbox import OutboxDispatcher
+from app.crud import outbox as crud_outbox
+from app.models.outbox import OutboxEvent
+from app.models.service_request import ServiceRequest
+from tests.conftest import TestingSessionLocal
+
+
+REQUEST_DATA = {
+    "sr_title": "Fix sink",
+    "stype_id": 1,
+    "cityID": 3,
+    "desc": "Leaking",
+    "file_list": "",
+    "ps_begindate": "2025-03-01T10:00:00"
+}
+
+
+async def _request_with_response(client: AsyncClient, owner_headers: dict, responder_headers: dict):
+    create_req = await client.post("/api/v1/service-requests", json=REQUEST_DATA, headers=owner_headers)
+    sr_id = create_req.json()["data"]["sr_id"]
+    create_res = await client.post("/api/v1/service-responses", json={
+        "sr_id": sr_id, "title": "I can help", "desc": "Plumber", "file_list": ""
+    }, headers=responder_headers)
+    return sr_id, create_res.json()["data"]["id"]
+
+
+@pytest.mark.asyncio
+class TestOutbox:
+    """Test outbox events written by CRUD and their dispatch"""
+
+    async def test_writes_record_events_in_same_transaction(self, client: AsyncClient, db_session,
+                                                           member_headers, member_headers_2):
+        sr_id, response_id = await _request_with_response(client, member_headers, member_headers_2)
+        await client.post(f"/api/v1/match/accept/{response_id}", headers=member_headers)
+
+        events = db_session.query(OutboxEvent).order_by(OutboxEvent.id).all()
+        assert [e.event_type for e in events] == ["request.created", "response.created", "response.accepted"]
+        assert events[0].aggregate_id == sr_id
+        assert events[2].aggregate_id == response_id
+
+        db_session.expire_all()
+        assert db_session.query(ServiceRequest).get(sr_id).ps_state == 2
+
+    async def test_create_response_moves_request_to_in_response(self, client: AsyncClient, db_session,
+                                                              member_headers, member_headers_2):
+        sr_id, _ = await _request_with_response(client, member_headers, member_headers_2)
+        db_session.expire_all()
+        assert db_session.query(ServiceRequest).get(sr_id).ps_state == 1
+
+    async def test_dispatcher_checkpoints_and_retries(self, client: AsyncClient, db_session, member_headers):
+        for _ in range(3):
+            await client.post("/api/v1/service-requests", json=REQUEST_DATA, headers=member_headers)
+
+        seen = []
+        failures = {"left": 1}
+
+        def flaky_consumer(db, events):
+            if failures["left"]:
+                failures["left"] -= 1
+                raise RuntimeError("downstream unavailable")
+            seen.extend(event["id"] for event in events)
+
+        dispatcher = OutboxDispatcher(session_factory=TestingSessionLocal, batch_size=2, safety_lag=0)
+        dispatcher.register("test", flaky_consumer)
+
+        assert dispatcher.drain_once() == 0  # failed batch is not checkpointed
+        assert dispatcher.drain() == 3
+        assert len(seen) == 3
+        assert crud_outbox.get_checkpoint(db_session, "test").last_event_id == seen[-1]
+
+        # Nothing new: nothing redelivered
+        assert dispatcher.drain() == 0
+
+    async def test_dispatcher_waits_for_lower_ids_committed_late(self, db_session):
+        def add(event_id: int, age: float):
+            db_session.add(OutboxEvent(id=event_id, event_type="request.created", aggregate_type="service_request",
+                                       aggregate_id=event_id, payload="{}",
+                                       created_at=datetime.utcnow() - timedelta(seconds=age)))
+            db_session.commit()
+
+        seen = []
+        dispatcher = OutboxDispatcher(session_factory=TestingSessionLocal, safety_lag=5)
+        dispatcher.register("test", lambda db, events: seen.extend(event["id"] for event in events))
+
+        # Id 1 is delivered; id 3 commits while the transaction holding id 2 is still open
+        add(1, age=60)
+        add(3, age=1)
+        assert dispatcher.drain() == 1
+
+        # Id 2 commits late, within the lag: both are delivered once they are old enough
+        add(2, age=2)
+        db_session.query(OutboxEvent).update({OutboxEvent.created_at: datetime.utcnow() - timedelta(seconds=10)})
+        db_session.commit()
+        assert dispatcher.drain() == 2
+        assert seen == [1, 2, 3]
@@ -0,0 +1,76 @@
+import threading
+import time
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+from app.core import profiler as profiler_module
+from app.core.profiler import SamplingProfiler
+from tests.conftest import TestingSessionLocal
+
+
+def _busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class TestSamplingProfiler:
+    """Test the stack sampler output formats"""
+
+    def test_collapsed_and_speedscope(self):
+        stop = threading.Event()
+        worker = threading.Thread(target=_busy_loop, args=(stop,), name="busy")
+        worker.start()
+        profiler = SamplingProfiler(interval=0.001).start()
+        time.sleep(0.1)
+        profiler.stop()
+        stop.set()
+        worker.join()
+
+        collapsed = profiler.collapsed()
+        assert any(line.startswith("busy;") and "_busy_loop" in line for line in collapsed.splitlines())
+
+        doc = profiler.speedscope()
+        assert doc["$schema"].startswith("https://www.speedscope.app")
+        busy = next(p for p in doc["profiles"] if p["name"] == "busy")
+        assert busy["type"] == "sampled"
+        assert len(busy["samples"]) == len(busy["weights"])
+        names = {doc["shared"]["frames"][i]["name"] for sample in busy["samples"] for i in sample}
+        assert "_busy_loop" in names
+
+
+@pytest.mark.asyncio
+class TestProfilerEndpoints:
+    """Test admin profiling endpoints"""
+
+    async def test_worker_profile_requires_admin(self, client: AsyncClient, member_headers):
+        response = await client.get("/api/v1/admin/profile", params={"seconds": 0.05}, headers=member_headers)
+        assert response.status_code == 403
+
+    async def test_worker_profile_speedscope(self, client: AsyncClient, admin_headers):
+        response = await client.get("/api/v1/admin/profile",
+                                    params={"seconds": 0.05, "format": "speedscope"},
+                                    headers=admin_headers)
+        assert response.status_code == 200
+        assert "profiles" in response.json()
+
+    async def test_per_request_profile_header(self, client: AsyncClient, admin_headers, member_headers, monkeypatch):
+        monkeypatch.setattr(profiler_module, "get_session_factory", lambda: TestingSessionLocal)
+        response = await client.get("/api/v1/service-types", headers={**member_headers, "X-Profile": "1"})
+        assert "X-Profile-Id" not in response.headers  # only admins can profile
+
+        response = await client.get("/api/v1/service-types", headers={**admin_headers, "X-Profile": "1"})
+        profile_id = response.headers["X-Profile-Id"]
+
+        profile = await client.get(f"/api/v1/admin/profiles/{profile_id}", headers=admin_headers)
+        assert profile.status_code == 200
+        assert profile.headers["content-type"].startswith("text/plain")
+
+    async def test_removed_admin_cannot_profile(self, client: AsyncClient, db_session, admin_headers, monkeypatch):
+        monkeypatch.setattr(profiler_module, "get_session_factory", lambda: TestingSessionLocal)
+        db_session.execute(text("DELETE FROM auser_table"))
+        db_session.commit()
+
+        # The token is still valid, the account behind it is gone
+        response = await client.get("/api/v1/service-types", headers={**admin_headers, "X-Profile": "1"})
+        assert response.status_code == 401
+        assert "X-Profile-Id" not in response.headers
@@ -0,0 +1,79 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+from app.core import ratelimit
+from app.core.config import settings
+from app.core.ratelimit import LocalRateLimitStore, RateLimiter, Rule, client_key
+from app.core.security import create_access_token
+
+
+class TestTokenBucket:
+    """Test rule parsing and the local store"""
+
+    def test_rule(self):
+        rule = Rule("POST /api/v1/auth/login", "10/minute")
+        assert (rule.limit, rule.window, rule.policy) == (10, 60, "10;w=60")
+        with pytest.raises(ValueError):
+            Rule("GET /x", "10/fortnight")
+
+    def test_burst_refill_and_compaction(self):
+        store = LocalRateLimitStore(compact_interval=30)
+        results = [store.take("a", rate=1.0, burst=3, now=100.0)[0] for _ in range(4)]
+        assert results == [True, True, True, False]
+
+        # Two seconds later two tokens are back
+        assert store.take("a", rate=1.0, burst=3, now=102.0) == (True, pytest.approx(1.0))
+        store.take("b", rate=1.0, burst=3, now=102.0)
+        assert len(store) == 2
+
+        # Once both buckets have refilled the next compaction drops them
+        store._compacted_at = 100.0
+        store.take("c", rate=1.0, burst=3, now=200.0)
+        assert len(store) == 1
+
+    def test_client_key(self, monkeypatch):
+        token = create_access_token({"sub": "42"})
+        scope = {"headers": [(b"authorization", f"Bearer {token}".encode())], "client": ("10.0.0.1", 5000)}
+        assert client_key(scope) == "user:42"
+
+        scope = {"headers": [(b"authorization", b"Bearer nonsense"), (b"x-forwarded-for", b"1.2.3.4, 10.0.0.9")],
+                 "client": ("10.0.0.1", 5000)}
+        assert client_key(scope) == "ip:10.0.0.1"
+        monkeypatch.setattr(settings, "RATE_LIMIT_TRUST_FORWARDED_FOR", True)
+        assert client_key(scope) == "ip:1.2.3.4"
+
+
+@pytest.mark.asyncio
+class TestRateLimitMiddleware:
+    """Test 429s and RateLimit headers"""
+
+    async def test_login_is_limited_per_ip(self, client: AsyncClient, db_session):
+        db_session.execute(text("CREATE TABLE IF NOT EXISTS auser_table (aname VARCHAR(50) PRIMARY KEY, apwd VARCHAR(50))"))
+        db_session.commit()
+        for attempt in range(10):
+            response = await client.post("/api/v1/auth/login", json={"username": "nobody", "password": "wrong"})
+            assert response.status_code != 429
+            assert response.headers["RateLimit-Remaining"] == str(9 - attempt)
+
+        response = await client.post("/api/v1/auth/login", json={"username": "nobody", "password": "wrong"})
+        assert response.status_code == 429
+        assert response.headers["RateLimit-Limit"] == "10"
+        assert response.headers["RateLimit-Policy"] == "10;w=60"
+        assert 1 <= int(response.headers["Retry-After"]) <= 6
+
+    async def test_list_endpoint_is_limited_per_user(self, client: AsyncClient, member_headers, member_headers_2,
+                                                     monkeypatch):
+        monkeypatch.setattr(ratelimit, "_limiter", RateLimiter(
+            {"GET /api/v1/service-requests": "2/minute"}, LocalRateLimitStore()))
+
+        statuses = [(await client.get("/api/v1/service-requests", headers=member_headers)).status_code
+                    for _ in range(3)]
+        assert statuses == [200, 200, 429]
+        response = await client.get("/api/v1/service-requests", headers=member_headers_2)
+        assert response.status_code == 200
+        assert response.headers["RateLimit-Remaining"] == "1"
+
+        # Routes without a rule are not limited
+        response = await client.get("/api/v1/service-requests/my", headers=member_headers)
+        assert response.status_code == 200
+        assert "RateLimit-Limit" not in response.headers
@@ -0,0 +1,123 @@
+import pytest
+from datetime import datetime
+from httpx import AsyncClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from app import database
+from app.main import app
+from app.database import Base
+from app.core.replicas import ReplicaSet, RecentWriters, RoutingSession, recent_writers
+from app.core.security import create_access_token
+from app.models.user import BUser
+from app.models.city_info import CityInfo
+from app.models.service_type import ServiceType
+from app.models.service_request import ServiceRequest
+
+
+class TestReplicaSet:
+    """Test round-robin and health tracking"""
+
+    def test_round_robin_skips_failed_replicas(self):
+        engines = [create_engine(f"sqlite:///file{i}.db") for i in range(3)]
+        replicas = ReplicaSet(engines, retry_seconds=60)
+        assert [replicas.candidates()[0] for _ in range(4)] == [engines[0], engines[1], engines[2], engines[0]]
+
+        replicas.mark_down(engines[1])
+        assert engines[1] not in replicas.candidates()
+        assert [status["healthy"] for status in replicas.status()] == [True, False, True]
+
+        replicas.retry_seconds = 0
+        replicas.mark_down(engines[2])
+        assert engines[2] in replicas.candidates()
+
+    def test_recent_writers_window_and_compaction(self):
+        writers = RecentWriters(window=60)
+        writers.record(7)
+        assert 7 in writers and 8 not in writers
+
+        expired = RecentWriters(window=-1)
+        for user_id in range(3000):
+            expired.record(user_id)
+        assert 1 not in expired
+        assert len(expired._until) < 1024
+
+
+@pytest.fixture
+def primary_and_replica(tmp_path, monkeypatch):
+    """Two SQLite files with the same reference data; the app reads from the second on GET"""
+    engines = []
+    for name in ("primary", "replica"):
+        engine = create_engine(f"sqlite:///{tmp_path / name}.db", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        with sessionmaker(bind=engine)() as db:
+            db.add_all([
+                BUser(id=1, uname="writer", ctype="ID Card", idno="1", bname="W", bpwd="x", phoneNo="1"),
+                BUser(id=2, uname="reader", ctype="ID Card", idno="2", bname="R", bpwd="x", phoneNo="2"),
+                CityInfo(cityID=3, cityName="广州", provinceID=44, provinceName="广东省"),
+                ServiceType(id=1, typename="Plumbing"),
+            ])
+            db.commit()
+        engines.append(engine)
+    primary, replica = engines
+    replicas = ReplicaSet([replica])
+    for route_class in ("interactive", "analytic"):
+        monkeypatch.setitem(database._engines, route_class, primary)
+        monkeypatch.setitem(database._replicas, route_class, replicas)
+        monkeypatch.setitem(database._session_factories, route_class, sessionmaker(
+            autocommit=False, autoflush=False, bind=primary, class_=RoutingSession, info={"replicas": replicas}))
+    recent_writers.clear()
+    yield primary, replicas
+    recent_writers.clear()
+    for engine in engines:
+        engine.dispose()
+
+
+def _headers(user_id: int) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)})}"}
+
+
+async def _titles(client: AsyncClient, user_id: int) -> list:
+    response = await client.get("/api/v1/service-requests", headers=_headers(user_id))
+    assert response.status_code == 200
+    return [item["sr_title"] for item in response.json()["data"]["items"]]
+
+
+@pytest.mark.asyncio
+class TestReadRouting:
+    """Test which database the endpoints read from"""
+
+    async def test_reads_go_to_replica_except_after_own_write(self, primary_and_replica):
+        primary, _ = primary_and_replica
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.post("/api/v1/service-requests", json={
+                "sr_title": "Fix sink", "stype_id": 1, "cityID": 3, "desc": "Leaking", "file_list": "",
+                "ps_begindate": "2025-03-01T10:00:00"
+            }, headers=_headers(1))
+            assert response.status_code == 201
+            with primary.connect() as conn:
+                assert conn.execute(text("SELECT COUNT(*) FROM sr_info")).scalar() == 1
+
+            # The writer reads its own write from the primary; the replica has not "replicated" it
+            assert await _titles(client, 1) == ["Fix sink"]
+            assert await _titles(client, 2) == []
+
+            recent_writers.clear()  # the read-your-writes window has passed
+            assert await _titles(client, 1) == []
+
+    async def test_dead_replica_falls_back_to_primary(self, primary_and_replica, tmp_path):
+        primary, replicas = primary_and_replica
+        with sessionmaker(bind=primary)() as db:
+            db.add(ServiceRequest(sr_title="only on primary", stype_id=1, psr_userid=1, cityID=3, desc="d",
+                                  file_list="", ps_begindate=datetime(2025, 3, 1), ps_state=0))
+            db.commit()
+        replicas.engines.insert(0, create_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"))
+        replicas._counter = iter(range(100))
+
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            # The unreachable replica is skipped and marked down; the healthy one serves the read
+            assert await _titles(client, 2) == []
+            assert [status["healthy"] for status in replicas.status()] == [False, True]
+
+            # With no healthy replica left, reads go to the primary
+            replicas.mark_down(replicas.engines[1])
+            assert await _titles(client, 2) == ["only on primary"]
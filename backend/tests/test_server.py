@@ -0,0 +1,124 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+import httpx
+import pytest
+from benchmarks.load_test import _free_port
+from benchmarks.scaling import add_efficiency
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def pid_app(scope, receive, send):
+    """Minimal ASGI app answering with the worker's pid"""
+    if scope["type"] != "http":
+        return
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": str(os.getpid()).encode()})
+
+
+def _start(port: int, *args, env: dict = None):
+    process = subprocess.Popen(
+        [sys.executable, "serve.py", "--app", "tests.test_server:pid_app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning", *args],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env={**os.environ, **(env or {})},
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    pytest.fail("server did not start")
+
+
+def _pid(port: int) -> int:
+    """Pid of the worker answering a request on a new connection, retrying while a worker is being replaced"""
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            with httpx.Client() as client:
+                return int(client.get(f"http://127.0.0.1:{port}/", timeout=5).text)
+        except httpx.TransportError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def _pids(port: int, n: int) -> list:
+    # A new connection per request, so requests spread over the workers
+    return [_pid(port) for _ in range(n)]
+
+
+class TestPreforkServer:
+    """Test serve.py worker management"""
+
+    def test_workers_are_recycled_and_stop_gracefully(self):
+        port = _free_port()
+        process = _start(port, "--workers", "2", "--max-requests", "3")
+        try:
+            # Workers are replaced after about 3 requests; uvicorn checks the limit on its 0.1s tick,
+            # so keep asking until replacements answer rather than counting on a fixed number of requests
+            pids = []
+            deadline = time.monotonic() + 30
+            while len(set(pids)) < 4 and time.monotonic() < deadline:
+                pids.append(_pid(port))
+            assert os.getpid() not in pids and process.pid not in pids
+            assert len(set(pids)) >= 4
+        finally:
+            process.send_signal(signal.SIGTERM)
+            assert process.wait(30) == 0
+
+    def test_metrics_dir_is_removed_on_shutdown(self, tmp_path):
+        port = _free_port()
+        env = {"TMPDIR": str(tmp_path), "METRICS_MULTIPROC_DIR": ""}
+        process = _start(port, "--workers", "2", env=env)
+        try:
+            assert [p.name for p in tmp_path.iterdir() if p.name.startswith("goodservices-metrics-")]
+        finally:
+            process.send_signal(signal.SIGTERM)
+            assert process.wait(30) == 0
+        assert not any(p.name.startswith("goodservices-metrics-") for p in tmp_path.iterdir())
+
+    def test_reuse_port_mode(self):
+        port = _free_port()
+        process = _start(port, "--workers", "2", "--reuse-port")
+        try:
+            assert len(_pids(port, 5)) == 5
+        finally:
+            process.send_signal(signal.SIGTERM)
+            assert process.wait(30) == 0
+
+
+class TestForkSafety:
+    """Test that a forked process does not share the parent's connection pool"""
+
+    def test_child_gets_a_fresh_pool(self):
+        from app import database
+
+        parent_pool = id(database.engine.pool)
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            os.write(write_fd, b"1" if id(database.engine.pool) != parent_pool else b"0")
+            os._exit(0)
+        os.close(write_fd)
+        result = os.read(read_fd, 1)
+        os.waitpid(pid, 0)
+        os.close(read_fd)
+        assert result == b"1"
+
+
+def test_scaling_efficiency():
+    results = add_efficiency([
+        {"workers": 1, "throughput_rps": 100.0},
+        {"workers": 4, "throughput_rps": 360.0},
+    ])
+    assert results[1]["speedup"] == 3.6
+    assert results[1]["efficiency"] == 0.9
@@ -0,0 +1,64 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+
+
+REQUEST_DATA = {
+    "sr_title": "Fix sink",
+    "stype_id": 1,
+    "cityID": 3,
+    "desc": "Leaking",
+    "file_list": "a.jpg,b.jpg",
+    "ps_begindate": "2025-03-01T10:00:00"
+}
+
+
+@pytest.mark.asyncio
+class TestSparseFields:
+    """Test fields= on GET /service-requests"""
+
+    async def test_only_requested_columns_are_selected(self, client: AsyncClient, db_session, member_headers):
+        for _ in range(3):
+            await client.post("/api/v1/service-requests", json=REQUEST_DATA, headers=member_headers)
+
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if "sr_info" in statement:
+                statements.append(statement)
+
+        engine = db_session.get_bind()
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            response = await client.get("/api/v1/service-requests", headers=member_headers, params={
+                "fields": "sr_id, sr_title,ps_state,city_name,sr_id", "size": 2, "city_id": 3
+            })
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert (data["total"], data["total_pages"], len(data["items"])) == (3, 2, 2)
+        assert all(list(item) == ["sr_id", "sr_title", "ps_state", "city_name"] for item in data["items"])
+        assert data["items"][0]["sr_title"] == "Fix sink"
+        assert data["items"][0]["city_name"] != "Unknown"
+
+        page_query = statements[-1]
+        assert "desc" not in page_query and "file_list" not in page_query and "buser_table" not in page_query
+        assert "city_info" in page_query
+
+    async def test_unknown_fields_are_rejected(self, client: AsyncClient, member_headers):
+        response = await client.get("/api/v1/service-requests", params={"fields": "sr_id,bpwd"},
+                                    headers=member_headers)
+        assert response.status_code == 400
+        assert response.json()["detail"].startswith("Unknown fields: bpwd. Allowed fields: sr_id, sr_title")
+        for fields in (",", ""):
+            response = await client.get("/api/v1/service-requests", params={"fields": fields},
+                                        headers=member_headers)
+            assert response.status_code == 400, fields
+
+    async def test_without_fields_every_column_is_returned(self, client: AsyncClient, member_headers):
+        await client.post("/api/v1/service-requests", json=REQUEST_DATA, headers=member_headers)
+        response = await client.get("/api/v1/service-requests", headers=member_headers)
+        item = response.json()["data"]["items"][0]
+        assert item["file_list"] == "a.jpg,b.jpg" and "publisher_name" in item and "desc" in item
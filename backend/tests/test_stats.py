@@ -1,6 +1,26 @@
+import csv
+import io
+import time
+import zipfile
 import pytest
 from httpx import AsyncClient
 from datetime import datetime, timedelta
+from app.core.outbox import OutboxDispatcher
+from app.core.export import stream_csv, CHUNK_SIZE
+from app.crud import stats as crud_stats
+from app.crud import report as crud_report
+from app.models.user import BUser
+from app.models.service_request import ServiceRequest
+from app.models.service_response import ServiceResponse
+from app.models.accept_info import AcceptInfo
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.fixture(autouse=True)
+def clear_stats_cache():
+    crud_stats.invalidate()
+    yield
+    crud_stats.invalidate()
 
 
 @pytest.mark.asyncio
@@ -102,6 +122,13 @@ class TestStatistics:
         # May fail during parsing
         assert response.status_code in [400, 422]
 
+    async def test_monthly_statistics_rejects_bad_months(self, client: AsyncClient, admin_headers):
+        """Test statistics with an invalid month or a reversed range"""
+        for params in ({"start_month": "2025-13", "end_month": "2025-12"},
+                       {"start_month": "2025-03", "end_month": "2025-01"}):
+            response = await client.get("/api/v1/stats/monthly", params=params, headers=admin_headers)
+            assert response.status_code == 400, params
+
     async def test_monthly_statistics_single_month(self, client: AsyncClient,
                                                     auth_headers, setup_test_data):
         """Test statistics for single month"""
@@ -389,3 +416,333 @@ class TestStatistics:
         assert "2024-12" in months
         assert "2025-01" in months
         assert "2025-02" in months
+
+
+@pytest.fixture
+def stats_data(db_session, reference_data):
+    """Requests and accepts around the 2025-01..2025-03 range"""
+    publisher = BUser(id=1, uname="publisher", ctype="ID Card", idno="1", bname="P", bpwd="x", phoneNo="1")
+    responder = BUser(id=2, uname="responder", ctype="ID Card", idno="2", bname="R", bpwd="x", phoneNo="2")
+    db_session.add_all([publisher, responder])
+
+    def add_request(sr_id, city_id, stype_id, begin, accepted_at=()):
+        db_session.add(ServiceRequest(
+            sr_id=sr_id, sr_title=f"Request {sr_id}", stype_id=stype_id, psr_userid=1, cityID=city_id,
+            desc="d", file_list="", ps_begindate=begin, ps_state=2 if accepted_at else 0
+        ))
+        for i, at in enumerate(accepted_at):
+            response_id = sr_id * 10 + i
+            db_session.add(ServiceResponse(
+                response_id=response_id, response_userid=2, sr_id=sr_id, title="r", desc="r",
+                response_state=1, response_date=begin, file_list=""
+            ))
+            db_session.add(AcceptInfo(srid=sr_id, psr_userid=1, response_id=response_id,
+                                      response_userid=2, createdate=at))
+
+    add_request(1, 3, 1, datetime(2025, 1, 10), [datetime(2025, 2, 3)])
+    add_request(2, 4, 2, datetime(2025, 1, 31, 23, 0))  # last hour of the month still counts
+    add_request(3, 3, 2, datetime(2025, 2, 15), [datetime(2025, 2, 20), datetime(2025, 3, 1)])
+    add_request(4, 3, 1, datetime(2024, 12, 31), [datetime(2025, 1, 5)])  # published before the range
+    db_session.commit()
+
+
+class TestMonthlyAggregation:
+    """Test the single-pass monthly aggregation"""
+
+    def test_counts_per_month(self, db_session, stats_data):
+        result = crud_stats.get_monthly_statistics(db_session, "2025-01", "2025-03")
+        assert result["chart_data"] == {
+            "months": ["2025-01", "2025-02", "2025-03"],
+            # A request with two accepts is published once and completed twice
+            "published": [2, 1, 0],
+            "completed": [0, 2, 1]
+        }
+        assert result["total"] == 3
+
+    def test_filters_and_pagination(self, db_session, stats_data):
+        result = crud_stats.get_monthly_statistics(db_session, "2025-01", "2025-03", city_id=3, page=2, size=2)
+        assert result["chart_data"]["published"] == [1, 1, 0]
+        assert result["items"] == [{"month": "2025-03", "publishedCount": 0, "completedCount": 1}]
+
+        result = crud_stats.get_monthly_statistics(db_session, "2025-01", "2025-03", service_type_id=2)
+        assert result["chart_data"]["published"] == [1, 1, 0]
+        assert result["chart_data"]["completed"] == [0, 1, 1]
+
+    def test_breakdown_by_dimensions(self, db_session, stats_data):
+        counts = crud_stats.monthly_counts(
+            db_session, crud_stats.parse_month("2025-01"), crud_stats.parse_month("2025-03"),
+            dimensions=("city", "stype")
+        )
+        rows = sorted((crud_stats.bucket_label(key[0]),) + key[1:] + tuple(value) for key, value in counts.items())
+        assert rows == [
+            ("2025-01", 3, 1, 1, 0),
+            ("2025-01", 4, 2, 1, 0),
+            ("2025-02", 3, 1, 0, 1),
+            ("2025-02", 3, 2, 1, 1),
+            ("2025-03", 3, 2, 0, 1),
+        ]
+
+
+class TestMonthlyStatisticsCache:
+    """Test the /stats/monthly result cache and its write-driven invalidation"""
+
+    def test_repeated_queries_hit(self, db_session, stats_data):
+        before = crud_stats.cache_stats()["monthly"]
+        crud_stats.get_monthly_statistics(db_session, "2025-01", "2025-03", city_id=3)
+        crud_stats.get_monthly_statistics(db_session, "2025-01", "2025-03", city_id=3, page=2, size=1)
+        crud_stats.get_monthly_statistics(db_session, "2025-01", "2025-03", city_id=4)
+        after = crud_stats.cache_stats()["monthly"]
+        assert (after["hits"] - before["hits"], after["misses"] - before["misses"]) == (1, 2)
+
+    async def test_writes_invalidate_only_their_months(self, client: AsyncClient, db_session,
+                                                       stats_data, member_headers, member_headers_2):
+        now = datetime.utcnow()
+        this_month = f"{now.year:04d}-{now.month:02d}"
+        closed = crud_stats.get_monthly_statistics(db_session, "2025-01", "2025-03")["chart_data"]
+        open_range = crud_stats.get_monthly_statistics(db_session, this_month, this_month)["chart_data"]
+        assert open_range["published"] == [0]
+
+        create_req = await client.post("/api/v1/service-requests", json={
+            "sr_title": "Fix sink", "stype_id": 1, "cityID": 3, "desc": "Leaking", "file_list": "",
+            "ps_begindate": now.isoformat()
+        }, headers=member_headers)
+        sr_id = create_req.json()["data"]["sr_id"]
+        assert crud_stats.get_monthly_statistics(db_session, this_month, this_month)["chart_data"]["published"] == [1]
+
+        create_res = await client.post("/api/v1/service-responses", json={
+            "sr_id": sr_id, "title": "I can help", "desc": "Plumber", "file_list": ""
+        }, headers=member_headers_2)
+        await client.post(f"/api/v1/match/accept/{create_res.json()['data']['id']}", headers=member_headers)
+        assert crud_stats.get_monthly_statistics(db_session, this_month, this_month)["chart_data"]["completed"] == [1]
+
+        # The closed range was never invalidated
+        hits = crud_stats.cache_stats()["monthly"]["hits"]
+        assert crud_stats.get_monthly_statistics(db_session, "2025-01", "2025-03")["chart_data"] == closed
+        assert crud_stats.cache_stats()["monthly"]["hits"] == hits + 1
+
+    async def test_back_dated_request_invalidates_its_month(self, client: AsyncClient, db_session,
+                                                            stats_data, member_headers):
+        assert crud_stats.get_monthly_statistics(db_session, "2025-01", "2025-03")["chart_data"]["published"] == [2, 1, 0]
+        await client.post("/api/v1/service-requests", json={
+            "sr_title": "Fix sink", "stype_id": 1, "cityID": 3, "desc": "Leaking", "file_list": "",
+            "ps_begindate": "2025-03-05T10:00:00"
+        }, headers=member_headers)
+        assert crud_stats.get_monthly_statistics(db_session, "2025-01", "2025-03")["chart_data"]["published"] == [2, 1, 1]
+
+    def test_closed_ranges_expire_for_other_workers(self, db_session, stats_data, monkeypatch):
+        assert crud_stats.get_monthly_statistics(db_session, "2025-01", "2025-03")["chart_data"]["published"] == [2, 1, 0]
+        # A back-dated request committed by another worker: no local invalidation runs
+        db_session.add(ServiceRequest(
+            sr_id=9, sr_title="Request 9", stype_id=1, psr_userid=1, cityID=3, desc="d", file_list="",
+            ps_begindate=datetime(2025, 3, 5), ps_state=0
+        ))
+        db_session.commit()
+        assert crud_stats.get_monthly_statistics(db_session, "2025-01", "2025-03")["chart_data"]["published"] == [2, 1, 0]
+
+        expired = time.monotonic() + crud_stats.settings.STATS_CACHE_CLOSED_TTL_SECONDS + 1
+        monkeypatch.setattr(crud_stats.time, "monotonic", lambda: expired)
+        assert crud_stats.get_monthly_statistics(db_session, "2025-01", "2025-03")["chart_data"]["published"] == [2, 1, 1]
+
+
+class TestMonthlyRowStream:
+    """Test the ordered row stream used by exports"""
+
+    def test_matches_monthly_counts(self, db_session, stats_data):
+        first, last = crud_stats.parse_month("2024-11"), crud_stats.parse_month("2025-04")
+        for dimensions in ((), ("city",), ("city", "stype")):
+            rows = list(crud_stats.iter_monthly_rows(db_session, first, last, dimensions=dimensions))
+            assert rows == sorted(rows)
+            counts = crud_stats.monthly_counts(db_session, first, last, dimensions=dimensions)
+            assert {row[:-2]: list(row[-2:]) for row in rows if row[-2:] != (0, 0)} == counts
+
+    def test_fills_empty_months_without_dimensions(self, db_session, stats_data):
+        first, last = crud_stats.parse_month("2024-11"), crud_stats.parse_month("2025-04")
+        rows = list(crud_stats.iter_monthly_rows(db_session, first, last, service_type_id=2))
+        assert [(crud_stats.bucket_label(b), p, c) for b, p, c in rows] == [
+            ("2024-11", 0, 0), ("2024-12", 0, 0), ("2025-01", 1, 0),
+            ("2025-02", 1, 1), ("2025-03", 0, 1), ("2025-04", 0, 0),
+        ]
+
+    def test_csv_is_chunked(self):
+        chunks = list(stream_csv(["n"], ([i] for i in range(50000))))
+        assert len(chunks) > 1
+        assert all(len(chunk) < 2 * CHUNK_SIZE for chunk in chunks)
+        assert b"".join(chunks).decode("utf-8-sig").splitlines()[:2] == ["n", "0"]
+
+
+@pytest.mark.asyncio
+class TestMonthlyExportEndpoint:
+    """Test /stats/monthly/export"""
+
+    async def test_csv_totals(self, client: AsyncClient, admin_headers, stats_data):
+        response = await client.get("/api/v1/stats/monthly/export", params={
+            "start_month": "2025-01", "end_month": "2025-03"
+        }, headers=admin_headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert 'filename="monthly_stats_2025-01_2025-03.csv"' in response.headers["content-disposition"]
+        rows = list(csv.reader(io.StringIO(response.content.decode("utf-8-sig"))))
+        assert rows == [["month", "published", "completed"],
+                        ["2025-01", "2", "0"], ["2025-02", "1", "2"], ["2025-03", "0", "1"]]
+
+    async def test_csv_breakdown(self, client: AsyncClient, admin_headers, stats_data):
+        response = await client.get("/api/v1/stats/monthly/export", params={
+            "start_month": "2025-01", "end_month": "2025-03", "by_city": True, "by_service_type": True
+        }, headers=admin_headers)
+        rows = list(csv.reader(io.StringIO(response.content.decode("utf-8-sig"))))
+        assert rows[0] == ["month", "city_id", "city_name", "service_type_id", "service_type_name",
+                           "published", "completed"]
+        assert rows[1] == ["2025-01", "3", "广州", "1", "Plumbing", "1", "0"]
+        assert len(rows) == 6
+
+    async def test_xlsx(self, client: AsyncClient, admin_headers, stats_data):
+        response = await client.get("/api/v1/stats/monthly/export", params={
+            "start_month": "2025-01", "end_month": "2025-03", "by_service_type": True, "format": "xlsx"
+        }, headers=admin_headers)
+        assert response.status_code == 200
+        archive = zipfile.ZipFile(io.BytesIO(response.content))
+        assert archive.testzip() is None
+        sheet = archive.read("xl/worksheets/sheet1.xml").decode("utf-8")
+        assert sheet.count("<row>") == 1 + 5
+        assert ('<row><c t="inlineStr"><is><t>2025-02</t></is></c><c><v>2</v></c>'
+                '<c t="inlineStr"><is><t>Elderly Care</t></is></c><c><v>1</v></c><c><v>1</v></c></row>') in sheet
+
+    async def test_rejects_unknown_format_and_members(self, client: AsyncClient, admin_headers, member_headers):
+        params = {"start_month": "2025-01", "end_month": "2025-03"}
+        response = await client.get("/api/v1/stats/monthly/export", params={**params, "format": "pdf"},
+                                    headers=admin_headers)
+        assert response.status_code == 422
+        response = await client.get("/api/v1/stats/monthly/export", params=params, headers=member_headers)
+        assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+class TestMonthlyStatisticsEndpoint:
+    """Test /stats/monthly with real data"""
+
+    async def test_admin_gets_counts(self, client: AsyncClient, admin_headers, stats_data):
+        response = await client.get(
+            "/api/v1/stats/monthly",
+            params={"start_month": "2025-01", "end_month": "2025-03"},
+            headers=admin_headers
+        )
+        assert response.status_code == 200
+        assert response.json()["data"]["chart_data"]["completed"] == [0, 2, 1]
+
+    async def test_cache_stats(self, client: AsyncClient, admin_headers, stats_data):
+        params = {"start_month": "2025-01", "end_month": "2025-03"}
+        for _ in range(3):
+            await client.get("/api/v1/stats/monthly", params=params, headers=admin_headers)
+        response = await client.get("/api/v1/stats/cache", headers=admin_headers)
+        assert response.status_code == 200
+        monthly = response.json()["data"]["monthly"]
+        assert monthly["entries"] == 1
+        assert monthly["hit_ratio"] > 0
+
+
+def _cube_rows(cube: dict) -> list:
+    cells = cube["cells"]
+    return [
+        (cube["months"][m], cube["cities"]["ids"][c], cube["service_types"]["ids"][t], p, d)
+        for m, c, t, p, d in zip(cells["month"], cells["city"], cells["stype"], cells["published"], cells["completed"])
+    ]
+
+
+class TestStatisticsCube:
+    """Test the report rollup and the columnar cube built from it"""
+
+    def test_rebuild_matches_base_tables(self, db_session, stats_data):
+        assert crud_report.rebuild_report(db_session) == 6
+        cube = crud_stats.get_cube(db_session, crud_stats.parse_month("2025-01"), crud_stats.parse_month("2025-03"))
+
+        assert cube["months"] == ["2025-01", "2025-02", "2025-03"]
+        assert cube["cities"] == {"ids": [3, 4], "names": ["广州", "深圳"]}
+        assert cube["service_types"]["ids"] == [1, 2]
+        # Completions land in the accept month even when the request was published earlier
+        assert _cube_rows(cube) == [
+            ("2025-01", 3, 1, 1, 1),
+            ("2025-01", 4, 2, 1, 0),
+            ("2025-02", 3, 1, 0, 1),
+            ("2025-02", 3, 2, 1, 1),
+            ("2025-03", 3, 2, 0, 1),
+        ]
+
+    def test_event_deltas(self):
+        before = {"cityID": 3, "stype_id": 1, "ps_begindate": "2025-01-31 23:00:00"}
+        events = [
+            {"type": "request.created", "payload": before},
+            {"type": "request.updated", "payload": {**before, "ps_begindate": "2025-02-01 09:00:00",
+                                                    "before": before}},
+            {"type": "request.cancelled", "payload": before},
+            {"type": "response.accepted", "payload": {"cityID": 4, "stype_id": 2,
+                                                      "accepted_at": "2025-02-03 10:00:00"}},
+            {"type": "request.deleted", "payload": {"cityID": 5, "stype_id": 3,
+                                                    "ps_begindate": "2025-03-01 00:00:00"}},
+        ]
+        feb = crud_stats.parse_month("2025-02")
+        assert crud_report.event_deltas(events) == {
+            (feb, 1, "3"): [1, 0],  # created in January, then moved to February
+            (feb, 2, "4"): [0, 1],
+            (feb + 1, 3, "5"): [-1, 0],
+        }
+
+    async def test_consumer_tracks_writes_and_invalidates(self, client: AsyncClient, db_session,
+                                                          member_headers, member_headers_2):
+        crud_report.rebuild_report(db_session)
+        now = datetime.utcnow()
+        first, last = crud_stats.parse_month("2025-03"), now.year * 12 + now.month - 1
+        assert crud_stats.get_cube(db_session, first, last)["cells"]["published"] == []
+
+        create_req = await client.post("/api/v1/service-requests", json={
+            "sr_title": "Fix sink", "stype_id": 1, "cityID": 3, "desc": "Leaking", "file_list": "",
+            "ps_begindate": "2025-03-01T10:00:00"
+        }, headers=member_headers)
+        sr_id = create_req.json()["data"]["sr_id"]
+        create_res = await client.post("/api/v1/service-responses", json={
+            "sr_id": sr_id, "title": "I can help", "desc": "Plumber", "file_list": ""
+        }, headers=member_headers_2)
+        await client.post(f"/api/v1/match/accept/{create_res.json()['data']['id']}", headers=member_headers)
+
+        # Just-written events: no safety lag
+        dispatcher = OutboxDispatcher(session_factory=TestingSessionLocal, safety_lag=0)
+        dispatcher.register(crud_report.CONSUMER, crud_report.apply_events)
+        assert dispatcher.drain() == 3
+
+        db_session.expire_all()
+        rows = _cube_rows(crud_stats.get_cube(db_session, first, last))
+        assert rows == [("2025-03", 3, 1, 1, 0), (crud_stats.bucket_label(last), 3, 1, 0, 1)]
+
+        # A rebuild agrees with the incrementally maintained rows
+        before = sorted(_cube_rows(crud_stats.get_cube(db_session, first, last)))
+        crud_report.rebuild_report(db_session)
+        assert sorted(_cube_rows(crud_stats.get_cube(db_session, first, last))) == before
+        assert dispatcher.drain() == 0
+
+
+@pytest.mark.asyncio
+class TestStatisticsCubeEndpoint:
+    """Test /stats/cube and /stats/cube/rebuild"""
+
+    async def test_admin_rebuilds_and_reads_cube(self, client: AsyncClient, admin_headers, stats_data):
+        response = await client.post("/api/v1/stats/cube/rebuild", headers=admin_headers)
+        assert response.status_code == 200
+        assert response.json()["data"]["rows"] == 6
+
+        response = await client.get("/api/v1/stats/cube", params={"start_month": "2025-02", "end_month": "2025-03"},
+                                    headers=admin_headers)
+        assert response.status_code == 200
+        cube = response.json()["data"]
+        assert cube["months"] == ["2025-02", "2025-03"]
+        assert cube["cells"] == {"month": [0, 0, 1], "city": [0, 0, 0], "stype": [0, 1, 1],
+                                 "published": [0, 1, 0], "completed": [1, 1, 1]}
+
+    async def test_rejects_bad_months(self, client: AsyncClient, admin_headers):
+        for params in ({"start_month": "2025-13", "end_month": "2025-12"},
+                       {"start_month": "2025-03", "end_month": "2025-01"}):
+            response = await client.get("/api/v1/stats/cube", params=params, headers=admin_headers)
+            assert response.status_code == 400
+
+    async def test_members_are_forbidden(self, client: AsyncClient, member_headers):
+        response = await client.get("/api/v1/stats/cube", params={"start_month": "2025-01", "end_month": "2025-03"},
+                                    headers=member_headers)
+        assert response.status_code == 403
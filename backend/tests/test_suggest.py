@@ -0,0 +1,102 @@
+import random
+import pytest
+from httpx import AsyncClient
+from app.core.typeahead import PrefixIndex
+from app.crud import suggest as crud_suggest
+
+
+@pytest.fixture(autouse=True)
+def clear_suggest_cache():
+    crud_suggest.invalidate()
+    yield
+    crud_suggest.invalidate()
+
+
+class TestPrefixIndex:
+    """Test the sorted-array prefix index"""
+
+    def test_prefix_match_and_limit(self):
+        index = PrefixIndex([("Guangzhou", 1, 0), ("Guilin", 2, 0), ("Hangzhou", 3, 0)])
+        assert index.search("gu") == [1, 2]
+        assert index.search("GU", limit=1) == [1]
+        assert index.search("x") == []
+        assert index.search("") == []
+
+    def test_heavier_items_first_and_deduplicated(self):
+        index = PrefixIndex([("guangdong", 1, 0), ("guangzhou", 1, 2), ("guangxi", 2, 1)])
+        assert index.search("guang") == [1, 2]
+
+    def test_short_prefix_ranks_every_match(self):
+        # The heaviest key sorts after a thousand lighter ones sharing the prefix
+        entries = [(f"a{i:04d}", i, 1) for i in range(1000)] + [("azz", "heavy", 5)]
+        index = PrefixIndex(entries)
+        assert index.search("a", limit=3) == ["heavy", 0, 1]
+
+    def test_matches_full_ranking(self):
+        rng = random.Random(7)
+        entries = sorted(("".join(rng.choice("abc") for _ in range(rng.randint(1, 5))), rng.randint(0, 40),
+                          rng.randint(0, 3)) for _ in range(300))
+        index = PrefixIndex(entries)
+        for prefix in ("a", "ab", "cab", "b", "ccc"):
+            # Each item ranks by its heaviest matching key, ties by that key's sort position
+            ranked = {}
+            for position, (key, item_id, weight) in enumerate(entries):
+                if key.startswith(prefix) and (item_id not in ranked or -weight < ranked[item_id][0]):
+                    ranked[item_id] = (-weight, position)
+            expected = sorted(ranked, key=ranked.get)[:8]
+            assert index.search(prefix, limit=8) == expected, prefix
+
+
+@pytest.mark.asyncio
+class TestSuggestEndpoints:
+    """Test typeahead endpoints"""
+
+    async def test_suggest_cities_by_name_and_province(self, client: AsyncClient, member_headers):
+        response = await client.get("/api/v1/cities/suggest", params={"q": "广"}, headers=member_headers)
+        assert response.status_code == 200
+        names = [c["name"] for c in response.json()["data"]]
+        assert names[0] == "广州"
+        assert "深圳" in names  # matched through provinceName 广东省
+
+        response = await client.get("/api/v1/cities/suggest", params={"q": "gui"}, headers=member_headers)
+        assert [c["name"] for c in response.json()["data"]] == ["Guilin"]
+
+    async def test_suggest_titles_ranked_by_popularity(self, client: AsyncClient, member_headers):
+        base = {
+            "stype_id": 1,
+            "cityID": 3,
+            "desc": "desc",
+            "file_list": "",
+            "ps_begindate": "2025-03-01T10:00:00"
+        }
+        for title in ["Kitchen repair", "Kitchen cleaning", "kitchen cleaning"]:
+            await client.post("/api/v1/service-requests", json={**base, "sr_title": title}, headers=member_headers)
+
+        response = await client.get("/api/v1/titles/suggest", params={"q": "kit"}, headers=member_headers)
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert [item["count"] for item in data] == [2, 1]
+        assert data[1]["title"] == "Kitchen repair"
+
+    async def test_cancelled_requests_are_not_suggested(self, client: AsyncClient, member_headers):
+        base = {
+            "stype_id": 1,
+            "cityID": 3,
+            "desc": "desc",
+            "file_list": "",
+            "ps_begindate": "2025-03-01T10:00:00"
+        }
+        ids = []
+        for title in ["Garden weeding", "Garage tidy", "Garage tidy"]:
+            created = await client.post("/api/v1/service-requests", json={**base, "sr_title": title},
+                                        headers=member_headers)
+            ids.append(created.json()["data"]["sr_id"])
+        for sr_id in (ids[0], ids[2]):
+            await client.put(f"/api/v1/service-requests/{sr_id}/cancel", headers=member_headers)
+
+        response = await client.get("/api/v1/titles/suggest", params={"q": "gar"}, headers=member_headers)
+        assert response.json()["data"] == [{"title": "Garage tidy", "count": 1}]
+
+    async def test_suggest_requires_query(self, client: AsyncClient, member_headers):
+        response = await client.get("/api/v1/cities/suggest", headers=member_headers)
+        assert response.status_code == 422
@@ -0,0 +1,88 @@
+import asyncio
+import pytest
+from httpx import AsyncClient
+from app.core.config import settings
+from app.crud.sync import encode_watermark, decode_watermark
+from datetime import datetime
+
+
+REQUEST_DATA = {
+    "sr_title": "Fix sink",
+    "stype_id": 1,
+    "cityID": 3,
+    "desc": "Leaking",
+    "file_list": "",
+    "ps_begindate": "2025-03-01T10:00:00"
+}
+
+
+@pytest.fixture
+def no_sync_lag(monkeypatch):
+    monkeypatch.setattr(settings, "SYNC_SAFETY_LAG_SECONDS", 0)
+
+
+class TestWatermark:
+    """Test watermark encoding"""
+
+    def test_round_trip(self):
+        ts = datetime(2025, 3, 1, 10, 0, 0, 123000)
+        assert decode_watermark(encode_watermark(ts, 42)) == (ts, 42)
+
+    def test_rejects_garbage(self):
+        with pytest.raises(ValueError):
+            decode_watermark("yesterday")
+
+
+@pytest.mark.asyncio
+class TestDeltaSync:
+    """Test since= delta sync on the /my endpoints"""
+
+    async def test_request_changes_since_watermark(self, client: AsyncClient, member_headers, no_sync_lag):
+        first = await client.post("/api/v1/service-requests", json=REQUEST_DATA, headers=member_headers)
+        first_id = first.json()["data"]["sr_id"]
+
+        full = await client.get("/api/v1/service-requests/my", headers=member_headers)
+        watermark = full.json()["data"]["watermark"]
+        await asyncio.sleep(0.01)
+
+        unchanged = await client.get("/api/v1/service-requests/my", params={"since": watermark},
+                                     headers=member_headers)
+        assert unchanged.json()["data"]["items"] == []
+
+        second = await client.post("/api/v1/service-requests", json=REQUEST_DATA, headers=member_headers)
+        second_id = second.json()["data"]["sr_id"]
+        await client.delete(f"/api/v1/service-requests/{first_id}", headers=member_headers)
+
+        delta = await client.get("/api/v1/service-requests/my", params={"since": watermark},
+                                 headers=member_headers)
+        assert delta.status_code == 200
+        data = delta.json()["data"]
+        assert [item["sr_id"] for item in data["items"]] == [second_id]
+        assert data["deleted"] == [first_id]
+        assert data["reset"] is False
+        assert data["watermark"] != watermark
+
+    async def test_response_state_change_is_synced(self, client: AsyncClient, member_headers,
+                                                   member_headers_2, no_sync_lag):
+        create_req = await client.post("/api/v1/service-requests", json=REQUEST_DATA, headers=member_headers)
+        sr_id = create_req.json()["data"]["sr_id"]
+        create_res = await client.post("/api/v1/service-responses", json={
+            "sr_id": sr_id, "title": "I can help", "desc": "Plumber", "file_list": ""
+        }, headers=member_headers_2)
+        response_id = create_res.json()["data"]["id"]
+
+        full = await client.get("/api/v1/service-responses/my", headers=member_headers_2)
+        watermark = full.json()["data"]["watermark"]
+        await asyncio.sleep(0.01)
+
+        await client.post(f"/api/v1/match/reject/{response_id}", headers=member_headers)
+
+        delta = await client.get("/api/v1/service-responses/my", params={"since": watermark},
+                                 headers=member_headers_2)
+        items = delta.json()["data"]["items"]
+        assert [(item["response_id"], item["response_state"]) for item in items] == [(response_id, 2)]
+
+    async def test_invalid_watermark(self, client: AsyncClient, member_headers):
+        response = await client.get("/api/v1/service-requests/my", params={"since": "abc"},
+                                    headers=member_headers)
+        assert response.status_code == 400
@@ -0,0 +1,22 @@
+-- ============================================
+-- GoodServices 增量同步（"changes since"）支持
+-- ============================================
+-- 用途：/service-requests/my 与 /service-responses/my 的 since 水位线查询
+-- 前置：outbox.sql
+-- ============================================
+
+USE goodservices;
+
+SET NAMES utf8mb4;
+
+-- 事件所属用户（sr_info.psr_userid / response_info.response_userid），用于按用户查询删除墓碑
+ALTER TABLE outbox_event ADD COLUMN `user_id` int(0) NULL DEFAULT NULL COMMENT '聚合所属用户标识' AFTER `aggregate_id`;
+
+-- 查询场景：SELECT aggregate_id FROM outbox_event WHERE user_id = ? AND aggregate_type = ? AND id > ?
+CREATE INDEX idx_outbox_user_seq ON outbox_event(user_id, aggregate_type, id) USING BTREE;
+
+-- 查询场景：SELECT * FROM sr_info WHERE psr_userid = ? AND ps_updatedate >= ?
+CREATE INDEX idx_sr_user_updated ON sr_info(psr_userid, ps_updatedate) USING BTREE;
+
+-- 查询场景：SELECT * FROM response_info WHERE response_userid = ? AND update_date >= ?
+CREATE INDEX idx_response_user_updated ON response_info(response_userid, update_date) USING BTREE;
@@ -0,0 +1,30 @@
+-- ============================================
+-- GoodServices 事务性发件箱（Transactional Outbox）
+-- ============================================
+-- 用途：CRUD 写操作在同一事务内写入领域事件，
+--       由后台分发器按批次投递给各消费者（缓存、汇总、搜索、通知）
+-- ============================================
+
+USE goodservices;
+
+SET NAMES utf8mb4;
+
+-- 领域事件表：id 单调递增，即全局变更序号
+CREATE TABLE IF NOT EXISTS `outbox_event` (
+  `id` int(0) NOT NULL AUTO_INCREMENT COMMENT '事件序号',
+  `event_type` varchar(50) NOT NULL COMMENT '事件类型，如 response.accepted',
+  `aggregate_type` varchar(30) NOT NULL COMMENT '聚合类型：service_request / service_response',
+  `aggregate_id` int(0) NOT NULL COMMENT '聚合标识（sr_id / response_id）',
+  `payload` text NOT NULL COMMENT '事件内容（JSON）',
+  `created_at` datetime(0) NOT NULL COMMENT '写入时间',
+  PRIMARY KEY (`id`) USING BTREE,
+  INDEX `idx_outbox_created`(`created_at`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 ROW_FORMAT = Dynamic;
+
+-- 消费者检查点：每个消费者已处理到的事件序号
+CREATE TABLE IF NOT EXISTS `outbox_checkpoint` (
+  `consumer` varchar(50) NOT NULL COMMENT '消费者名称',
+  `last_event_id` int(0) NOT NULL DEFAULT 0 COMMENT '已处理的最大事件序号',
+  `updated_at` datetime(0) NULL DEFAULT NULL COMMENT '更新时间',
+  PRIMARY KEY (`consumer`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 ROW_FORMAT = Dynamic;
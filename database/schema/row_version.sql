@@ -0,0 +1,14 @@
+-- ============================================
+-- GoodServices 行版本号（详情接口 ETag）
+-- ============================================
+-- 用途：GET /service-requests/{id} 与 /service-responses/{id} 的弱 ETag；
+--       每次 UPDATE 加一，弥补 datetime(0) 修改时间只精确到秒的问题
+-- ============================================
+
+USE goodservices;
+
+SET NAMES utf8mb4;
+
+ALTER TABLE sr_info ADD COLUMN `row_version` int(0) NOT NULL DEFAULT 0 COMMENT '行版本号，每次修改加一' AFTER `ps_updatedate`;
+
+ALTER TABLE response_info ADD COLUMN `row_version` int(0) NOT NULL DEFAULT 0 COMMENT '行版本号，每次修改加一' AFTER `file_list`;
@@ -0,0 +1,25 @@
+-- ============================================
+-- GoodServices 统计查询支持
+-- ============================================
+-- 用途：/stats 月度统计的单次扫描聚合、/stats/latency 响应时效草图
+-- 前置：goodservices.sql
+-- ============================================
+
+USE goodservices;
+
+SET NAMES utf8mb4;
+
+-- 查询场景：SELECT ... FROM sr_info LEFT JOIN accept_info ... WHERE ps_begindate >= ? AND ps_begindate < ?
+-- 按月份区间扫描，同时覆盖按城市/服务类型分组所需的列
+CREATE INDEX idx_sr_begindate ON sr_info(ps_begindate, cityID, stype_id) USING BTREE;
+
+-- 响应时效统计：每个 (指标, 月份, 城市, 服务类型) 一个 DDSketch 分位数草图（JSON）
+-- 由 outbox 消费者 stats_latency 增量维护，/stats/latency 查询时合并，无需扫描明细表
+CREATE TABLE IF NOT EXISTS `latency_sketch` (
+  `metric` varchar(20) NOT NULL COMMENT '指标：first_response 首次响应 / accept 接受响应',
+  `monthID` varchar(6) NOT NULL COMMENT '响应或接受发生的月份 YYYYMM',
+  `cityID` int NOT NULL COMMENT '城市编码',
+  `stype_id` int NOT NULL COMMENT '服务类型标识',
+  `sketch` text NOT NULL COMMENT 'DDSketch 序列化（秒）',
+  PRIMARY KEY (`metric`, `monthID`, `cityID`, `stype_id`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_unicode_ci;